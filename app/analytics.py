@@ -0,0 +1,101 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .supabase_client import get_supabase, execute
+from .resilience import stale_fallback
+from .utils import normalize_username
+
+
+# Сводные таблицы ведут триггеры из миграции 005; здесь только чтение готовых строк.
+# Размер страницы в постраничных экранах аналитики
+PAGE_SIZE = 10
+
+
+def _one(table: str, column: str, value: Any) -> Dict[str, Any]:
+    resp = execute(get_supabase().table(table).select("*").eq(column, value).limit(1))
+    return resp.data[0] if resp.data else {}
+
+
+@stale_fallback(default={})
+def get_user_stats(username: Optional[str]) -> Dict[str, Any]:
+    """Счётчики пользователя: записи, отмены, очередь, переходы из очереди, посещения"""
+    if not username:
+        return {}
+    return _one("user_attendance_stats", "user_tg_username", normalize_username(username))
+
+
+@stale_fallback(default={})
+def get_event_fill_stats(event_id: int) -> Dict[str, Any]:
+    """Заполненность мероприятия и момент, когда закончились места"""
+    if not event_id:
+        return {}
+    return _one("event_fill_stats", "event_id", event_id)
+
+
+@stale_fallback(default={})
+def get_admin_stats(admin_tg: Optional[str]) -> Dict[str, Any]:
+    """Сколько мероприятий админ вёл ответственным, из них завершено и отменено"""
+    if not admin_tg:
+        return {}
+    return _one("admin_event_stats", "admin_tg", normalize_username(admin_tg))
+
+
+@stale_fallback(default=([], False))
+def get_attendance_top(page: int) -> tuple[list[Dict[str, Any]], bool]:
+    """Страница пользователей по числу посещений. Возвращает (строки, есть ли следующая страница)"""
+    start = max(page, 0) * PAGE_SIZE
+    # Берём на одну строку больше, чтобы узнать о следующей странице без count
+    resp = execute(
+        get_supabase()
+        .table("user_attendance_stats")
+        .select("*")
+        .order("attended", desc=True)
+        .order("user_tg_username")
+        .range(start, start + PAGE_SIZE)
+    )
+    rows = resp.data or []
+    return rows[:PAGE_SIZE], len(rows) > PAGE_SIZE
+
+
+def format_user_stats(stats: Dict[str, Any]) -> str:
+    if not stats:
+        return "Статистики пока нет"
+    joins = stats.get("waitlist_joins") or 0
+    promotions = stats.get("waitlist_promotions") or 0
+    conversion = f" ({promotions * 100 // joins}%)" if joins else ""
+    return (
+        f"✅ Посещено: {stats.get('attended') or 0}\n"
+        f"📝 Записей: {stats.get('registrations') or 0}\n"
+        f"❌ Отмен: {stats.get('cancellations') or 0}\n"
+        f"⏳ Очередь: {joins}, из неё записан: {promotions}{conversion}"
+    )
+
+
+def format_fill_stats(stats: Dict[str, Any]) -> str:
+    if not stats:
+        return "🎫 Регистраций не было"
+    registered = stats.get("registered") or 0
+    capacity = stats.get("capacity") or 0
+    if capacity:
+        text = f"🎫 Заполненность: {registered}/{capacity} ({registered * 100 // capacity}%), максимум {stats.get('peak_registered') or 0}"
+    else:
+        text = f"🎫 Записано: {registered} (без ограничения мест)"
+    filled_at = stats.get("filled_at")
+    first = stats.get("first_registration_at")
+    if filled_at and first:
+        text += f"\n⏱ Места закончились за {_format_duration(first, filled_at)}"
+    return text
+
+
+def _format_duration(start: str, end: str) -> str:
+    try:
+        seconds = int((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds())
+    except ValueError:
+        return "-"
+    days, rest = divmod(max(seconds, 0), 86400)
+    hours, rest = divmod(rest, 3600)
+    if days:
+        return f"{days} д {hours} ч"
+    if hours:
+        return f"{hours} ч {rest // 60} мин"
+    return f"{rest // 60} мин"
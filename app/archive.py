@@ -0,0 +1,40 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from .config import ARCHIVE_AFTER_MONTHS, ARCHIVE_BATCH_SIZE, ARCHIVE_INTERVAL
+from .supabase_client import get_supabase, execute
+from . import replica
+from .utils import invalidate_event_caches
+
+
+def archive_once() -> int:
+    """Переносит в архивные таблицы данные мероприятий старше ARCHIVE_AFTER_MONTHS месяцев.
+    Каждый вызов RPC — одна короткая транзакция на ARCHIVE_BATCH_SIZE мероприятий.
+    Возвращает число перенесённых мероприятий."""
+    cutoff = (datetime.now() - timedelta(days=30 * ARCHIVE_AFTER_MONTHS)).strftime("%Y-%m-%d %H:%M")
+    total = 0
+    while True:
+        moved = execute(get_supabase().rpc("archive_old_event_data", {"cutoff": cutoff, "batch_size": ARCHIVE_BATCH_SIZE})).data
+        if not moved:
+            break
+        total += moved
+    if total:
+        invalidate_event_caches()
+    return total
+
+
+async def run() -> None:
+    """Раз в ARCHIVE_INTERVAL секунд разгружает горячие таблицы; запросы идут в отдельном потоке"""
+    if ARCHIVE_AFTER_MONTHS <= 0:
+        return
+    while True:
+        try:
+            moved = await asyncio.to_thread(archive_once)
+            if moved:
+                print(f"ARCHIVE: перенесено мероприятий: {moved}")
+                # Перенос идёт без NOTIFY — убираем перенесённые регистрации из реплики сверкой
+                replica.request_reconcile()
+                replica.request_sync()
+        except Exception as e:
+            print(f"ARCHIVE_ERROR: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
@@ -0,0 +1,191 @@
+import inspect
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional, Tuple, Type
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+
+# Схемы callback-данных. Формат совпадает с прежними строками вида "event:show:3",
+# поэтому у части префиксов две схемы: без индекса и с индексом.
+
+
+class AdminUsersCb(CallbackData, prefix="admin_users"):
+    section: str
+
+
+class ContactCb(CallbackData, prefix="user"):
+    action: str
+    index: int
+
+
+class GlobalUserCb(CallbackData, prefix="global_user"):
+    action: str
+    index: int
+
+
+class GblCb(CallbackData, prefix="gbl"):
+    section: str
+    action: str
+    index: int
+
+
+class GamesCb(CallbackData, prefix="games"):
+    action: str
+
+
+class GamesItemCb(CallbackData, prefix="games"):
+    action: str
+    index: int
+
+
+class GameDraftCb(CallbackData, prefix="game"):
+    action: str
+
+
+class EventMenuCb(CallbackData, prefix="event"):
+    action: str
+
+
+class EventCb(CallbackData, prefix="event"):
+    action: str
+    index: int
+
+
+class FeedbackCb(CallbackData, prefix="feedback"):
+    action: str
+    event_id: int
+    rating: int
+
+
+class DraftCb(CallbackData, prefix="evt"):
+    action: str
+
+
+class DraftItemCb(CallbackData, prefix="evt"):
+    action: str
+    index: int
+
+
+class EditDraftCb(CallbackData, prefix="evt_edit"):
+    action: str
+
+
+class EditDraftItemCb(CallbackData, prefix="evt_edit"):
+    action: str
+    index: int
+
+
+class ParticipantCb(CallbackData, prefix="participant"):
+    action: str
+    event_index: int
+    participant_index: int
+
+
+class BlacklistCb(CallbackData, prefix="blacklist"):
+    action: str
+    event_index: int
+    index: int
+
+
+class UserHistoryCb(CallbackData, prefix="user_history"):
+    action: str
+    index: int
+    page: int
+
+
+class AttendanceCb(CallbackData, prefix="attendance"):
+    action: str
+    page: int
+
+
+class ExportCb(CallbackData, prefix="export"):
+    action: str
+    index: int
+
+
+class ImportCb(CallbackData, prefix="import"):
+    action: str
+
+
+class SeriesCb(CallbackData, prefix="series"):
+    action: str
+    index: int
+
+
+class UserDirCb(CallbackData, prefix="user_dir"):
+    action: str
+    page: int
+
+
+class GamePickCb(CallbackData, prefix="game_pick"):
+    action: str
+    flow: str
+    value: int
+
+
+CallbackHandler = Callable[..., Awaitable[Any]]
+
+
+class CallbackTable:
+    """Таблица обработчиков callback-кнопок.
+
+    Обработчик ищется по ключу "префикс:действие" в словаре, а не перебором фильтров,
+    поэтому стоимость маршрутизации не зависит от числа обработчиков. Данные кнопки
+    разбираются схемой до вызова обработчика; битые данные до него не доходят.
+    """
+
+    def __init__(self) -> None:
+        self._routes: Dict[str, Tuple[Type[CallbackData], CallbackHandler, FrozenSet[str]]] = {}
+        self._flags: Dict[str, Dict[str, Any]] = {}
+        self._depths: Tuple[int, ...] = ()
+
+    def register(self, schema: Type[CallbackData], *route: str, flags: Optional[Dict[str, Any]] = None) -> Callable[[CallbackHandler], CallbackHandler]:
+        """flags — свойства обработчика для middleware (например, idempotent)"""
+        key = schema.__separator__.join((schema.__prefix__, *route))
+
+        def decorator(handler: CallbackHandler) -> CallbackHandler:
+            if key in self._routes:
+                raise ValueError(f"Callback '{key}' уже зарегистрирован")
+            params = frozenset(inspect.signature(handler).parameters)
+            self._routes[key] = (schema, handler, params)
+            self._flags[key] = dict(flags or {})
+            self._depths = tuple(sorted({*self._depths, len(route) + 1}, reverse=True))
+            return handler
+
+        return decorator
+
+    def _match(self, raw: str) -> Optional[str]:
+        parts = raw.split(":")
+        for depth in self._depths:
+            if depth > len(parts):
+                continue
+            key = ":".join(parts[:depth])
+            if key in self._routes:
+                return key
+        return None
+
+    def resolve(self, raw: str) -> Optional[Tuple[Type[CallbackData], CallbackHandler, FrozenSet[str]]]:
+        key = self._match(raw)
+        return self._routes[key] if key is not None else None
+
+    def flags(self, raw: Optional[str]) -> Dict[str, Any]:
+        """Флаги обработчика, которому достанется эта кнопка"""
+        key = self._match(raw or "")
+        return self._flags.get(key, {}) if key is not None else {}
+
+    async def dispatch(self, callback: CallbackQuery, **data: Any) -> Any:
+        raw = callback.data or ""
+        route = self.resolve(raw)
+        if route is None:
+            await callback.answer()
+            return None
+        schema, handler, params = route
+        try:
+            callback_data = schema.unpack(raw)
+        except (TypeError, ValueError):
+            print(f"CALLBACK_MALFORMED: {raw!r}")
+            await callback.answer("Некорректные данные. Откройте меню заново", show_alert=True)
+            return None
+        data["callback_data"] = callback_data
+        kwargs = {name: value for name, value in data.items() if name in params}
+        return await handler(callback, **kwargs)
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.exceptions import TelegramBadRequest
+
+
+# Окно, в течение которого быстрые правки одной карточки склеиваются в одно редактирование
+CARD_DEBOUNCE_SECONDS = 0.4
+
+_CardKey = Tuple[int, int]
+
+# Хэш последнего отрисованного содержимого (текст + клавиатура) по каждому сообщению.
+# Нужен только недавно открытым карточкам: старые вытесняются, и в худшем случае
+# одна правка уйдёт в API повторно и вернётся как "message is not modified"
+MAX_REMEMBERED_CARDS = 4096
+_last_rendered: "OrderedDict[_CardKey, str]" = OrderedDict()
+# Последнее запрошенное содержимое, которое ещё не отправлено
+_pending: Dict[_CardKey, Dict[str, Any]] = {}
+_timers: Dict[_CardKey, asyncio.Task] = {}
+
+
+def _render_hash(text: str, keyboard: Optional[InlineKeyboardMarkup], as_caption: bool) -> str:
+    keyboard_json = keyboard.model_dump_json(exclude_none=True) if keyboard else ""
+    raw = f"{int(as_caption)}\x00{text}\x00{keyboard_json}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _remember(key: _CardKey, digest: str) -> None:
+    _last_rendered[key] = digest
+    _last_rendered.move_to_end(key)
+    while len(_last_rendered) > MAX_REMEMBERED_CARDS:
+        _last_rendered.popitem(last=False)
+
+
+def forget_card(chat_id: Optional[int], message_id: Optional[int]) -> None:
+    """Сбрасывает сведения о карточке: её изменили в обход рендерера или удалили"""
+    if not chat_id or not message_id:
+        return
+    key = (chat_id, message_id)
+    _last_rendered.pop(key, None)
+    _pending.pop(key, None)
+    timer = _timers.pop(key, None)
+    if timer is not None and not timer.done():
+        timer.cancel()
+
+
+def schedule_card_update(bot: Bot, chat_id: int, message_id: int, text: str, keyboard: Optional[InlineKeyboardMarkup], as_caption: bool) -> None:
+    """Ставит карточку на перерисовку. Серия вызовов в пределах окна даёт одно итоговое редактирование."""
+    key = (chat_id, message_id)
+    _pending[key] = {"bot": bot, "text": text, "keyboard": keyboard, "as_caption": as_caption}
+    timer = _timers.get(key)
+    if timer is None or timer.done():
+        _timers[key] = asyncio.create_task(_flush_later(key))
+
+
+async def flush_card(chat_id: Optional[int], message_id: Optional[int]) -> None:
+    """Немедленно применяет отложенную перерисовку карточки, если она есть"""
+    if not chat_id or not message_id:
+        return
+    key = (chat_id, message_id)
+    timer = _timers.pop(key, None)
+    if timer is not None and not timer.done():
+        timer.cancel()
+    payload = _pending.pop(key, None)
+    if payload:
+        await _render(key, payload)
+
+
+async def _flush_later(key: _CardKey) -> None:
+    await asyncio.sleep(CARD_DEBOUNCE_SECONDS)
+    _timers.pop(key, None)
+    payload = _pending.pop(key, None)
+    if payload:
+        await _render(key, payload)
+
+
+async def _render(key: _CardKey, payload: Dict[str, Any]) -> None:
+    bot: Bot = payload["bot"]
+    text: str = payload["text"]
+    keyboard: Optional[InlineKeyboardMarkup] = payload["keyboard"]
+    as_caption: bool = payload["as_caption"]
+    chat_id, message_id = key
+
+    digest = _render_hash(text, keyboard, as_caption)
+    if _last_rendered.get(key) == digest:
+        return
+    try:
+        if as_caption:
+            await bot.edit_message_caption(chat_id=chat_id, message_id=message_id, caption=text, reply_markup=keyboard)
+        else:
+            await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
+        _remember(key, digest)
+        return
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e):
+            _remember(key, digest)
+            return
+        print(f"CARD_RENDER_ERROR: {e}")
+    except Exception as e:
+        print(f"CARD_RENDER_ERROR: {e}")
+        return
+    # Если не удалось отредактировать подпись, пробуем как текст
+    if as_caption:
+        try:
+            await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
+            _remember(key, _render_hash(text, keyboard, False))
+        except Exception:
+            pass
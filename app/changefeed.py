@@ -0,0 +1,122 @@
+import asyncio
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import CHANGEFEED_DSN
+from . import replica
+from .games import invalidate_games
+from .utils import invalidate_event_caches
+
+try:
+    import asyncpg
+except ImportError:  # нужен только при заданном CHANGEFEED_DSN, см. validate()
+    asyncpg = None
+
+
+# Канал pg_notify из миграции 002
+CHANNEL = "table_changes"
+
+# Изменение: {"table": str, "op": "INSERT" | "UPDATE" | "DELETE", "row": dict | None}.
+# row = None, если строка не влезла в payload NOTIFY — тогда таблица перечитывается целиком.
+Change = Dict[str, Any]
+ChangeHandler = Callable[[Change], None]
+
+_subscribers: Dict[str, List[ChangeHandler]] = {}
+
+
+def subscribe(table: str, handler: ChangeHandler) -> None:
+    _subscribers.setdefault(table, []).append(handler)
+
+
+def publish(change: Change) -> None:
+    """Раздаёт изменение подписчикам таблицы. Годится и как локальная шина (например, в тестах)"""
+    for handler in _subscribers.get(change.get("table") or "", []):
+        try:
+            handler(change)
+        except Exception as e:
+            print(f"CHANGEFEED_HANDLER_ERROR {change.get('table')}: {e}")
+
+
+def _patch_replica(change: Change) -> None:
+    table = change["table"]
+    if table not in replica.TABLES or not replica.is_ready():
+        return
+    row = change.get("row")
+    if row is None:
+        # Подробностей нет — синхронизируем реплику сейчас же
+        replica.request_sync()
+        return
+    if change.get("op") == "DELETE":
+        replica.delete(table, row.get(replica.TABLES[table]["key"]))
+    else:
+        replica.apply(table, [row])
+
+
+def _on_events(change: Change) -> None:
+    row = change.get("row") or {}
+    invalidate_event_caches(row.get("id"))
+    _patch_replica(change)
+
+
+def _on_registrations(change: Change) -> None:
+    row = change.get("row") or {}
+    invalidate_event_caches(row.get("event_id"))
+    _patch_replica(change)
+
+
+def _on_board_games(change: Change) -> None:
+    # Сначала реплика: каталог после сброса может перечитаться именно из неё
+    _patch_replica(change)
+    invalidate_games()
+
+
+subscribe("events", _on_events)
+subscribe("event_registrations", _on_registrations)
+subscribe("board_games", _on_board_games)
+for _table in ("admin", "global_blacklist"):
+    subscribe(_table, _patch_replica)
+# event_blacklist в процессе не кэшируется; канал слушается, чтобы подписчики могли появиться
+
+
+def _on_notify(connection: Any, pid: int, channel: str, payload: str) -> None:
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        print(f"CHANGEFEED_BAD_PAYLOAD: {payload[:200]}")
+        return
+    publish(change)
+
+
+def validate() -> None:
+    """Падает при старте, если лента настроена, но драйвера нет: иначе экземпляры молча
+    расходились бы в кэшах"""
+    if CHANGEFEED_DSN and asyncpg is None:
+        raise RuntimeError("Задан CHANGEFEED_DSN, но asyncpg не установлен (pip install -r requirements.txt)")
+
+
+async def listen_loop() -> None:
+    """Слушает LISTEN/NOTIFY в Postgres и переподключается при обрыве"""
+    if not CHANGEFEED_DSN:
+        return
+    validate()
+    delay = 1.0
+    while True:
+        connection: Optional[Any] = None
+        try:
+            connection = await asyncpg.connect(CHANGEFEED_DSN)
+            await connection.add_listener(CHANNEL, _on_notify)
+            print("CHANGEFEED: подписка на изменения активна")
+            delay = 1.0
+            # Пропущенные за время обрыва изменения не придут — сбрасываем кэши целиком
+            invalidate_event_caches()
+            invalidate_games()
+            replica.request_sync()
+            while not connection.is_closed():
+                await asyncio.sleep(5)
+        except Exception as e:
+            print(f"CHANGEFEED_ERROR: {e}")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60.0)
@@ -4,6 +4,64 @@ from typing import Optional
 BOT_TOKEN: Optional[str] = os.getenv("BOT_TOKEN")
 SUPABASE_URL: Optional[str] = os.getenv("SUPABASE_URL")
 SUPABASE_KEY: Optional[str] = os.getenv("SUPABASE_KEY")
+# Сколько секунд горячие чтения (места на мероприятии, список мероприятий) отдаются из памяти
+READ_CACHE_TTL: float = float(os.getenv("READ_CACHE_TTL", "2"))
+# Таймаут одного запроса к Supabase и параметры автомата (circuit breaker)
+SUPABASE_TIMEOUT: float = float(os.getenv("SUPABASE_TIMEOUT", "5"))
+SUPABASE_READ_RETRIES: int = int(os.getenv("SUPABASE_READ_RETRIES", "2"))
+SUPABASE_BREAKER_THRESHOLD: int = int(os.getenv("SUPABASE_BREAKER_THRESHOLD", "5"))
+SUPABASE_BREAKER_RESET: float = float(os.getenv("SUPABASE_BREAKER_RESET", "30"))
+# Локальная SQLite-реплика для чтения; пустой путь — реплика выключена
+REPLICA_PATH: str = os.getenv("REPLICA_PATH", "")
+REPLICA_SYNC_INTERVAL: float = float(os.getenv("REPLICA_SYNC_INTERVAL", "30"))
+# Запас (сек.), с которым каждая синхронизация перечитывает строки до водяного знака: updated_at —
+# время начала транзакции, и строки транзакций, зафиксированных позже, иначе были бы пропущены
+REPLICA_SYNC_LAG: float = float(os.getenv("REPLICA_SYNC_LAG", "120"))
+# Как часто (сек.) реплика сверяет ключи с базой, чтобы убрать строки, удалённые без уведомления
+REPLICA_RECONCILE_INTERVAL: float = float(os.getenv("REPLICA_RECONCILE_INTERVAL", "600"))
+# Сколько апдейтов разных пользователей обрабатываются одновременно
+UPDATE_CONCURRENCY: int = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+# Окно (в секундах), в котором повторное нажатие той же кнопки считается дублем;
+# CALLBACK_DEDUPE_SHARED=1 — дубли отсекаются и между экземплярами (таблица callback_dedupe)
+CALLBACK_DEDUPE_TTL: float = float(os.getenv("CALLBACK_DEDUPE_TTL", "3"))
+CALLBACK_DEDUPE_SHARED: bool = os.getenv("CALLBACK_DEDUPE_SHARED", "") in ("1", "true", "yes")
+# Как часто (сек.) из общей таблицы удаляются старые ключи
+CALLBACK_DEDUPE_PURGE_INTERVAL: float = float(os.getenv("CALLBACK_DEDUPE_PURGE_INTERVAL", "3600"))
+# Тяжёлые обработчики (списки, рассылки, регистрация): не больше THROTTLE_BURST подряд
+# на пользователя, дальше THROTTLE_RATE вызовов в секунду; 0 — ограничение выключено
+THROTTLE_RATE: float = float(os.getenv("THROTTLE_RATE", "0.5"))
+THROTTLE_BURST: int = int(os.getenv("THROTTLE_BURST", "5"))
+# Как часто (в секундах) очередь напоминаний пересобирается из базы
+REMINDERS_RESEED_INTERVAL: float = float(os.getenv("REMINDERS_RESEED_INTERVAL", "600"))
+# Календарный фид .ics по HTTP: порт пустой — фид выключен. FEED_BASE_URL — внешний адрес
+# для ссылок в боте, FEED_SECRET — ключ подписи персональных ссылок
+FEED_HOST: str = os.getenv("FEED_HOST", "0.0.0.0")
+FEED_PORT: str = os.getenv("FEED_PORT", "")
+FEED_BASE_URL: str = os.getenv("FEED_BASE_URL", "").rstrip("/")
+FEED_SECRET: str = os.getenv("FEED_SECRET", "")
+# Повторяющиеся мероприятия: на сколько дней вперёд создаются вхождения серий и как часто окно сдвигается (сек.)
+SERIES_WINDOW_DAYS: int = int(os.getenv("SERIES_WINDOW_DAYS", "28"))
+SERIES_MATERIALIZE_INTERVAL: float = float(os.getenv("SERIES_MATERIALIZE_INTERVAL", "3600"))
+# Инлайн-поиск: сколько секунд Telegram кэширует ответ и как долго живёт индекс мероприятий,
+# если его не сбросила запись (изменения других экземпляров приходят через changefeed)
+INLINE_CACHE_TIME: int = int(os.getenv("INLINE_CACHE_TIME", "60"))
+INLINE_CATALOGUE_TTL: float = float(os.getenv("INLINE_CATALOGUE_TTL", "60"))
+# Сколько секунд держать в памяти список настолок (без правил и картинок); своя запись сбрасывает сразу
+GAMES_CACHE_TTL: float = float(os.getenv("GAMES_CACHE_TTL", "300"))
+# Автозавершение: через сколько часов после начала мероприятие считается прошедшим (0 — выключено)
+# и как часто это проверяется (сек.)
+EVENT_AUTO_COMPLETE_HOURS: float = float(os.getenv("EVENT_AUTO_COMPLETE_HOURS", "6"))
+LIFECYCLE_INTERVAL: float = float(os.getenv("LIFECYCLE_INTERVAL", "900"))
+# Запрос оценки уходит только по мероприятиям, начавшимся не раньше чем столько дней назад:
+# давно забытые мероприятия завершаются молча, без рассылки
+EVENT_FEEDBACK_LOOKBACK_DAYS: float = float(os.getenv("EVENT_FEEDBACK_LOOKBACK_DAYS", "3"))
+# Архив: данные мероприятий, завершённых раньше чем ARCHIVE_AFTER_MONTHS месяцев назад, переносятся
+# в архивные таблицы пачками по ARCHIVE_BATCH_SIZE мероприятий (0 месяцев — выключено)
+ARCHIVE_AFTER_MONTHS: int = int(os.getenv("ARCHIVE_AFTER_MONTHS", "12"))
+ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "50"))
+ARCHIVE_INTERVAL: float = float(os.getenv("ARCHIVE_INTERVAL", "86400"))
+# Прямое подключение к Postgres для LISTEN/NOTIFY (нужен asyncpg); пусто — ленты изменений нет
+CHANGEFEED_DSN: str = os.getenv("CHANGEFEED_DSN", "")
 
 
 def validate_config() -> None:
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+from typing import Dict
+
+from .config import CALLBACK_DEDUPE_TTL, CALLBACK_DEDUPE_SHARED, CALLBACK_DEDUPE_PURGE_INTERVAL
+from .supabase_client import get_supabase, execute
+
+
+# Ключ -> момент, до которого повтор считается дублем
+_seen: Dict[str, float] = {}
+_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+def _sweep(now: float) -> None:
+    global _last_sweep
+    if now - _last_sweep < CALLBACK_DEDUPE_TTL:
+        return
+    _last_sweep = now
+    for key in [k for k, expires in _seen.items() if expires <= now]:
+        del _seen[key]
+
+
+def _claim_local(key: str) -> bool:
+    now = time.monotonic()
+    with _lock:
+        _sweep(now)
+        expires = _seen.get(key)
+        if expires is not None and expires > now:
+            return False
+        _seen[key] = now + CALLBACK_DEDUPE_TTL
+        return True
+
+
+def _claim_shared(key: str) -> bool:
+    """Занимает ключ в общей таблице (миграция 003). False — ключ занят другим экземпляром
+    меньше CALLBACK_DEDUPE_TTL секунд назад."""
+    try:
+        return bool(execute(
+            get_supabase().rpc("claim_callback", {"claim_key": key, "ttl_seconds": CALLBACK_DEDUPE_TTL})
+        ).data)
+    except Exception as e:
+        # Общее хранилище недоступно — полагаемся только на локальное окно
+        print(f"ERROR callback dedupe store: {e}")
+        return True
+
+
+async def claim(user_id: int, message_id: int, data: str) -> bool:
+    """Возвращает True, если нажатие первое в окне, и False для повтора.
+    Запрос к общей таблице идёт в отдельном потоке, чтобы не держать event loop."""
+    key = f"{user_id}:{message_id}:{data}"
+    if not _claim_local(key):
+        return False
+    if CALLBACK_DEDUPE_SHARED:
+        return await asyncio.to_thread(_claim_shared, key)
+    return True
+
+
+def release(user_id: int, message_id: int, data: str) -> None:
+    """Снимает локальную отметку — обработчик упал, повторное нажатие должно пройти"""
+    with _lock:
+        _seen.pop(f"{user_id}:{message_id}:{data}", None)
+
+
+async def purge_loop() -> None:
+    """Периодически удаляет из общей таблицы ключи старше часа"""
+    if not CALLBACK_DEDUPE_SHARED:
+        return
+    while True:
+        try:
+            await asyncio.to_thread(lambda: execute(get_supabase().rpc("purge_callback_dedupe", {})))
+        except Exception as e:
+            print(f"CALLBACK_DEDUPE_PURGE_ERROR: {e}")
+        await asyncio.sleep(CALLBACK_DEDUPE_PURGE_INTERVAL)
@@ -0,0 +1,91 @@
+import re
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from .config import INLINE_CATALOGUE_TTL
+from .utils import add_invalidation_listener, get_upcoming_events
+
+
+# Поле -> вес совпадения при ранжировании
+FIELD_WEIGHTS = {"title": 3, "board_games": 2, "description": 1}
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _words(text: Optional[str]) -> List[str]:
+    return _WORD_RE.findall((text or "").lower().replace("ё", "е"))
+
+
+def _grams(word: str) -> Set[str]:
+    """Триграммы слова с маркером начала: «^ки», «кин», «ино» для «кино».
+    Первая биграмма позволяет искать по одной-двум буквам как по префиксу."""
+    marked = "^" + word
+    grams = {marked[:2]}
+    grams.update(marked[i:i + 3] for i in range(len(marked) - 2))
+    return grams
+
+
+class _Catalogue:
+    """Предстоящие мероприятия и инвертированный индекс триграмм по ним"""
+    __slots__ = ("events", "index", "built_at")
+
+    def __init__(self, events: List[Dict[str, Any]]) -> None:
+        self.events = {event["id"]: event for event in events if event.get("id") is not None}
+        self.index: Dict[str, Dict[int, int]] = {}
+        for event_id, event in self.events.items():
+            for field, weight in FIELD_WEIGHTS.items():
+                for word in _words(event.get(field)):
+                    for gram in _grams(word):
+                        postings = self.index.setdefault(gram, {})
+                        postings[event_id] = max(postings.get(event_id, 0), weight)
+        self.built_at = time.monotonic()
+
+
+_catalogue: Optional[_Catalogue] = None
+
+
+def _invalidate(event_id: Optional[int]) -> None:
+    global _catalogue
+    _catalogue = None
+
+
+add_invalidation_listener(_invalidate)
+
+
+def _get_catalogue() -> _Catalogue:
+    global _catalogue
+    if _catalogue is None or time.monotonic() - _catalogue.built_at > INLINE_CATALOGUE_TTL:
+        _catalogue = _Catalogue(get_upcoming_events())
+    return _catalogue
+
+
+def search_events(query: str) -> List[Dict[str, Any]]:
+    """Мероприятия, где каждое слово запроса совпадает хотя бы наполовину своих триграмм.
+    Пустой запрос — все предстоящие по дате. Сортировка: релевантность, затем дата."""
+    catalogue = _get_catalogue()
+    words = _words(query)
+    if not words:
+        return sorted(catalogue.events.values(), key=lambda event: event.get("date") or "")
+    scores: Optional[Dict[int, float]] = None
+    for word in words:
+        grams = _grams(word)
+        matched_grams: Dict[int, int] = {}
+        weights: Dict[int, int] = {}
+        for gram in grams:
+            for event_id, weight in catalogue.index.get(gram, {}).items():
+                matched_grams[event_id] = matched_grams.get(event_id, 0) + 1
+                weights[event_id] = weights.get(event_id, 0) + weight
+        # Слово считается найденным, если совпала хотя бы половина его триграмм (терпимо к опечаткам)
+        word_scores = {
+            event_id: weights[event_id] / len(grams)
+            for event_id, count in matched_grams.items()
+            if count * 2 >= len(grams)
+        }
+        if scores is None:
+            scores = word_scores
+        else:
+            scores = {event_id: score + word_scores[event_id] for event_id, score in scores.items() if event_id in word_scores}
+        if not scores:
+            return []
+    ranked = sorted((scores or {}).items(), key=lambda item: (-item[1], catalogue.events[item[0]].get("date") or ""))
+    return [catalogue.events[event_id] for event_id, _ in ranked]
@@ -0,0 +1,94 @@
+import csv
+import os
+import tempfile
+from typing import Any, Callable, Dict, Iterator, List
+
+from .supabase_client import get_supabase, execute
+
+
+# Сколько строк забирается из Supabase за один запрос
+EXPORT_PAGE_SIZE = 1000
+
+# (заголовок столбца, поле строки)
+Columns = List[tuple[str, str]]
+
+PARTICIPANT_COLUMNS: Columns = [
+    ("username", "user_tg_username"),
+    ("status", "status"),
+    ("registration_date", "registration_date"),
+    ("promoted_from_waitlist", "promoted_from_waitlist"),
+]
+USER_COLUMNS: Columns = [
+    ("username", "tg_username"),
+    ("chat_id", "chat_id"),
+    ("created_at", "created_at"),
+]
+FEEDBACK_COLUMNS: Columns = [
+    ("username", "user_tg_username"),
+    ("rating", "rating"),
+    ("comment", "comment"),
+]
+
+
+def _pages(build_query: Callable[[], Any]) -> Iterator[Dict[str, Any]]:
+    """Перебирает строки запроса страницами. Запрос строится заново на каждую страницу:
+    построитель PostgREST изменяемый. Порядок в build_query должен быть однозначным (по id)."""
+    start = 0
+    while True:
+        resp = execute(build_query().range(start, start + EXPORT_PAGE_SIZE - 1))
+        rows = resp.data or []
+        yield from rows
+        if len(rows) < EXPORT_PAGE_SIZE:
+            return
+        start += EXPORT_PAGE_SIZE
+
+
+def _write_csv(rows: Iterator[Dict[str, Any]], columns: Columns) -> str:
+    """Пишет строки во временный файл по мере чтения и возвращает путь к нему.
+    utf-8-sig — чтобы Excel открывал кириллицу без настройки кодировки."""
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([title for title, _ in columns])
+            for row in rows:
+                writer.writerow(["" if row.get(field) is None else row.get(field) for _, field in columns])
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def export_participants(event_id: int) -> str:
+    """CSV со всеми записями на мероприятие, включая очередь и отменённые"""
+    columns = ", ".join(field for _, field in PARTICIPANT_COLUMNS)
+    return _write_csv(_pages(lambda: (
+        get_supabase()
+        .table("event_registrations")
+        .select(columns)
+        .eq("event_id", event_id)
+        .order("id")
+    )), PARTICIPANT_COLUMNS)
+
+
+def export_users() -> str:
+    """CSV со всеми пользователями бота"""
+    columns = ", ".join(field for _, field in USER_COLUMNS)
+    return _write_csv(_pages(lambda: (
+        get_supabase()
+        .table("users")
+        .select(columns)
+        .order("id")
+    )), USER_COLUMNS)
+
+
+def export_feedback(event_id: int) -> str:
+    """CSV с оценками и комментариями по мероприятию"""
+    columns = ", ".join(field for _, field in FEEDBACK_COLUMNS)
+    return _write_csv(_pages(lambda: (
+        get_supabase()
+        .table("event_feedback")
+        .select(columns)
+        .eq("event_id", event_id)
+        .order("id")
+    )), FEEDBACK_COLUMNS)
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import hmac
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from .config import BOT_TOKEN, FEED_HOST, FEED_PORT, FEED_BASE_URL, FEED_SECRET
+from .ical import render_calendar
+from .utils import add_invalidation_listener, get_upcoming_events, get_user_registrations, normalize_username
+
+
+# Сколько отрендеренных календарей держать в памяти (общий + персональные)
+MAX_CACHED = 5000
+# Подсказка клиентам, как часто перезапрашивать; повторный запрос всё равно дешёвый (304)
+CLIENT_MAX_AGE = 300
+
+
+class _Rendered:
+    __slots__ = ("body", "etag", "modified")
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        # Last-Modified передаётся с точностью до секунды
+        self.modified = int(time.time())
+
+
+_cache: Dict[str, _Rendered] = {}
+_pending: Dict[str, "asyncio.Future[_Rendered]"] = {}
+# Растёт при каждом сбросе: рендер, начатый до сброса, не попадает в кэш
+_generation = 0
+
+
+def _invalidate(event_id: Optional[int]) -> None:
+    """Календари зависят и от мероприятий, и от регистраций — сбрасываем всё"""
+    global _generation
+    _generation += 1
+    _cache.clear()
+
+
+add_invalidation_listener(_invalidate)
+
+
+def _signature(name: str) -> str:
+    key = (FEED_SECRET or BOT_TOKEN or "").encode()
+    return hmac.new(key, name.lower().encode(), hashlib.sha256).hexdigest()[:20]
+
+
+def user_feed_token(username: str) -> str:
+    name = (normalize_username(username) or "").lstrip("@")
+    return f"{name}.{_signature(name)}"
+
+
+def _username_from_token(token: str) -> Optional[str]:
+    name, _, signature = token.rpartition(".")
+    if not name or not hmac.compare_digest(signature, _signature(name)):
+        return None
+    return normalize_username(name)
+
+
+def user_feed_url(username: Optional[str]) -> Optional[str]:
+    """Персональная ссылка на календарь «мои мероприятия» (None, если фид не настроен)"""
+    if not username or not FEED_PORT or not FEED_BASE_URL:
+        return None
+    return f"{FEED_BASE_URL}/calendar/{user_feed_token(username)}.ics"
+
+
+def _user_events(username: str) -> List[Dict[str, Any]]:
+    events = []
+    for reg in get_user_registrations(username):
+        event = reg.get("events")
+        if event and not event.get("is_completed") and not event.get("is_cancelled"):
+            events.append(event)
+    return events
+
+
+async def _render(key: str, load: Callable[[], List[Dict[str, Any]]], name: str) -> _Rendered:
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    pending = _pending.get(key)
+    if pending is not None:
+        # Одновременные промахи по одному ключу ждут один рендер
+        return await asyncio.shield(pending)
+    generation = _generation
+    future: "asyncio.Future[_Rendered]" = asyncio.get_running_loop().create_future()
+    _pending[key] = future
+    try:
+        events = await asyncio.to_thread(load)
+        rendered = _Rendered(render_calendar(events, name))
+        if generation == _generation:
+            if len(_cache) >= MAX_CACHED:
+                _cache.pop(next(iter(_cache)))
+            _cache[key] = rendered
+        future.set_result(rendered)
+        return rendered
+    except Exception as e:
+        future.set_exception(e)
+        # Исключение уже передано ожидающим; без этого asyncio пожалуется на непрочитанное
+        future.exception()
+        raise
+    finally:
+        _pending.pop(key, None)
+
+
+def _not_modified(request: web.Request, rendered: _Rendered) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return rendered.etag in tags or "*" in tags
+    since = request.if_modified_since
+    return since is not None and since >= datetime.fromtimestamp(rendered.modified, timezone.utc)
+
+
+def _respond(request: web.Request, rendered: _Rendered, private: bool) -> web.Response:
+    headers = {
+        "ETag": rendered.etag,
+        "Last-Modified": formatdate(rendered.modified, usegmt=True),
+        "Cache-Control": f"{'private' if private else 'public'}, max-age={CLIENT_MAX_AGE}",
+    }
+    if _not_modified(request, rendered):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=rendered.body, content_type="text/calendar", charset="utf-8", headers=headers)
+
+
+async def _public_feed(request: web.Request) -> web.Response:
+    try:
+        rendered = await _render("all", get_upcoming_events, "Настой — мероприятия")
+    except Exception as e:
+        print(f"FEED_ERROR: {e}")
+        raise web.HTTPServiceUnavailable()
+    return _respond(request, rendered, private=False)
+
+
+async def _user_feed(request: web.Request) -> web.Response:
+    username = _username_from_token(request.match_info["token"])
+    if username is None:
+        raise web.HTTPNotFound()
+    try:
+        rendered = await _render(f"user:{username.lower()}", lambda: _user_events(username), "Настой — мои мероприятия")
+    except Exception as e:
+        print(f"FEED_ERROR: {e}")
+        raise web.HTTPServiceUnavailable()
+    return _respond(request, rendered, private=True)
+
+
+async def serve() -> None:
+    """Поднимает HTTP-сервер фида рядом с поллингом бота"""
+    if not FEED_PORT:
+        return
+    app = web.Application()
+    app.router.add_get("/calendar.ics", _public_feed)
+    app.router.add_get("/calendar/{token}.ics", _user_feed)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, FEED_HOST, int(FEED_PORT)).start()
+    print(f"FEED: календарь доступен на {FEED_HOST}:{FEED_PORT}")
@@ -0,0 +1,95 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from .config import GAMES_CACHE_TTL
+from .supabase_client import get_supabase, execute
+from .singleflight import singleflight, shared_call
+from .resilience import stale_fallback
+from . import replica
+
+
+# Каталог держит только то, что нужно спискам и фильтрам; правила и картинка читаются по id
+LIST_FIELDS = ("id", "title", "min_players", "max_players", "duration_minutes")
+PAGE_SIZE = 8
+
+# Значения кнопок фильтров: «подходит для N игроков» и «партия не дольше N минут»
+PLAYER_FILTERS = (2, 4, 6)
+DURATION_FILTERS = (30, 60, 120)
+
+
+@stale_fallback(default=[])
+@singleflight(ttl=GAMES_CACHE_TTL)
+def _fetch_catalogue() -> List[Dict[str, Any]]:
+    if replica.is_ready():
+        rows = replica.select("board_games")
+    else:
+        rows = execute(get_supabase().table("board_games").select(", ".join(LIST_FIELDS))).data or []
+    games = [{field: row.get(field) for field in LIST_FIELDS} for row in rows]
+    games.sort(key=lambda game: (game.get("title") or "").lower())
+    return games
+
+
+def invalidate_games() -> None:
+    _fetch_catalogue.clear()
+
+
+def search_games(filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Игры каталога по фильтрам {"query", "players", "duration"}; пустой фильтр не ограничивает"""
+    return _filter_games(_fetch_catalogue(), filters)
+
+
+async def search_games_async(filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """search_games для обработчиков: каталог читается в рабочем потоке одним общим запросом"""
+    return _filter_games(await shared_call(_fetch_catalogue), filters)
+
+
+def _filter_games(catalogue: List[Dict[str, Any]], filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    filters = filters or {}
+    query = (filters.get("query") or "").strip().lower()
+    players = filters.get("players")
+    duration = filters.get("duration")
+    found = []
+    for game in catalogue:
+        if query and query not in (game.get("title") or "").lower():
+            continue
+        if players and not ((game.get("min_players") or 0) <= players <= (game.get("max_players") or 0)):
+            continue
+        if duration and not (game.get("duration_minutes") and game["duration_minutes"] <= duration):
+            continue
+        found.append(dict(game))
+    return found
+
+
+@stale_fallback(default={})
+def get_game(game_id: int) -> Dict[str, Any]:
+    """Полная строка игры (с правилами и картинкой) для карточки"""
+    if not game_id:
+        return {}
+    if replica.is_ready():
+        found = replica.select("board_games", {"id": game_id}, limit=1)
+        return found[0] if found else {}
+    resp = execute(get_supabase().table("board_games").select("*").eq("id", game_id).limit(1))
+    return resp.data[0] if resp.data else {}
+
+
+def parse_game_params(text: str) -> Optional[Dict[str, int]]:
+    """«2-4 60» -> игроки от 2 до 4, партия 60 минут. Число игроков можно указать одно: «2 30»"""
+    match = re.fullmatch(r"\s*(\d+)\s*(?:[-–—]\s*(\d+))?\s+(\d+)\s*(?:мин\w*)?\s*", text or "")
+    if not match:
+        return None
+    min_players = int(match.group(1))
+    max_players = int(match.group(2) or min_players)
+    duration = int(match.group(3))
+    if not 0 < min_players <= max_players or duration <= 0:
+        return None
+    return {"min_players": min_players, "max_players": max_players, "duration_minutes": duration}
+
+
+def format_game_params(game: Dict[str, Any]) -> str:
+    parts = []
+    if game.get("min_players"):
+        low, high = game["min_players"], game.get("max_players") or game["min_players"]
+        parts.append(f"👥 {low}–{high}" if high != low else f"👥 {low}")
+    if game.get("duration_minutes"):
+        parts.append(f"⏱ ~{game['duration_minutes']} мин")
+    return ", ".join(parts)
@@ -0,0 +1,154 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+
+# Поля мероприятия, которых нет в стандарте iCalendar, передаются X-свойствами
+X_RESPONSIBLE = "X-NASTOY-RESPONSIBLE"
+X_QUANTITY = "X-NASTOY-QUANTITY"
+X_BOARD_GAMES = "X-NASTOY-BOARD-GAMES"
+X_PHOTO = "X-NASTOY-PHOTO"
+# Длительность мероприятия в фиде: в базе хранится только время начала
+EVENT_DURATION = "PT3H"
+
+
+def _unfold(text: str) -> List[str]:
+    """Склеивает перенесённые строки (RFC 5545, 3.1): продолжение начинается с пробела или таба"""
+    lines: List[str] = []
+    for raw in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        if raw[:1] in (" ", "\t") and lines:
+            lines[-1] += raw[1:]
+        elif raw:
+            lines.append(raw)
+    return lines
+
+
+def _unescape(value: str) -> str:
+    out = []
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch == "\\" and i + 1 < len(value):
+            nxt = value[i + 1]
+            out.append("\n" if nxt in "nN" else nxt)
+            i += 2
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _split_property(line: str) -> tuple[str, Dict[str, str], str]:
+    """'DTSTART;TZID=Europe/Moscow:20250825T183000' -> ('DTSTART', {'TZID': ...}, '20250825T183000')"""
+    head, _, value = line.partition(":")
+    name, *params = head.split(";")
+    parsed: Dict[str, str] = {}
+    for param in params:
+        key, _, param_value = param.partition("=")
+        parsed[key.upper()] = param_value.strip('"')
+    return name.upper(), parsed, value
+
+
+def _parse_dt(value: str, params: Dict[str, str]) -> Optional[str]:
+    """Дата начала в формате 'YYYY-MM-DD HH:MM' (как в таблице events).
+    UTC-время (суффикс Z) переводится в локальное время сервера; TZID считается локальным."""
+    if params.get("VALUE") == "DATE":
+        # Событие на весь день — без времени, как и в ручном вводе, отклоняется
+        return None
+    value = value.strip()
+    for fmt in ("%Y%m%dT%H%M%S", "%Y%m%dT%H%M"):
+        try:
+            dt = datetime.strptime(value.rstrip("Z"), fmt)
+        except ValueError:
+            continue
+        if value.endswith("Z"):
+            dt = dt.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        return dt.strftime("%Y-%m-%d %H:%M")
+    return None
+
+
+def parse_events(text: str) -> List[Dict[str, Optional[str]]]:
+    """Разбирает VEVENT-блоки календаря в черновики мероприятий (ключи как у EventForm).
+    Значения не проверяются — это делает импорт по тем же правилам, что и ручной ввод."""
+    events: List[Dict[str, Optional[str]]] = []
+    current: Optional[Dict[str, Optional[str]]] = None
+    for line in _unfold(text):
+        name, params, value = _split_property(line)
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            current = {"title": None, "description": None, "photo": None, "board_games": None, "datetime": None, "responsible": None, "quantity": None}
+        elif name == "END" and value.upper() == "VEVENT":
+            if current is not None:
+                events.append(current)
+            current = None
+        elif current is None:
+            continue
+        elif name == "SUMMARY":
+            current["title"] = _unescape(value)
+        elif name == "DESCRIPTION":
+            current["description"] = _unescape(value)
+        elif name == "DTSTART":
+            current["datetime"] = _parse_dt(value, params) or value
+        elif name == X_RESPONSIBLE:
+            current["responsible"] = _unescape(value)
+        elif name == X_QUANTITY:
+            current["quantity"] = value.strip()
+        elif name == X_BOARD_GAMES or (name == "CATEGORIES" and not current["board_games"]):
+            current["board_games"] = _unescape(value)
+        elif name == X_PHOTO:
+            current["photo"] = value.strip()
+    return events
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def _fold(line: str) -> str:
+    """Переносит строку длиннее 75 байт (RFC 5545, 3.1), не разрывая символы UTF-8"""
+    parts: List[str] = []
+    current = ""
+    size = 0
+    for ch in line:
+        width = len(ch.encode("utf-8"))
+        if size + width > 75:
+            parts.append(current)
+            current, size = " ", 1
+        current += ch
+        size += width
+    parts.append(current)
+    return "\r\n".join(parts)
+
+
+def render_calendar(events: List[Dict[str, Any]], name: str) -> bytes:
+    """Календарь .ics из строк таблицы events. Время — «плавающее» (без часового пояса),
+    как и в базе; X-свойства позволяют загрузить файл обратно через импорт."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Nastoy bot//RU",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    for event in events:
+        try:
+            start = datetime.strptime(event.get("date") or "", "%Y-%m-%d %H:%M")
+        except ValueError:
+            continue
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:event-{event.get('id')}@nastoy-bot",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}",
+            f"DURATION:{EVENT_DURATION}",
+            f"SUMMARY:{_escape(event.get('title') or 'Мероприятие')}",
+        ]
+        if event.get("description"):
+            lines.append(f"DESCRIPTION:{_escape(event['description'])}")
+        if event.get("is_cancelled"):
+            lines.append("STATUS:CANCELLED")
+        for prop, key in ((X_RESPONSIBLE, "responsible"), (X_QUANTITY, "quantity"), (X_BOARD_GAMES, "board_games")):
+            if event.get(key):
+                lines.append(f"{prop}:{_escape(str(event[key]))}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_fold(line) for line in lines) + "\r\n").encode("utf-8")
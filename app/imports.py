@@ -0,0 +1,93 @@
+import csv
+import io
+from typing import Any, Dict, List, Optional
+
+from .supabase_client import get_supabase, execute
+from . import replica
+from .ical import parse_events
+from .utils import parse_event_datetime, is_future_datetime_str, draft_missing_fields, invalidate_event_caches
+
+
+# Ограничения на загружаемый файл
+MAX_IMPORT_BYTES = 1024 * 1024
+MAX_IMPORT_ROWS = 500
+
+# Заголовки столбцов CSV -> ключи черновика мероприятия (как в EventForm)
+CSV_HEADERS = {
+    "title": "title", "название": "title",
+    "description": "description", "описание": "description",
+    "date": "datetime", "datetime": "datetime", "дата": "datetime",
+    "responsible": "responsible", "ответственные": "responsible",
+    "quantity": "quantity", "количество": "quantity",
+    "board_games": "board_games", "игры": "board_games",
+    "photo": "photo", "фото": "photo",
+}
+
+# Картинку нельзя передать в файле так же, как в диалоге; без неё карточка показывается текстом
+OPTIONAL_FIELDS = {"photo"}
+
+
+def _parse_csv(text: str) -> List[Dict[str, Optional[str]]]:
+    sample = text[:4096]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    drafts = []
+    for row in csv.DictReader(io.StringIO(text), dialect=dialect):
+        draft: Dict[str, Optional[str]] = {}
+        for header, value in row.items():
+            key = CSV_HEADERS.get((header or "").strip().lower())
+            if key:
+                draft[key] = (value or "").strip() or None
+        drafts.append(draft)
+    return drafts
+
+
+def parse_import_file(filename: str, payload: bytes) -> List[Dict[str, Optional[str]]]:
+    """Черновики мероприятий из CSV или .ics, без проверки значений"""
+    text = payload.decode("utf-8-sig", errors="replace")
+    if filename.lower().endswith(".ics") or text.lstrip().startswith("BEGIN:VCALENDAR"):
+        return parse_events(text)
+    return _parse_csv(text)
+
+
+def validate_drafts(drafts: List[Dict[str, Optional[str]]]) -> tuple[List[Dict[str, Any]], List[str]]:
+    """Проверяет черновики по правилам ручного ввода. Возвращает (строки для вставки в events, ошибки)"""
+    payloads: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    for number, draft in enumerate(drafts, start=1):
+        missing = [key for key in draft_missing_fields(draft) if key not in OPTIONAL_FIELDS]
+        if missing:
+            errors.append(f"№{number}: не заполнено: {', '.join(missing)}")
+            continue
+        parsed = parse_event_datetime(draft["datetime"] or "")
+        if not parsed:
+            errors.append(f"№{number}: некорректная дата «{draft['datetime']}»")
+            continue
+        if not is_future_datetime_str(parsed):
+            errors.append(f"№{number}: дата {parsed} в прошлом")
+            continue
+        try:
+            quantity = int(str(draft["quantity"]).strip())
+        except ValueError:
+            errors.append(f"№{number}: количество участников должно быть целым числом")
+            continue
+        payloads.append({
+            "title": draft["title"],
+            "description": draft["description"],
+            "photo": draft.get("photo"),
+            "board_games": draft["board_games"],
+            "date": parsed,
+            "responsible": draft["responsible"],
+            "quantity": quantity,
+        })
+    return payloads, errors
+
+
+def insert_events(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Вставляет все мероприятия одним запросом и возвращает созданные строки"""
+    rows = execute(get_supabase().table("events").insert(payloads)).data or []
+    replica.apply("events", rows)
+    invalidate_event_caches()
+    return rows
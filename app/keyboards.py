@@ -1,5 +1,9 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from typing import Dict, Any, List, Optional
+from aiogram.filters.callback_data import CallbackData
+from typing import Callable, Dict, Any, List, Optional, Type
+
+from .callbacks import AdminUsersCb, GlobalUserCb, GblCb, GamesCb, GamesItemCb, GameDraftCb, EventMenuCb, EventCb, FeedbackCb, DraftCb, EditDraftCb, ParticipantCb, BlacklistCb, UserHistoryCb, AttendanceCb, ExportCb, ImportCb, SeriesCb, UserDirCb, GamePickCb
+from .games import PAGE_SIZE as GAMES_PAGE_SIZE, PLAYER_FILTERS, DURATION_FILTERS
 
 
 def build_admin_main_keyboard() -> ReplyKeyboardMarkup:
@@ -9,7 +13,8 @@ def build_admin_main_keyboard() -> ReplyKeyboardMarkup:
         [KeyboardButton(text="Предстоящие мероприятия")],
         [KeyboardButton(text="Прошедшие мероприятия")],
         [KeyboardButton(text="Посмотреть всех участников бота")],
-        [KeyboardButton(text="Настольные игры")]
+        [KeyboardButton(text="Настольные игры")],
+        [KeyboardButton(text="Импорт мероприятий")]
     ]
     return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
 
@@ -41,14 +46,14 @@ def build_event_inline_keyboard(draft: Dict[str, Any]) -> InlineKeyboardMarkup:
     qty_mark = "✅" if is_filled(draft.get("quantity")) else ""
     
     keyboard.extend([
-        [InlineKeyboardButton(text=f"Название {title_mark}", callback_data="evt:title")],
-        [InlineKeyboardButton(text=f"Описание {desc_mark}", callback_data="evt:description")],
-        [InlineKeyboardButton(text=f"Картинка {photo_mark}", callback_data="evt:photo")],
-        [InlineKeyboardButton(text=f"Настолки {games_mark}", callback_data="evt:board_games")],
-        [InlineKeyboardButton(text=f"Дата и время {date_mark}", callback_data="evt:datetime")],
-        [InlineKeyboardButton(text=f"Ответственные {resp_mark}", callback_data="evt:responsible")],
-        [InlineKeyboardButton(text=f"Количество участников {qty_mark}", callback_data="evt:quantity")],
-        [InlineKeyboardButton(text="Подтвердить", callback_data="evt:confirm")]
+        [InlineKeyboardButton(text=f"Название {title_mark}", callback_data=DraftCb(action="title").pack())],
+        [InlineKeyboardButton(text=f"Описание {desc_mark}", callback_data=DraftCb(action="description").pack())],
+        [InlineKeyboardButton(text=f"Картинка {photo_mark}", callback_data=DraftCb(action="photo").pack())],
+        [InlineKeyboardButton(text=f"Настолки {games_mark}", callback_data=DraftCb(action="board_games").pack())],
+        [InlineKeyboardButton(text=f"Дата и время {date_mark}", callback_data=DraftCb(action="datetime").pack())],
+        [InlineKeyboardButton(text=f"Ответственные {resp_mark}", callback_data=DraftCb(action="responsible").pack())],
+        [InlineKeyboardButton(text=f"Количество участников {qty_mark}", callback_data=DraftCb(action="quantity").pack())],
+        [InlineKeyboardButton(text="Подтвердить", callback_data=DraftCb(action="confirm").pack())]
     ])
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
@@ -57,9 +62,20 @@ def build_event_inline_keyboard(draft: Dict[str, Any]) -> InlineKeyboardMarkup:
 def build_final_confirm_keyboard() -> InlineKeyboardMarkup:
     """Создает клавиатуру для финального подтверждения"""
     keyboard = [
-        [InlineKeyboardButton(text="Сохранить", callback_data="evt:final_confirm")],
-        [InlineKeyboardButton(text="Назад", callback_data="evt:final_cancel")]
+        [InlineKeyboardButton(text="Сохранить", callback_data=DraftCb(action="final_confirm").pack())],
+        [InlineKeyboardButton(text="🔁 Сохранить как серию", callback_data=SeriesCb(action="new", index=0).pack())],
+        [InlineKeyboardButton(text="Назад", callback_data=DraftCb(action="final_cancel").pack())]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def build_series_rule_keyboard(labels: List[str]) -> InlineKeyboardMarkup:
+    """Выбор правила повтора серии"""
+    keyboard = [
+        [InlineKeyboardButton(text=label, callback_data=SeriesCb(action="rule", index=i).pack())]
+        for i, label in enumerate(labels)
     ]
+    keyboard.append([InlineKeyboardButton(text="Назад", callback_data=DraftCb(action="final_cancel").pack())])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
@@ -77,7 +93,7 @@ def build_events_list_keyboard(events: List[Dict[str, Any]]) -> InlineKeyboardMa
         if is_completed:
             button_text += " ✅"
         
-        keyboard.append([InlineKeyboardButton(text=button_text, callback_data=f"event:show:{i}")])
+        keyboard.append([InlineKeyboardButton(text=button_text, callback_data=EventCb(action="show", index=i).pack())])
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -100,37 +116,49 @@ def build_event_edit_keyboard(event: Dict[str, Any]) -> InlineKeyboardMarkup:
     qty_mark = "✅" if is_filled(event.get("quantity")) else ""
     
     keyboard.extend([
-        [InlineKeyboardButton(text=f"Название {title_mark}", callback_data="evt_edit:title")],
-        [InlineKeyboardButton(text=f"Описание {desc_mark}", callback_data="evt_edit:description")],
-        [InlineKeyboardButton(text=f"Картинка {photo_mark}", callback_data="evt_edit:photo")],
-        [InlineKeyboardButton(text=f"Настолки {games_mark}", callback_data="evt_edit:board_games")],
-        [InlineKeyboardButton(text=f"Дата и время {date_mark}", callback_data="evt_edit:datetime")],
-        [InlineKeyboardButton(text=f"Ответственные {resp_mark}", callback_data="evt_edit:responsible")],
-        [InlineKeyboardButton(text=f"Количество участников {qty_mark}", callback_data="evt_edit:quantity")],
-        [InlineKeyboardButton(text="Готово", callback_data="evt_edit:confirm")]
+        [InlineKeyboardButton(text=f"Название {title_mark}", callback_data=EditDraftCb(action="title").pack())],
+        [InlineKeyboardButton(text=f"Описание {desc_mark}", callback_data=EditDraftCb(action="description").pack())],
+        [InlineKeyboardButton(text=f"Картинка {photo_mark}", callback_data=EditDraftCb(action="photo").pack())],
+        [InlineKeyboardButton(text=f"Настолки {games_mark}", callback_data=EditDraftCb(action="board_games").pack())],
+        [InlineKeyboardButton(text=f"Дата и время {date_mark}", callback_data=EditDraftCb(action="datetime").pack())],
+        [InlineKeyboardButton(text=f"Ответственные {resp_mark}", callback_data=EditDraftCb(action="responsible").pack())],
+        [InlineKeyboardButton(text=f"Количество участников {qty_mark}", callback_data=EditDraftCb(action="quantity").pack())],
+        [InlineKeyboardButton(text="Готово", callback_data=EditDraftCb(action="confirm").pack())]
     ])
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def build_edit_final_confirm_keyboard() -> InlineKeyboardMarkup:
+def build_edit_final_confirm_keyboard(in_series: bool = False) -> InlineKeyboardMarkup:
     keyboard = [
-        [InlineKeyboardButton(text="Сохранить изменения", callback_data="evt_edit:final_confirm")],
-        [InlineKeyboardButton(text="Назад", callback_data="evt_edit:final_cancel")]
+        [InlineKeyboardButton(text="Сохранить изменения", callback_data=EditDraftCb(action="final_confirm").pack())],
     ]
+    if in_series:
+        keyboard.append([InlineKeyboardButton(text="🔁 Сохранить для всей серии", callback_data=SeriesCb(action="edit_confirm", index=0).pack())])
+    keyboard.append([InlineKeyboardButton(text="Назад", callback_data=EditDraftCb(action="final_cancel").pack())])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def build_event_management_keyboard(event_index: int) -> InlineKeyboardMarkup:
+def build_event_management_keyboard(event_index: int, in_series: bool = False) -> InlineKeyboardMarkup:
     """Создает клавиатуру управления мероприятием для админов"""
     keyboard = [
-        [InlineKeyboardButton(text="Изменить мероприятие", callback_data=f"event:edit:{event_index}")],
-        [InlineKeyboardButton(text="Посмотреть участников", callback_data=f"event:participants:{event_index}")],
-        [InlineKeyboardButton(text="Чёрный список", callback_data=f"event:blacklist:{event_index}")],
-        [InlineKeyboardButton(text="Отправить рассылку", callback_data=f"event:broadcast:{event_index}")],
-        [InlineKeyboardButton(text="Отменить мероприятие", callback_data=f"event:cancel:{event_index}")],
-        [InlineKeyboardButton(text="Завершить мероприятие", callback_data=f"event:complete:{event_index}")],
-        [InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="event:back_to_list")]
+        [InlineKeyboardButton(text="Изменить мероприятие", callback_data=EventCb(action="edit", index=event_index).pack())],
+        [InlineKeyboardButton(text="Посмотреть участников", callback_data=EventCb(action="participants", index=event_index).pack())],
+        [InlineKeyboardButton(text="Чёрный список", callback_data=EventCb(action="blacklist", index=event_index).pack())],
+        [InlineKeyboardButton(text="Отправить рассылку", callback_data=EventCb(action="broadcast", index=event_index).pack())],
+        [InlineKeyboardButton(text="Отменить мероприятие", callback_data=EventCb(action="cancel", index=event_index).pack())],
+        [InlineKeyboardButton(text="Завершить мероприятие", callback_data=EventCb(action="complete", index=event_index).pack())],
+    ]
+    if in_series:
+        keyboard.append([InlineKeyboardButton(text="🔁 Отменить всю серию", callback_data=SeriesCb(action="cancel", index=event_index).pack())])
+    keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data=EventMenuCb(action="back_to_list").pack())])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def build_series_cancel_confirm_keyboard(event_index: int) -> InlineKeyboardMarkup:
+    keyboard = [
+        [InlineKeyboardButton(text="✅ Да, отменить все будущие даты", callback_data=SeriesCb(action="cancel_confirm", index=event_index).pack())],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data=EventCb(action="show", index=event_index).pack())],
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -157,13 +185,18 @@ def build_participants_list_keyboard(participants: List[Dict[str, Any]], event_i
         
         keyboard.append([InlineKeyboardButton(
             text=button_text, 
-            callback_data=f"participant:show:{event_index}:{i}"
+            callback_data=ParticipantCb(action="show", event_index=event_index, participant_index=i).pack()
         )])
     
+    keyboard.append([InlineKeyboardButton(
+        text="📥 Выгрузить в CSV",
+        callback_data=ExportCb(action="participants", index=event_index).pack()
+    )])
+    
     # Добавляем кнопку "Назад"
     keyboard.append([InlineKeyboardButton(
         text="⬅️ Назад к мероприятию", 
-        callback_data=f"event:show:{event_index}"
+        callback_data=EventCb(action="show", index=event_index).pack()
     )])
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
@@ -172,10 +205,10 @@ def build_participants_list_keyboard(participants: List[Dict[str, Any]], event_i
 def build_participant_info_keyboard(event_index: int, participant_index: int) -> InlineKeyboardMarkup:
     """Создает клавиатуру для информации об участнике"""
     keyboard = [
-        [InlineKeyboardButton(text="💬 Написать участнику", callback_data=f"participant:message:{event_index}:{participant_index}")],
-        [InlineKeyboardButton(text="🚫 Добавить в ЧС", callback_data=f"participant:blacklist:{event_index}:{participant_index}")],
-        [InlineKeyboardButton(text="❌ Кикнуть", callback_data=f"participant:remove:{event_index}:{participant_index}")],
-        [InlineKeyboardButton(text="⬅️ Назад к участникам", callback_data=f"event:participants:{event_index}")]
+        [InlineKeyboardButton(text="💬 Написать участнику", callback_data=ParticipantCb(action="message", event_index=event_index, participant_index=participant_index).pack())],
+        [InlineKeyboardButton(text="🚫 Добавить в ЧС", callback_data=ParticipantCb(action="blacklist", event_index=event_index, participant_index=participant_index).pack())],
+        [InlineKeyboardButton(text="❌ Кикнуть", callback_data=ParticipantCb(action="remove", event_index=event_index, participant_index=participant_index).pack())],
+        [InlineKeyboardButton(text="⬅️ Назад к участникам", callback_data=EventCb(action="participants", index=event_index).pack())]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -185,15 +218,15 @@ def build_contact_responsible_keyboard(event_index: int, responsibles: List[str]
     for tg in responsibles:
         username_clean = tg.lstrip("@")
         keyboard.append([InlineKeyboardButton(text=f"🔗 Открыть профиль {tg}", url=f"https://t.me/{username_clean}")])
-    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=f"event:show:{event_index}")])
+    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=EventCb(action="show", index=event_index).pack())])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
 def build_cancel_message_keyboard(event_index: int, participant_index: int) -> InlineKeyboardMarkup:
     """Создает клавиатуру для отмены отправки сообщения"""
     keyboard = [
-        [InlineKeyboardButton(text="❌ Отменить", callback_data=f"participant:cancel_message:{event_index}:{participant_index}")],
-        [InlineKeyboardButton(text="⬅️ Назад к участнику", callback_data=f"participant:show:{event_index}:{participant_index}")]
+        [InlineKeyboardButton(text="❌ Отменить", callback_data=ParticipantCb(action="cancel_message", event_index=event_index, participant_index=participant_index).pack())],
+        [InlineKeyboardButton(text="⬅️ Назад к участнику", callback_data=ParticipantCb(action="show", event_index=event_index, participant_index=participant_index).pack())]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -201,9 +234,9 @@ def build_cancel_message_keyboard(event_index: int, participant_index: int) -> I
 def build_blacklist_confirm_keyboard(event_index: int, participant_index: int) -> InlineKeyboardMarkup:
     """Создает клавиатуру для подтверждения добавления в черный список"""
     keyboard = [
-        [InlineKeyboardButton(text="✅ Подтвердить", callback_data=f"participant:confirm_blacklist:{event_index}:{participant_index}")],
-        [InlineKeyboardButton(text="❌ Отменить", callback_data=f"participant:cancel_blacklist:{event_index}:{participant_index}")],
-        [InlineKeyboardButton(text="⬅️ Назад к участнику", callback_data=f"participant:show:{event_index}:{participant_index}")]
+        [InlineKeyboardButton(text="✅ Подтвердить", callback_data=ParticipantCb(action="confirm_blacklist", event_index=event_index, participant_index=participant_index).pack())],
+        [InlineKeyboardButton(text="❌ Отменить", callback_data=ParticipantCb(action="cancel_blacklist", event_index=event_index, participant_index=participant_index).pack())],
+        [InlineKeyboardButton(text="⬅️ Назад к участнику", callback_data=ParticipantCb(action="show", event_index=event_index, participant_index=participant_index).pack())]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -224,13 +257,13 @@ def build_blacklist_view_keyboard(blacklist: List[Dict[str, Any]], event_index:
         
         keyboard.append([InlineKeyboardButton(
             text=button_text, 
-            callback_data=f"blacklist:show:{event_index}:{i}"
+            callback_data=BlacklistCb(action="show", event_index=event_index, index=i).pack()
         )])
     
     # Добавляем кнопку "Назад"
     keyboard.append([InlineKeyboardButton(
         text="⬅️ Назад к мероприятию", 
-        callback_data=f"event:show:{event_index}"
+        callback_data=EventCb(action="show", index=event_index).pack()
     )])
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
@@ -239,9 +272,9 @@ def build_blacklist_view_keyboard(blacklist: List[Dict[str, Any]], event_index:
 def build_blacklist_user_info_keyboard(event_index: int, blacklist_index: int) -> InlineKeyboardMarkup:
     """Создает клавиатуру для информации о пользователе в черном списке"""
     keyboard = [
-        [InlineKeyboardButton(text="💬 Написать", callback_data=f"blacklist:message:{event_index}:{blacklist_index}")],
-        [InlineKeyboardButton(text="✅ Убрать из ЧС", callback_data=f"blacklist:remove:{event_index}:{blacklist_index}")],
-        [InlineKeyboardButton(text="⬅️ Назад к ЧС", callback_data=f"event:blacklist:{event_index}")]
+        [InlineKeyboardButton(text="💬 Написать", callback_data=BlacklistCb(action="message", event_index=event_index, index=blacklist_index).pack())],
+        [InlineKeyboardButton(text="✅ Убрать из ЧС", callback_data=BlacklistCb(action="remove", event_index=event_index, index=blacklist_index).pack())],
+        [InlineKeyboardButton(text="⬅️ Назад к ЧС", callback_data=EventCb(action="blacklist", index=event_index).pack())]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -249,9 +282,31 @@ def build_blacklist_user_info_keyboard(event_index: int, blacklist_index: int) -
 def build_past_event_actions_keyboard(event_index: int) -> InlineKeyboardMarkup:
     """Клавиатура для прошедшего мероприятия (для админов)"""
     keyboard = [
-        [InlineKeyboardButton(text="👥 Участники", callback_data=f"event:participants:{event_index}")],
-        [InlineKeyboardButton(text="📊 Собрать статистику", callback_data=f"event:collect_stats:{event_index}")],
-        [InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="event:back_to_list")]
+        [InlineKeyboardButton(text="👥 Участники", callback_data=EventCb(action="participants", index=event_index).pack())],
+        [InlineKeyboardButton(text="📊 Собрать статистику", callback_data=EventCb(action="collect_stats", index=event_index).pack())],
+        [InlineKeyboardButton(text="📈 Статистика", callback_data=EventCb(action="feedback_stats", index=event_index).pack())],
+        [InlineKeyboardButton(text="📥 Отзывы в CSV", callback_data=ExportCb(action="feedback", index=event_index).pack())],
+        [InlineKeyboardButton(text="⬅️ Назад к списку", callback_data=EventMenuCb(action="back_to_list").pack())]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def build_import_cancel_keyboard() -> InlineKeyboardMarkup:
+    keyboard = [[InlineKeyboardButton(text="❌ Отменить", callback_data=ImportCb(action="cancel").pack())]]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def build_import_preview_keyboard(has_events: bool) -> InlineKeyboardMarkup:
+    keyboard = []
+    if has_events:
+        keyboard.append([InlineKeyboardButton(text="✅ Создать мероприятия", callback_data=ImportCb(action="confirm").pack())])
+    keyboard.append([InlineKeyboardButton(text="❌ Отменить", callback_data=ImportCb(action="cancel").pack())])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def build_feedback_stats_keyboard(event_index: int) -> InlineKeyboardMarkup:
+    keyboard = [
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data=EventCb(action="show", index=event_index).pack())]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -259,10 +314,10 @@ def build_past_event_actions_keyboard(event_index: int) -> InlineKeyboardMarkup:
 def build_feedback_rating_keyboard(event_id: int) -> InlineKeyboardMarkup:
     """Клавиатура с оценками 1-10 для участника"""
     row1 = [
-        InlineKeyboardButton(text=str(i), callback_data=f"feedback:rate:{event_id}:{i}") for i in range(1, 6)
+        InlineKeyboardButton(text=str(i), callback_data=FeedbackCb(action="rate", event_id=event_id, rating=i).pack()) for i in range(1, 6)
     ]
     row2 = [
-        InlineKeyboardButton(text=str(i), callback_data=f"feedback:rate:{event_id}:{i}") for i in range(6, 11)
+        InlineKeyboardButton(text=str(i), callback_data=FeedbackCb(action="rate", event_id=event_id, rating=i).pack()) for i in range(6, 11)
     ]
     return InlineKeyboardMarkup(inline_keyboard=[row1, row2])
 
@@ -270,7 +325,7 @@ def build_feedback_rating_keyboard(event_id: int) -> InlineKeyboardMarkup:
 def build_feedback_comment_keyboard(event_id: int, rating: int) -> InlineKeyboardMarkup:
     """Клавиатура при вводе комментария: кнопка пропуска"""
     keyboard = [
-        [InlineKeyboardButton(text="⏭ Пропустить", callback_data=f"feedback:skip_comment:{event_id}:{rating}")]
+        [InlineKeyboardButton(text="⏭ Пропустить", callback_data=FeedbackCb(action="skip_comment", event_id=event_id, rating=rating).pack())]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -278,65 +333,111 @@ def build_feedback_comment_keyboard(event_id: int, rating: int) -> InlineKeyboar
 def build_admin_users_main_keyboard() -> InlineKeyboardMarkup:
     """Главное меню раздела 'Посмотреть всех участников бота'"""
     keyboard = [
-        [InlineKeyboardButton(text="👥 Участники", callback_data="admin_users:participants")],
-        [InlineKeyboardButton(text="🚫 Чёрный список", callback_data="admin_users:blacklist")],
-        [InlineKeyboardButton(text="🛡 Админы", callback_data="admin_users:admins")],
-        [InlineKeyboardButton(text="🎲 Настольные игры", callback_data="admin_users:games")],
+        [InlineKeyboardButton(text="👥 Участники", callback_data=AdminUsersCb(section="participants").pack())],
+        [InlineKeyboardButton(text="🚫 Чёрный список", callback_data=AdminUsersCb(section="blacklist").pack())],
+        [InlineKeyboardButton(text="🛡 Админы", callback_data=AdminUsersCb(section="admins").pack())],
+        [InlineKeyboardButton(text="🎲 Настольные игры", callback_data=AdminUsersCb(section="games").pack())],
+        [InlineKeyboardButton(text="📊 Посещаемость", callback_data=AttendanceCb(action="page", page=0).pack())],
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def build_users_list_keyboard(users: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
+def build_users_list_keyboard(users: List[Dict[str, Any]], page: int = 0, has_more: bool = False, query: Optional[str] = None) -> InlineKeyboardMarkup:
+    """Страница каталога пользователей: карточка и быстрые действия в одной строке"""
     keyboard = []
     for i, u in enumerate(users):
         username = u.get("tg_username") or u.get("username") or "?"
-        keyboard.append([InlineKeyboardButton(text=username, callback_data=f"global_user:show:{i}")])
-    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_users:back")])
+        keyboard.append([
+            InlineKeyboardButton(text=username, callback_data=GlobalUserCb(action="show", index=i).pack()),
+            InlineKeyboardButton(text="💬", callback_data=GlobalUserCb(action="message", index=i).pack()),
+            InlineKeyboardButton(text="📜", callback_data=GlobalUserCb(action="history", index=i).pack()),
+        ])
+    pager = _pager_row(page, has_more, lambda p: UserDirCb(action="page", page=p))
+    if pager:
+        keyboard.append(pager)
+    keyboard.append([InlineKeyboardButton(text="🔎 Найти по нику", callback_data=UserDirCb(action="search", page=0).pack())])
+    if query:
+        keyboard.append([InlineKeyboardButton(text="✖️ Сбросить поиск", callback_data=UserDirCb(action="reset", page=0).pack())])
+    keyboard.append([InlineKeyboardButton(text="📥 Выгрузить в CSV", callback_data=ExportCb(action="users", index=0).pack())])
+    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminUsersCb(section="back").pack())])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def build_global_user_info_keyboard(user_index: int) -> InlineKeyboardMarkup:
+def build_global_user_info_keyboard(user_index: int, back_page: int = 0) -> InlineKeyboardMarkup:
     keyboard = [
-        [InlineKeyboardButton(text="💬 Написать", callback_data=f"global_user:message:{user_index}")],
-        [InlineKeyboardButton(text="🚫 Добавить в ЧС", callback_data=f"global_user:blacklist_add:{user_index}")],
-        [InlineKeyboardButton(text="📜 История мероприятий", callback_data=f"global_user:history:{user_index}")],
-        [InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_users:participants")],
+        [InlineKeyboardButton(text="💬 Написать", callback_data=GlobalUserCb(action="message", index=user_index).pack())],
+        [InlineKeyboardButton(text="🚫 Добавить в ЧС", callback_data=GlobalUserCb(action="blacklist_add", index=user_index).pack())],
+        [InlineKeyboardButton(text="📜 История мероприятий", callback_data=GlobalUserCb(action="history", index=user_index).pack())],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data=UserDirCb(action="page", page=back_page).pack())],
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+def _pager_row(page: int, has_more: bool, page_cb: Callable[[int], CallbackData]) -> List[InlineKeyboardButton]:
+    """Кнопки «назад/вперёд» постраничного списка"""
+    row = []
+    if page > 0:
+        row.append(InlineKeyboardButton(text="◀️", callback_data=page_cb(page - 1).pack()))
+    if has_more:
+        row.append(InlineKeyboardButton(text="▶️", callback_data=page_cb(page + 1).pack()))
+    return row
+
+
+def build_user_history_keyboard(user_index: int, page: int, has_more: bool, archived: bool = False) -> InlineKeyboardMarkup:
+    keyboard = []
+    action = "archive" if archived else "page"
+    pager = _pager_row(page, has_more, lambda p: UserHistoryCb(action=action, index=user_index, page=p))
+    if pager:
+        keyboard.append(pager)
+    if archived:
+        keyboard.append([InlineKeyboardButton(text="📜 Недавние мероприятия", callback_data=UserHistoryCb(action="page", index=user_index, page=0).pack())])
+    else:
+        keyboard.append([InlineKeyboardButton(text="🗄 Архив", callback_data=UserHistoryCb(action="archive", index=user_index, page=0).pack())])
+    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=GlobalUserCb(action="show", index=user_index).pack())])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def build_attendance_keyboard(page: int, has_more: bool) -> InlineKeyboardMarkup:
+    keyboard = []
+    pager = _pager_row(page, has_more, lambda p: AttendanceCb(action="page", page=p))
+    if pager:
+        keyboard.append(pager)
+    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminUsersCb(section="back").pack())])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
 def build_global_blacklist_list_keyboard(users: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
     keyboard = []
     for i, u in enumerate(users):
         username = u.get("user_tg_username") or u.get("tg_username") or "?"
-        keyboard.append([InlineKeyboardButton(text=f"🚫 {username}", callback_data=f"gbl:blacklist:show:{i}")])
-    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_users:back")])
+        keyboard.append([InlineKeyboardButton(text=f"🚫 {username}", callback_data=GblCb(section="blacklist", action="show", index=i).pack())])
+    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminUsersCb(section="back").pack())])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
 def build_global_blacklist_user_keyboard(user_index: int) -> InlineKeyboardMarkup:
     keyboard = [
-        [InlineKeyboardButton(text="💬 Написать", callback_data=f"gbl:blacklist:message:{user_index}")],
-        [InlineKeyboardButton(text="✅ Исключить из ЧС", callback_data=f"gbl:blacklist:remove:{user_index}")],
-        [InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_users:blacklist")],
+        [InlineKeyboardButton(text="💬 Написать", callback_data=GblCb(section="blacklist", action="message", index=user_index).pack())],
+        [InlineKeyboardButton(text="✅ Исключить из ЧС", callback_data=GblCb(section="blacklist", action="remove", index=user_index).pack())],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminUsersCb(section="blacklist").pack())],
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def build_admins_list_keyboard(admins: List[Dict[str, Any]], callback_prefix: str = "gbl:admins:show") -> InlineKeyboardMarkup:
+def build_admins_list_keyboard(admins: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
     keyboard = []
     for i, a in enumerate(admins):
         tg = a.get("tg") or a.get("tg_username") or "?"
-        keyboard.append([InlineKeyboardButton(text=tg, callback_data=f"{callback_prefix}:{i}")])
-    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_users:back")])
+        keyboard.append([InlineKeyboardButton(text=tg, callback_data=GblCb(section="admins", action="show", index=i).pack())])
+    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminUsersCb(section="back").pack())])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
 def build_admin_info_keyboard(admin_index: int) -> InlineKeyboardMarkup:
     keyboard = [
-        [InlineKeyboardButton(text="💬 Написать", callback_data=f"gbl:admin:message:{admin_index}")],
-        [InlineKeyboardButton(text="📋 Список прошедших мероприятий", callback_data=f"gbl:admin:past_events:{admin_index}")],
-        [InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_users:admins")],
+        [InlineKeyboardButton(text="💬 Написать", callback_data=GblCb(section="admin", action="message", index=admin_index).pack())],
+        [InlineKeyboardButton(text="📋 Список прошедших мероприятий", callback_data=GblCb(section="admin", action="past_events", index=admin_index).pack())],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminUsersCb(section="admins").pack())],
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
@@ -346,42 +447,71 @@ def build_cancel_global_message_keyboard(back_callback: str) -> InlineKeyboardMa
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def build_admins_selection_keyboard(admins: List[Dict[str, Any]], selected_usernames: List[str], done_callback: str, toggle_prefix: str, back_callback: str) -> InlineKeyboardMarkup:
+def build_admins_selection_keyboard(admins: List[Dict[str, Any]], selected_usernames: List[str], menu_cb: Type[CallbackData], item_cb: Type[CallbackData]) -> InlineKeyboardMarkup:
+    """menu_cb/item_cb — схемы черновика (DraftCb/DraftItemCb или EditDraftCb/EditDraftItemCb)"""
     keyboard: List[List[InlineKeyboardButton]] = []
     for i, a in enumerate(admins):
         tg = a.get("tg") or a.get("tg_username") or "?"
         mark = "✅ " if tg in selected_usernames else ""
-        keyboard.append([InlineKeyboardButton(text=f"{mark}{tg}", callback_data=f"{toggle_prefix}:{i}")])
-    keyboard.append([InlineKeyboardButton(text="✅ Готово", callback_data=done_callback)])
-    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=back_callback)])
+        keyboard.append([InlineKeyboardButton(text=f"{mark}{tg}", callback_data=item_cb(action="responsible_toggle", index=i).pack())])
+    keyboard.append([InlineKeyboardButton(text="✅ Готово", callback_data=menu_cb(action="responsible_done").pack())])
+    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=menu_cb(action="responsible_back").pack())])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def build_games_list_keyboard(games: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
+def _game_filter_rows(flow: str, page: int, has_more: bool, filters: Dict[str, Any]) -> List[List[InlineKeyboardButton]]:
+    """Листание, фильтры по игрокам и длительности и поиск по названию для списков настолок"""
+    rows: List[List[InlineKeyboardButton]] = []
+    pager = _pager_row(page, has_more, lambda p: GamePickCb(flow=flow, action="page", value=p))
+    if pager:
+        rows.append(pager)
+    rows.append([
+        InlineKeyboardButton(text=f"{'✅ ' if filters.get('players') == n else ''}👥 {n}", callback_data=GamePickCb(flow=flow, action="players", value=n).pack())
+        for n in PLAYER_FILTERS
+    ])
+    rows.append([
+        InlineKeyboardButton(text=f"{'✅ ' if filters.get('duration') == n else ''}⏱ ≤{n}", callback_data=GamePickCb(flow=flow, action="duration", value=n).pack())
+        for n in DURATION_FILTERS
+    ])
+    search_row = [InlineKeyboardButton(text="🔎 Поиск по названию", callback_data=GamePickCb(flow=flow, action="search", value=0).pack())]
+    if filters.get("query"):
+        search_row.append(InlineKeyboardButton(text=f"✖️ «{filters['query']}»", callback_data=GamePickCb(flow=flow, action="clear_query", value=0).pack()))
+    rows.append(search_row)
+    return rows
+
+
+def build_games_list_keyboard(games: List[Dict[str, Any]], page: int = 0, filters: Optional[Dict[str, Any]] = None) -> InlineKeyboardMarkup:
     keyboard: List[List[InlineKeyboardButton]] = []
-    for i, g in enumerate(games):
+    start = max(page, 0) * GAMES_PAGE_SIZE
+    for i, g in enumerate(games[start:start + GAMES_PAGE_SIZE], start=start):
         title = g.get("title") or "Без названия"
-        keyboard.append([InlineKeyboardButton(text=title, callback_data=f"games:show:{i}")])
-    keyboard.append([InlineKeyboardButton(text="➕ Создать игру", callback_data="games:create")])
-    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_users:back")])
+        keyboard.append([InlineKeyboardButton(text=title, callback_data=GamesItemCb(action="show", index=i).pack())])
+    keyboard.extend(_game_filter_rows("list", page, start + GAMES_PAGE_SIZE < len(games), filters or {}))
+    keyboard.append([InlineKeyboardButton(text="➕ Создать игру", callback_data=GamesCb(action="create").pack())])
+    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=AdminUsersCb(section="back").pack())])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def build_game_view_keyboard() -> InlineKeyboardMarkup:
+def build_game_view_keyboard(page: int = 0) -> InlineKeyboardMarkup:
     keyboard = [
-        [InlineKeyboardButton(text="⬅️ К списку игр", callback_data="admin_users:games")]
+        [InlineKeyboardButton(text="⬅️ К списку игр", callback_data=GamePickCb(flow="list", action="page", value=page).pack())]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def build_board_games_selection_keyboard(games: List[Dict[str, Any]], selected_titles: List[str], done_callback: str, toggle_prefix: str, back_callback: str) -> InlineKeyboardMarkup:
+def build_board_games_selection_keyboard(games: List[Dict[str, Any]], selected_titles: List[str], menu_cb: Type[CallbackData], item_cb: Type[CallbackData], page: int = 0, filters: Optional[Dict[str, Any]] = None) -> InlineKeyboardMarkup:
     keyboard: List[List[InlineKeyboardButton]] = []
-    for i, g in enumerate(games):
+    start = max(page, 0) * GAMES_PAGE_SIZE
+    for i, g in enumerate(games[start:start + GAMES_PAGE_SIZE], start=start):
         title = g.get("title") or "Без названия"
         mark = "✅ " if title in selected_titles else ""
-        keyboard.append([InlineKeyboardButton(text=f"{mark}{title}", callback_data=f"{toggle_prefix}:{i}")])
-    keyboard.append([InlineKeyboardButton(text="✅ Готово", callback_data=done_callback)])
-    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=back_callback)])
+        keyboard.append([InlineKeyboardButton(text=f"{mark}{title}", callback_data=item_cb(action="board_games_toggle", index=i).pack())])
+    # Выбранные на других страницах или скрытые фильтром игры видны в счётчике
+    flow = "evt_edit" if menu_cb is EditDraftCb else "evt"
+    keyboard.extend(_game_filter_rows(flow, page, start + GAMES_PAGE_SIZE < len(games), filters or {}))
+    done_text = f"✅ Готово ({len(selected_titles)})" if selected_titles else "✅ Готово"
+    keyboard.append([InlineKeyboardButton(text=done_text, callback_data=menu_cb(action="board_games_done").pack())])
+    keyboard.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=menu_cb(action="board_games_back").pack())])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
@@ -392,18 +522,20 @@ def build_game_inline_keyboard(draft: Dict[str, Any]) -> InlineKeyboardMarkup:
     title_mark = "✅" if is_filled(draft.get("title")) else ""
     photo_mark = "✅" if is_filled(draft.get("photo")) else ""
     rules_mark = "✅" if is_filled(draft.get("rules")) else ""
+    params_mark = "✅" if is_filled(draft.get("min_players")) else ""
     keyboard.extend([
-        [InlineKeyboardButton(text=f"Картинка {photo_mark}", callback_data="game:photo")],
-        [InlineKeyboardButton(text=f"Название {title_mark}", callback_data="game:title")],
-        [InlineKeyboardButton(text=f"Правила {rules_mark}", callback_data="game:rules")],
-        [InlineKeyboardButton(text="Подтвердить", callback_data="game:confirm")],
+        [InlineKeyboardButton(text=f"Картинка {photo_mark}", callback_data=GameDraftCb(action="photo").pack())],
+        [InlineKeyboardButton(text=f"Название {title_mark}", callback_data=GameDraftCb(action="title").pack())],
+        [InlineKeyboardButton(text=f"Игроки и время {params_mark}", callback_data=GameDraftCb(action="params").pack())],
+        [InlineKeyboardButton(text=f"Правила {rules_mark}", callback_data=GameDraftCb(action="rules").pack())],
+        [InlineKeyboardButton(text="Подтвердить", callback_data=GameDraftCb(action="confirm").pack())],
     ])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
 def build_game_final_confirm_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
-        [InlineKeyboardButton(text="Сохранить", callback_data="game:final_confirm")],
-        [InlineKeyboardButton(text="Назад", callback_data="game:final_cancel")],
+        [InlineKeyboardButton(text="Сохранить", callback_data=GameDraftCb(action="final_confirm").pack())],
+        [InlineKeyboardButton(text="Назад", callback_data=GameDraftCb(action="final_cancel").pack())],
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
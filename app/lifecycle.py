@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from aiogram import Bot
+
+from .config import EVENT_AUTO_COMPLETE_HOURS, EVENT_FEEDBACK_LOOKBACK_DAYS, LIFECYCLE_INTERVAL
+from .supabase_client import get_supabase, execute
+from . import replica
+from .keyboards import build_feedback_rating_keyboard
+from .notifications import send_batch
+from .utils import invalidate_event_caches
+
+
+def complete_past_events() -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Завершает все мероприятия, начавшиеся больше EVENT_AUTO_COMPLETE_HOURS часов назад,
+    одним обновлением. Возвращает (завершённые мероприятия, записанных участников с chat_id).
+    Участники берутся только для мероприятий моложе EVENT_FEEDBACK_LOOKBACK_DAYS дней —
+    при первом запуске не стоит спрашивать оценку за мероприятия многомесячной давности."""
+    now = datetime.now()
+    cutoff = (now - timedelta(hours=EVENT_AUTO_COMPLETE_HOURS)).strftime("%Y-%m-%d %H:%M")
+    feedback_since = (now - timedelta(days=EVENT_FEEDBACK_LOOKBACK_DAYS)).strftime("%Y-%m-%d %H:%M")
+    supabase = get_supabase()
+    rows = execute(
+        supabase
+        .table("events")
+        .update({"is_completed": True})
+        .eq("is_completed", False)
+        .eq("is_cancelled", False)
+        .lt("date", cutoff)
+    ).data or []
+    if not rows:
+        return [], []
+    replica.apply("events", rows)
+    invalidate_event_caches()
+    recent = [row for row in rows if (row.get("date") or "") >= feedback_since]
+    if not recent:
+        return rows, []
+    registrations = execute(
+        supabase
+        .table("event_registrations")
+        .select("user_tg_username, event_id, users(chat_id)")
+        .in_("event_id", [row["id"] for row in recent])
+        .eq("status", "registered")
+    ).data or []
+    return rows, registrations
+
+
+def completion_messages(events: List[Dict[str, Any]], registrations: List[Dict[str, Any]]) -> List[Tuple[int, str, Any]]:
+    """Одно сообщение на участника и мероприятие: уведомление о завершении вместе с запросом оценки"""
+    by_id = {event["id"]: event for event in events}
+    messages = []
+    for reg in registrations:
+        chat_id = (reg.get("users") or {}).get("chat_id") if isinstance(reg.get("users"), dict) else None
+        event = by_id.get(reg.get("event_id"))
+        if not chat_id or not event:
+            continue
+        text = (
+            f"🏁 Мероприятие «{event.get('title', 'Мероприятие')}» ({event.get('date') or '-'}) завершено.\n\n"
+            "Спасибо за участие! Оцените мероприятие по шкале от 1 до 10 — после оценки можно добавить комментарий."
+        )
+        messages.append((chat_id, text, build_feedback_rating_keyboard(event["id"])))
+    return messages
+
+
+async def run(bot: Bot) -> None:
+    """Периодически завершает забытые мероприятия, чтобы они не висели в «предстоящих»"""
+    if EVENT_AUTO_COMPLETE_HOURS <= 0:
+        return
+    while True:
+        try:
+            events, registrations = await asyncio.to_thread(complete_past_events)
+            if events:
+                sent, failed = await send_batch(bot, completion_messages(events, registrations))
+                print(f"LIFECYCLE: завершено мероприятий: {len(events)}, уведомлений: {sent}, ошибок: {failed}")
+        except Exception as e:
+            print(f"LIFECYCLE_ERROR: {e}")
+        await asyncio.sleep(LIFECYCLE_INTERVAL)
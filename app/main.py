@@ -6,11 +6,14 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from .config import BOT_TOKEN, validate_config
 from .routers.start import router as start_router
 from .routers.events import router as events_router
-from .utils import get_events_needing_reminders, mark_event_reminder_sent, get_event_participants
+from .routers.inline import router as inline_router
+from .middlewares import UserContextMiddleware, UpdateSchedulerMiddleware
+from . import replica, changefeed, reminders, feed, series, lifecycle, archive, dedupe
 
 
 async def run() -> None:
 	validate_config()
+	changefeed.validate()
 	assert BOT_TOKEN
 	# Совместимая инициализация для разных версий aiogram
 	try:
@@ -21,43 +24,31 @@ async def run() -> None:
 		bot = Bot(BOT_TOKEN)
 	
 	dp = Dispatcher(storage=MemoryStorage())
+	# Апдейты одного пользователя — по очереди, разных — параллельно в пределах лимита
+	dp.update.outer_middleware(UpdateSchedulerMiddleware())
+	# Контекст пользователя (ник, админ, ЧС) собирается один раз на апдейт
+	dp.update.outer_middleware(UserContextMiddleware())
 	dp.include_router(start_router)
 	dp.include_router(events_router)
+	dp.include_router(inline_router)
 	await bot.delete_webhook(drop_pending_updates=True)
 
-	async def reminders_worker():
-		while True:
-			try:
-				tasks = get_events_needing_reminders()
-				for t in tasks:
-					event = t.get("event")
-					reminder_type = t.get("type")
-					event_id = event.get("id")
-					title = event.get("title") or "Мероприятие"
-					date = event.get("date") or "-"
-					if reminder_type == "1day":
-						text = f"⏰ Напоминание: завтра состоится '{title}'\nДата и время: {date}"
-					else:
-						text = f"⏰ Напоминание: через час '{title}'\nДата и время: {date}"
-					# Отправляем всем зарегистрированным
-					try:
-						participants = get_event_participants(event_id)
-						for p in participants:
-							chat_id = p.get("chat_id")
-							if not chat_id:
-								continue
-							try:
-								await bot.send_message(chat_id=chat_id, text=text)
-							except Exception as e:
-								print(f"ERROR send reminder to {p.get('username')}: {e}")
-					except Exception as e:
-						print(f"ERROR fetching participants for reminder: {e}")
-					mark_event_reminder_sent(event_id, reminder_type)
-			except Exception as e:
-				print(f"REMINDERS_WORKER_ERROR: {e}")
-			await asyncio.sleep(60)
-
-	asyncio.create_task(reminders_worker())
+	# Напоминания за день и за час до мероприятия
+	asyncio.create_task(reminders.run(bot))
+	# Прошедшие мероприятия завершаются автоматически, участникам уходит запрос оценки
+	asyncio.create_task(lifecycle.run(bot))
+	# Данные давно прошедших мероприятий уезжают в архивные таблицы
+	asyncio.create_task(archive.run())
+	# Старые ключи общей дедупликации нажатий (если CALLBACK_DEDUPE_SHARED)
+	asyncio.create_task(dedupe.purge_loop())
+	# Вхождения повторяющихся мероприятий создаются скользящим окном
+	asyncio.create_task(series.materialize_loop())
+	# Локальная реплика для чтения (если задан REPLICA_PATH)
+	asyncio.create_task(replica.sync_loop())
+	# Изменения, сделанные другими экземплярами бота, сбрасывают локальные кэши
+	asyncio.create_task(changefeed.listen_loop())
+	# Календарь .ics по HTTP (если задан FEED_PORT)
+	asyncio.create_task(feed.serve())
 	await dp.start_polling(bot)
 
 
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from typing import Optional
+
+from aiogram.types import Message, InlineKeyboardMarkup, InputMediaPhoto
+from aiogram.exceptions import TelegramBadRequest
+
+
+# Реестр проверенных картинок: исходное значение -> канонический file_id.
+# None означает, что значение уже проверялось и картинкой не является.
+# Старые значения вытесняются: в худшем случае картинка будет проверена повторно
+MAX_REMEMBERED_PHOTOS = 4096
+_registry: "OrderedDict[str, Optional[str]]" = OrderedDict()
+
+
+def _remember(raw: str, file_id: Optional[str]) -> None:
+    _registry[raw] = file_id
+    _registry.move_to_end(raw)
+    while len(_registry) > MAX_REMEMBERED_PHOTOS:
+        _registry.popitem(last=False)
+
+
+def remember_photo(raw: Optional[str], file_id: Optional[str]) -> Optional[str]:
+    """Запоминает канонический file_id для исходного значения картинки"""
+    if raw:
+        _remember(raw, file_id)
+    if file_id:
+        _remember(file_id, file_id)
+    return file_id
+
+
+def remember_from_message(raw: Optional[str], message: Optional[Message]) -> Optional[str]:
+    """Берёт канонический file_id из отправленного/отредактированного сообщения с фото"""
+    file_id: Optional[str] = None
+    if isinstance(message, Message) and message.photo:
+        file_id = message.photo[-1].file_id
+    return remember_photo(raw, file_id)
+
+
+# Ошибки Telegram, которые говорят о самой картинке. Остальные (длинная подпись, сообщение
+# нельзя редактировать, сообщение не найдено) к значению картинки отношения не имеют.
+_PHOTO_ERRORS = (
+    "wrong file identifier",
+    "failed to get http url content",
+    "wrong type of the web page content",
+    "photo_invalid_dimensions",
+    "image_process_failed",
+)
+
+
+def is_photo_error(error: TelegramBadRequest) -> bool:
+    text = str(error).lower()
+    return any(marker in text for marker in _PHOTO_ERRORS)
+
+
+def mark_invalid(raw: Optional[str]) -> None:
+    if raw:
+        _remember(raw, None)
+
+
+def cached_photo(raw: Optional[str]) -> Optional[str]:
+    """Возвращает проверенный file_id (или None, если картинка неизвестна или невалидна)"""
+    if not raw:
+        return None
+    return _registry.get(raw)
+
+
+def is_invalid_photo(raw: Optional[str]) -> bool:
+    return bool(raw) and raw in _registry and _registry[raw] is None
+
+
+def photo_from_message(message: Message) -> Optional[str]:
+    """file_id присланного фото; такие значения валидны без дополнительной проверки"""
+    if not message.photo:
+        return None
+    try:
+        return remember_photo(None, message.photo[-1].file_id)
+    except Exception:
+        return None
+
+
+async def send_photo_card(message: Message, raw: str, caption: str, keyboard: Optional[InlineKeyboardMarkup]) -> Optional[Message]:
+    """Отправляет карточку с картинкой в чат сообщения и регистрирует канонический file_id.
+    Возвращает отправленное сообщение или None, если значение не удалось отправить как фото."""
+    if is_invalid_photo(raw):
+        return None
+    try:
+        sent = await message.bot.send_photo(
+            chat_id=message.chat.id,
+            photo=cached_photo(raw) or raw,
+            caption=caption,
+            reply_markup=keyboard,
+        )
+    except TelegramBadRequest as e:
+        if is_photo_error(e):
+            print(f"PHOTO_INVALID: {e}")
+            mark_invalid(raw)
+        else:
+            print(f"PHOTO_SEND_ERROR: {e}")
+        return None
+    remember_from_message(raw, sent)
+    return sent
+
+
+async def show_card(message: Message, photo: Optional[str], text: str, keyboard: Optional[InlineKeyboardMarkup]) -> None:
+    """Показывает карточку в существующем сообщении: с картинкой, если она валидна, иначе текстом.
+    Каждое значение картинки проверяется через API не более одного раза."""
+    if photo and not is_invalid_photo(photo):
+        try:
+            edited = await message.edit_media(
+                media=InputMediaPhoto(media=cached_photo(photo) or photo, caption=text),
+                reply_markup=keyboard,
+            )
+            if cached_photo(photo) is None and isinstance(edited, Message):
+                remember_from_message(photo, edited)
+            return
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                return
+            print(f"PHOTO_EDIT_ERROR: {e}")
+            if not is_photo_error(e):
+                # Картинка ни при чём: сообщение не отредактировать — показываем карточку заново
+                if await send_photo_card(message, photo, text, keyboard) is None:
+                    await message.answer(text, reply_markup=keyboard)
+                return
+            mark_invalid(photo)
+    try:
+        if message.photo:
+            await message.edit_caption(caption=text, reply_markup=keyboard)
+        else:
+            await message.edit_text(text=text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
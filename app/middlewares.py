@@ -0,0 +1,268 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Chat, Message, TelegramObject, User
+
+from .config import UPDATE_CONCURRENCY, THROTTLE_RATE, THROTTLE_BURST
+from .callbacks import CallbackTable
+from . import dedupe
+from .utils import normalize_username, user_is_admin, is_user_globally_blacklisted, get_user_info
+
+
+class UserContext:
+    """Сведения о пользователе текущего апдейта.
+
+    Создаётся заново на каждый апдейт; каждое поле запрашивается из базы не более
+    одного раза и только если к нему обратились.
+    """
+
+    def __init__(self, user: Optional[User], chat: Optional[Chat]) -> None:
+        self.user = user
+        self.username: Optional[str] = normalize_username(user.username if user else None)
+        self.chat_id: Optional[int] = chat.id if chat else (user.id if user else None)
+        self._is_admin: Optional[bool] = None
+        self._is_globally_blacklisted: Optional[bool] = None
+        self._user_row: Optional[Dict[str, Any]] = None
+
+    @property
+    def is_admin(self) -> bool:
+        if self._is_admin is None:
+            self._is_admin = user_is_admin(self.username)
+        return self._is_admin
+
+    @property
+    def is_globally_blacklisted(self) -> bool:
+        if self._is_globally_blacklisted is None:
+            self._is_globally_blacklisted = is_user_globally_blacklisted(self.username)
+        return self._is_globally_blacklisted
+
+    @property
+    def user_row(self) -> Dict[str, Any]:
+        """Строка пользователя из таблицы users ({} если его там нет)"""
+        if self._user_row is None:
+            self._user_row = get_user_info(self.username) if self.username else {}
+        return self._user_row
+
+    def invalidate(self) -> None:
+        """Сбрасывает загруженные поля — после изменения данных пользователя в этом же апдейте"""
+        self._is_admin = None
+        self._is_globally_blacklisted = None
+        self._user_row = None
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """Кладёт в данные обработчика user_ctx — контекст пользователя текущего апдейта"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        data["user_ctx"] = UserContext(data.get("event_from_user"), data.get("event_chat"))
+        return await handler(event, data)
+
+
+class _UserSlot:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        # Сколько апдейтов этого пользователя сейчас ждут или выполняются
+        self.users = 0
+
+
+class UpdateSchedulerMiddleware(BaseMiddleware):
+    """Планировщик апдейтов.
+
+    Апдейты одного пользователя выполняются строго по очереди — двойные нажатия не
+    затирают данные FSM друг друга. Апдейты разных пользователей идут параллельно,
+    но одновременно не больше max_concurrency. Глубина очереди доступна через stats().
+    """
+
+    # Как часто (в секундах) можно писать в лог о переполненной очереди
+    REPORT_INTERVAL = 10.0
+
+    def __init__(self, max_concurrency: int = UPDATE_CONCURRENCY) -> None:
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._slots: Dict[int, _UserSlot] = {}
+        self._waiting = 0
+        self._active = 0
+        self._peak_waiting = 0
+        self._last_report = 0.0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "waiting": self._waiting,
+            "active": self._active,
+            "peak_waiting": self._peak_waiting,
+            "users": len(self._slots),
+        }
+
+    def _report(self) -> None:
+        if self._waiting > self._peak_waiting:
+            self._peak_waiting = self._waiting
+        now = time.monotonic()
+        if self._waiting >= self.max_concurrency and now - self._last_report >= self.REPORT_INTERVAL:
+            self._last_report = now
+            print(f"UPDATE_QUEUE: waiting={self._waiting} active={self._active} peak={self._peak_waiting}")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        chat: Optional[Chat] = data.get("event_chat")
+        key = user.id if user else (chat.id if chat else None)
+
+        slot: Optional[_UserSlot] = None
+        if key is not None:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = _UserSlot()
+            slot.users += 1
+
+        self._waiting += 1
+        self._report()
+        started = False
+        try:
+            # Сначала очередь пользователя, потом общий лимит: ожидающие своей очереди
+            # апдейты не занимают места в общем лимите
+            if slot is not None:
+                await slot.lock.acquire()
+            try:
+                async with self._semaphore:
+                    started = True
+                    self._waiting -= 1
+                    self._active += 1
+                    try:
+                        return await handler(event, data)
+                    finally:
+                        self._active -= 1
+            finally:
+                if slot is not None:
+                    slot.lock.release()
+        finally:
+            if not started:
+                self._waiting -= 1
+            if slot is not None:
+                slot.users -= 1
+                if slot.users == 0:
+                    self._slots.pop(key, None)
+
+
+class CallbackDedupeMiddleware(BaseMiddleware):
+    """Отбрасывает повторные нажатия той же кнопки того же сообщения в коротком окне.
+
+    Действует только на обработчики с флагом idempotent (регистрация, завершение,
+    рассылки и т.п.): у остальных повтор безвреден. Дубль получает пустой answer,
+    чтобы у пользователя погас индикатор загрузки.
+    """
+
+    def __init__(self, table: CallbackTable) -> None:
+        self.table = table
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, CallbackQuery) or event.message is None:
+            return await handler(event, data)
+        if not self.table.flags(event.data).get("idempotent"):
+            return await handler(event, data)
+        user_id, message_id, payload = event.from_user.id, event.message.message_id, event.data or ""
+        if not await dedupe.claim(user_id, message_id, payload):
+            await event.answer()
+            return None
+        try:
+            return await handler(event, data)
+        except Exception:
+            dedupe.release(user_id, message_id, payload)
+            raise
+
+
+class _Bucket:
+    __slots__ = ("tokens", "stamp", "warned")
+
+    def __init__(self, tokens: float, stamp: float) -> None:
+        self.tokens = tokens
+        self.stamp = stamp
+        # Предупреждали ли пользователя с момента, как ведро опустело
+        self.warned = False
+
+
+class ThrottleMiddleware(BaseMiddleware):
+    """Ограничивает частоту тяжёлых обработчиков для одного пользователя (token bucket).
+
+    Тяжёлые обработчики помечены флагом heavy: у callback-кнопок — в таблице
+    CallbackTable, у сообщений — флагом aiogram. Каждый вызов тратит один токен,
+    токены восполняются со скоростью rate в секунду, но не больше burst. Без токенов
+    апдейт до базы не доходит: кнопка получает answer, сообщение — одно предупреждение.
+    Полностью восполнившиеся ведра ничем не отличаются от новых и удаляются.
+    """
+
+    # Как часто (в секундах) удалять простаивающие ведра
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self, table: CallbackTable, rate: float = THROTTLE_RATE, burst: int = THROTTLE_BURST) -> None:
+        self.table = table
+        self.rate = rate
+        self.burst = float(burst)
+        self._buckets: Dict[int, _Bucket] = {}
+        self._last_sweep = 0.0
+
+    def _is_heavy(self, event: TelegramObject, data: Dict[str, Any]) -> bool:
+        if isinstance(event, CallbackQuery):
+            return bool(self.table.flags(event.data).get("heavy"))
+        return bool(get_flag(data, "heavy"))
+
+    def _sweep(self, now: float) -> None:
+        if now - self._last_sweep < self.SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        idle = self.burst / self.rate
+        for key in [k for k, b in self._buckets.items() if now - b.stamp >= idle]:
+            del self._buckets[key]
+
+    def _take(self, key: int) -> Optional[_Bucket]:
+        """Списывает токен; возвращает ведро, если токенов не хватило"""
+        now = time.monotonic()
+        self._sweep(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = _Bucket(self.burst - 1, now)
+            return None
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.stamp) * self.rate)
+        bucket.stamp = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            bucket.warned = False
+            return None
+        return bucket
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        if self.rate <= 0 or user is None or not self._is_heavy(event, data):
+            return await handler(event, data)
+        bucket = self._take(user.id)
+        if bucket is None:
+            return await handler(event, data)
+        if isinstance(event, CallbackQuery):
+            await event.answer("Слишком часто, подождите пару секунд")
+        elif isinstance(event, Message) and not bucket.warned:
+            bucket.warned = True
+            await event.answer("Слишком много запросов, подождите пару секунд")
+        return None
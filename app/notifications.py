@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Iterable, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+
+# Telegram допускает около 30 сообщений в секунду от бота; держимся чуть ниже
+MESSAGES_PER_SECOND = 25
+
+
+async def _send(bot: Bot, chat_id: int, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> bool:
+    try:
+        await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+        return True
+    except TelegramRetryAfter as e:
+        await asyncio.sleep(e.retry_after)
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+            return True
+        except Exception as retry_error:
+            print(f"ERROR notify {chat_id}: {retry_error}")
+            return False
+    except Exception as e:
+        print(f"ERROR notify {chat_id}: {e}")
+        return False
+
+
+async def send_batch(bot: Bot, messages: Iterable[Tuple[Any, ...]]) -> Tuple[int, int]:
+    """Рассылает (chat_id, текст[, клавиатура]) пачками по MESSAGES_PER_SECOND в секунду.
+    Возвращает (отправлено, ошибок)."""
+    pending = list(messages)
+    sent = failed = 0
+    for start in range(0, len(pending), MESSAGES_PER_SECOND):
+        if start:
+            await asyncio.sleep(1)
+        chunk = pending[start:start + MESSAGES_PER_SECOND]
+        results = await asyncio.gather(*(_send(bot, *message) for message in chunk))
+        sent += sum(results)
+        failed += len(results) - sum(results)
+    return sent, failed
@@ -0,0 +1,120 @@
+import asyncio
+import heapq
+import time
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from aiogram import Bot
+
+from .config import REMINDERS_RESEED_INTERVAL
+from .utils import get_events_for_reminders, get_event_by_id, mark_event_reminder_sent, get_event_participants, parse_event_datetime_to_datetime
+
+
+# Тип напоминания -> за сколько секунд до начала оно отправляется
+REMINDER_OFFSETS = {"1day": 24 * 3600, "1hour": 3600}
+# Напоминание, опоздавшее больше чем на столько секунд (бот был выключен), не отправляется
+TOLERANCE = 60
+
+# (момент отправки по time.time(), id мероприятия, тип, дата мероприятия на момент планирования)
+_Entry = Tuple[float, int, str, str]
+
+_heap: list[_Entry] = []
+_scheduled: Set[_Entry] = set()
+_wakeup: Optional[asyncio.Event] = None
+
+
+def schedule_event(event: Dict[str, Any]) -> None:
+    """Ставит напоминания мероприятия в очередь. Вызывается при создании, импорте и
+    изменении мероприятия; устаревшие записи отсеиваются при срабатывании."""
+    if event.get("is_completed") or event.get("is_cancelled"):
+        return
+    date_text = event.get("date")
+    dt = parse_event_datetime_to_datetime(date_text) if date_text else None
+    if not dt or not event.get("id"):
+        return
+    now = time.time()
+    for reminder_type, offset in REMINDER_OFFSETS.items():
+        if event.get(f"reminder_{reminder_type}_sent"):
+            continue
+        due = dt.timestamp() - offset
+        entry = (due, event["id"], reminder_type, date_text)
+        if due < now - TOLERANCE or entry in _scheduled:
+            continue
+        heapq.heappush(_heap, entry)
+        _scheduled.add(entry)
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def schedule_events(events: Iterable[Dict[str, Any]]) -> None:
+    for event in events:
+        schedule_event(event)
+
+
+def _reseed(events: Iterable[Dict[str, Any]]) -> None:
+    """Добавляет в очередь напоминания из снимка базы: ловит изменения, сделанные другими
+    экземплярами. Очередь не очищается — пока снимок загружался, в неё могли попасть только
+    что созданные или импортированные мероприятия. Повторы отсекает _scheduled, а записи
+    отменённых или перенесённых мероприятий отсеются при срабатывании."""
+    schedule_events(events)
+
+
+def _reminder_text(event: Dict[str, Any], reminder_type: str) -> str:
+    title = event.get("title") or "Мероприятие"
+    date = event.get("date") or "-"
+    if reminder_type == "1day":
+        return f"⏰ Напоминание: завтра состоится '{title}'\nДата и время: {date}"
+    return f"⏰ Напоминание: через час '{title}'\nДата и время: {date}"
+
+
+async def _fire(bot: Bot, entry: _Entry) -> None:
+    _, event_id, reminder_type, date_text = entry
+    # Мероприятие могли отменить, перенести или уже напомнить о нём с другого экземпляра
+    event = get_event_by_id(event_id)
+    if (
+        not event
+        or event.get("is_completed")
+        or event.get("is_cancelled")
+        or event.get("date") != date_text
+        or event.get(f"reminder_{reminder_type}_sent")
+    ):
+        return
+    text = _reminder_text(event, reminder_type)
+    for p in get_event_participants(event_id):
+        if not p.get("chat_id"):
+            continue
+        try:
+            await bot.send_message(chat_id=p["chat_id"], text=text)
+        except Exception as e:
+            print(f"ERROR send reminder to {p.get('username')}: {e}")
+    mark_event_reminder_sent(event_id, reminder_type)
+
+
+async def run(bot: Bot) -> None:
+    """Планировщик напоминаний: спит до ближайшего напоминания в куче вместо опроса
+    всех мероприятий каждую минуту"""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    next_reseed = 0.0
+    while True:
+        try:
+            now = time.time()
+            if now >= next_reseed:
+                next_reseed = now + REMINDERS_RESEED_INTERVAL
+                # Запрос — в отдельном потоке, а очередь меняется только в потоке event loop
+                _reseed(await asyncio.to_thread(get_events_for_reminders))
+            while _heap and _heap[0][0] <= time.time():
+                entry = heapq.heappop(_heap)
+                _scheduled.discard(entry)
+                if time.time() - entry[0] > TOLERANCE:
+                    continue
+                await _fire(bot, entry)
+        except Exception as e:
+            print(f"REMINDERS_WORKER_ERROR: {e}")
+        timeout = next_reseed - time.time()
+        if _heap:
+            timeout = min(timeout, _heap[0][0] - time.time())
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=max(timeout, 0.0))
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
@@ -0,0 +1,303 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import REPLICA_PATH, REPLICA_SYNC_INTERVAL, REPLICA_SYNC_LAG, REPLICA_RECONCILE_INTERVAL
+from .supabase_client import get_supabase, execute
+
+
+# Таблицы, которые копируются локально.
+# incremental — подтягиваются строки новее водяного знака updated_at с запасом REPLICA_SYNC_LAG (нужна миграция 001);
+# удаления в них находит периодическая сверка ключей (_reconcile).
+# Остальные маленькие и перечитываются целиком, так заодно видны удаления.
+TABLES: Dict[str, Dict[str, Any]] = {
+    "events": {"key": "id", "incremental": True},
+    "event_registrations": {"key": "id", "incremental": True},
+    "board_games": {"key": "id", "incremental": False},
+    "admin": {"key": "tg", "incremental": False},
+    "global_blacklist": {"key": "user_tg_username", "incremental": False},
+}
+
+# Поля, по которым реплика фильтрует чаще всего
+_INDEXED_FIELDS = {
+    "events": ["is_completed", "is_cancelled"],
+    "event_registrations": ["event_id", "user_tg_username", "status"],
+}
+
+_PAGE_SIZE = 1000
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_ready = False
+# Будит цикл синхронизации раньше срока (см. request_sync)
+_wakeup: Optional[asyncio.Event] = None
+# Когда последний раз сверялись ключи инкрементальных таблиц (time.monotonic); 0 — сверить при ближайшей синхронизации
+_reconciled_at = 0.0
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(REPLICA_PATH, check_same_thread=False, isolation_level=None)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute("CREATE TABLE IF NOT EXISTS rows (tbl TEXT NOT NULL, pk TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (tbl, pk))")
+        _conn.execute("CREATE TABLE IF NOT EXISTS watermarks (tbl TEXT PRIMARY KEY, updated_at TEXT NOT NULL, pk TEXT)")
+        # Файлы реплики, созданные до появления ключа в водяном знаке
+        if "pk" not in [column[1] for column in _conn.execute("PRAGMA table_info(watermarks)")]:
+            _conn.execute("ALTER TABLE watermarks ADD COLUMN pk TEXT")
+        for table, fields in _INDEXED_FIELDS.items():
+            for field in fields:
+                _conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_{field} "
+                    f"ON rows (tbl, json_extract(data, '$.{field}'))"
+                )
+    return _conn
+
+
+def is_enabled() -> bool:
+    return bool(REPLICA_PATH)
+
+
+def is_ready() -> bool:
+    """Реплика включена и хотя бы раз полностью синхронизирована"""
+    return _ready
+
+
+def _pk(table: str, row: Dict[str, Any]) -> Optional[str]:
+    value = row.get(TABLES[table]["key"])
+    return None if value is None else str(value)
+
+
+def select(table: str, where: Optional[Dict[str, Any]] = None, order_by: Optional[str] = None, desc: bool = False, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Читает строки таблицы. where — равенства по полям; список в значении означает IN"""
+    sql = "SELECT data FROM rows WHERE tbl = ?"
+    params: List[Any] = [table]
+    for field, value in (where or {}).items():
+        column = f"json_extract(data, '$.{field}')"
+        if value is None:
+            sql += f" AND {column} IS NULL"
+        elif isinstance(value, (list, tuple, set)):
+            values = list(value)
+            sql += f" AND {column} IN ({', '.join('?' for _ in values)})"
+            params.extend(values)
+        else:
+            sql += f" AND {column} = ?"
+            params.append(value)
+    if order_by:
+        sql += f" ORDER BY json_extract(data, '$.{order_by}') {'DESC' if desc else 'ASC'}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    with _lock:
+        cursor = _connect().execute(sql, params)
+        return [json.loads(data) for (data,) in cursor.fetchall()]
+
+
+def count(table: str, where: Optional[Dict[str, Any]] = None) -> int:
+    return len(select(table, where))
+
+
+def apply(table: str, rows: Optional[Iterable[Dict[str, Any]]]) -> None:
+    """Применяет к реплике строки, которые вернул Supabase после записи"""
+    if not is_enabled() or not rows:
+        return
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN")
+        try:
+            for row in rows:
+                pk = _pk(table, row)
+                if pk is None:
+                    continue
+                conn.execute(
+                    "INSERT INTO rows (tbl, pk, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT (tbl, pk) DO UPDATE SET data = excluded.data",
+                    (table, pk, json.dumps(row, ensure_ascii=False)),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def delete(table: str, key_value: Any) -> None:
+    """Удаляет строку из реплики по ключу таблицы (после удаления в Supabase)"""
+    if not is_enabled() or key_value is None:
+        return
+    with _lock:
+        _connect().execute("DELETE FROM rows WHERE tbl = ? AND pk = ?", (table, str(key_value)))
+
+
+def _replace_table(table: str, rows: List[Dict[str, Any]]) -> None:
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN")
+        try:
+            conn.execute("DELETE FROM rows WHERE tbl = ?", (table,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO rows (tbl, pk, data) VALUES (?, ?, ?)",
+                [(table, _pk(table, row), json.dumps(row, ensure_ascii=False)) for row in rows if _pk(table, row) is not None],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _watermark(table: str) -> Tuple[Optional[str], Optional[str]]:
+    """(updated_at, ключ) последней подтянутой строки"""
+    with _lock:
+        found = _connect().execute("SELECT updated_at, pk FROM watermarks WHERE tbl = ?", (table,)).fetchone()
+    return (found[0], found[1]) if found else (None, None)
+
+
+def _set_watermark(table: str, updated_at: str, pk: Optional[str]) -> None:
+    with _lock:
+        _connect().execute(
+            "INSERT INTO watermarks (tbl, updated_at, pk) VALUES (?, ?, ?) "
+            "ON CONFLICT (tbl) DO UPDATE SET updated_at = excluded.updated_at, pk = excluded.pk",
+            (table, updated_at, pk),
+        )
+
+
+def _pull_all(table: str) -> List[Dict[str, Any]]:
+    supabase = get_supabase()
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        resp = execute(supabase.table(table).select("*").range(offset, offset + _PAGE_SIZE - 1))
+        page = resp.data or []
+        rows.extend(page)
+        if len(page) < _PAGE_SIZE:
+            return rows
+        offset += _PAGE_SIZE
+
+
+def _parse_ts(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _pull_changes(table: str) -> int:
+    """Подтягивает строки, изменённые после водяного знака. Возвращает их число.
+
+    updated_at ставит триггер через now() — это время начала транзакции, а не фиксации:
+    долгая транзакция может зафиксироваться уже после того, как водяной знак ушёл дальше.
+    Поэтому каждый проход начинается с запасом REPLICA_SYNC_LAG секунд до водяного знака.
+    Внутри прохода страницы идут по ключу (updated_at, ключ таблицы): массовые обновления
+    ставят тысячам строк одинаковый updated_at, и без второго поля часть из них не попала бы
+    ни в одну страницу."""
+    supabase = get_supabase()
+    key = TABLES[table]["key"]
+    watermark, _ = _watermark(table)
+    since = (_parse_ts(watermark) - timedelta(seconds=REPLICA_SYNC_LAG)).isoformat() if watermark else None
+    cursor: Optional[Dict[str, Any]] = None
+    pulled = 0
+    while True:
+        query = supabase.table(table).select("*").order("updated_at", desc=False).order(key, desc=False).limit(_PAGE_SIZE)
+        if cursor is not None:
+            query = query.or_(f'updated_at.gt."{cursor["updated_at"]}",and(updated_at.eq."{cursor["updated_at"]}",{key}.gt.{cursor[key]})')
+        elif since:
+            query = query.gte("updated_at", since)
+        page = execute(query).data or []
+        apply(table, page)
+        pulled += len(page)
+        if page:
+            cursor = page[-1]
+            # Перечитанный запас не должен отодвигать водяной знак назад
+            if not watermark or _parse_ts(cursor["updated_at"]) > _parse_ts(watermark):
+                watermark = cursor["updated_at"]
+                _set_watermark(table, watermark, _pk(table, cursor))
+        if len(page) < _PAGE_SIZE:
+            return pulled
+
+
+def _pull_keys(table: str) -> Set[str]:
+    """Все ключи таблицы в Supabase, страницами по ключу"""
+    supabase = get_supabase()
+    key = TABLES[table]["key"]
+    keys: Set[str] = set()
+    last: Optional[Any] = None
+    while True:
+        query = supabase.table(table).select(key).order(key, desc=False).limit(_PAGE_SIZE)
+        if last is not None:
+            query = query.gt(key, last)
+        page = execute(query).data or []
+        keys.update(str(row[key]) for row in page if row.get(key) is not None)
+        if len(page) < _PAGE_SIZE:
+            return keys
+        last = page[-1][key]
+
+
+def _reconcile(table: str) -> int:
+    """Удаляет из реплики строки, которых больше нет в Supabase. Удаления без NOTIFY
+    (перенос в архив, удаление во время обрыва ленты) иначе остались бы в реплике навсегда.
+    Возвращает число удалённых строк."""
+    # Строки новее водяного знака могли появиться уже после выборки ключей — их не трогаем
+    updated_at, _ = _watermark(table)
+    if not updated_at:
+        return 0
+    remote = _pull_keys(table)
+    with _lock:
+        conn = _connect()
+        local = conn.execute(
+            "SELECT pk FROM rows WHERE tbl = ? AND json_extract(data, '$.updated_at') <= ?",
+            (table, updated_at),
+        ).fetchall()
+        stale = [(table, pk) for (pk,) in local if pk not in remote]
+        if stale:
+            conn.executemany("DELETE FROM rows WHERE tbl = ? AND pk = ?", stale)
+    return len(stale)
+
+
+def sync_once() -> None:
+    """Один проход синхронизации всех таблиц; раз в REPLICA_RECONCILE_INTERVAL — со сверкой удалений"""
+    global _ready, _reconciled_at
+    reconcile = time.monotonic() - _reconciled_at >= REPLICA_RECONCILE_INTERVAL
+    for table, options in TABLES.items():
+        if options["incremental"]:
+            _pull_changes(table)
+            if reconcile:
+                removed = _reconcile(table)
+                if removed:
+                    print(f"REPLICA: удалено из {table} строк, которых нет в базе: {removed}")
+        else:
+            _replace_table(table, _pull_all(table))
+    if reconcile:
+        _reconciled_at = time.monotonic()
+    _ready = True
+
+
+def request_reconcile() -> None:
+    """Просит сверить удаления при следующей синхронизации (после массовых удалений без NOTIFY)"""
+    global _reconciled_at
+    _reconciled_at = 0.0
+
+
+def request_sync() -> None:
+    """Просит выполнить синхронизацию сейчас, не дожидаясь интервала.
+    Вызывается из потока event loop."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def sync_loop() -> None:
+    """Фоновая синхронизация реплики; запросы к Supabase идут в отдельном потоке"""
+    global _wakeup
+    if not is_enabled():
+        return
+    _wakeup = asyncio.Event()
+    while True:
+        try:
+            await asyncio.to_thread(sync_once)
+        except Exception as e:
+            print(f"REPLICA_SYNC_ERROR: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=REPLICA_SYNC_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
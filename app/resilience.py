@@ -0,0 +1,111 @@
+import copy
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from .singleflight import call_key
+
+
+class CircuitOpenError(RuntimeError):
+    """База недоступна: автомат разомкнут, запрос даже не отправлялся"""
+
+
+class CircuitBreaker:
+    """Автомат для внешнего сервиса.
+
+    После failure_threshold сбоев подряд размыкается, и вызовы сразу падают с
+    CircuitOpenError вместо ожидания таймаута. Через reset_timeout секунд пропускает
+    один пробный запрос: успех замыкает автомат, сбой размыкает его снова.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def before_call(self) -> None:
+        """Бросает CircuitOpenError, если запрос сейчас отправлять нельзя"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            raise CircuitOpenError("Supabase временно недоступен")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                print("CIRCUIT_CLOSED: Supabase снова отвечает")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    print(f"CIRCUIT_OPEN: {self._failures} сбоев подряд, запросы к Supabase приостановлены на {self.reset_timeout:.0f}с")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+_RAISE = object()
+
+
+def stale_fallback(default: Any = _RAISE, max_entries: int = 4096) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Запоминает последний удачный результат функции чтения для каждого набора аргументов.
+
+    Если вызов упал (база недоступна, автомат разомкнут), отдаёт запомненное значение.
+    Если запомненного нет — возвращает копию default, а без default пробрасывает исключение.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        lock = threading.Lock()
+        last_good: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = call_key(args, kwargs)
+            try:
+                value = func(*args, **kwargs)
+            except Exception as e:
+                with lock:
+                    found = key in last_good
+                    stale: Optional[Any] = last_good.get(key)
+                if found:
+                    print(f"STALE_FALLBACK {func.__name__}: {e}")
+                    return copy.deepcopy(stale)
+                print(f"ERROR {func.__name__}: {e}")
+                if default is _RAISE:
+                    raise
+                return copy.copy(default)
+            with lock:
+                last_good[key] = value
+                last_good.move_to_end(key)
+                while len(last_good) > max_entries:
+                    last_good.popitem(last=False)
+            return value
+
+        return wrapper
+
+    return decorator
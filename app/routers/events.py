@@ -1,21 +1,49 @@
-from typing import Dict, Any, Optional
+import asyncio
+import os
+from typing import Callable, Dict, Any, Optional
 
-from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram import Router
+from aiogram.types import Message, CallbackQuery, FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
-from aiogram.types import InputMediaPhoto
 from aiogram.exceptions import TelegramBadRequest
-
-from ..keyboards import build_event_inline_keyboard, build_final_confirm_keyboard, build_events_list_keyboard, build_event_edit_keyboard, build_event_management_keyboard, build_participants_list_keyboard, build_participant_info_keyboard, build_cancel_message_keyboard, build_blacklist_confirm_keyboard, build_blacklist_view_keyboard, build_blacklist_user_info_keyboard, build_edit_final_confirm_keyboard, build_past_event_actions_keyboard, build_feedback_rating_keyboard, build_feedback_comment_keyboard, build_admin_users_main_keyboard, build_users_list_keyboard, build_global_user_info_keyboard, build_global_blacklist_list_keyboard, build_global_blacklist_user_keyboard, build_admins_list_keyboard, build_admin_info_keyboard, build_cancel_global_message_keyboard, build_admins_selection_keyboard, build_contact_responsible_keyboard, build_games_list_keyboard, build_game_view_keyboard, build_game_inline_keyboard, build_game_final_confirm_keyboard
-from ..states import EventForm, EventEditForm, MessageParticipantForm, BlacklistForm, MessageBlacklistUserForm, BroadcastForm, FeedbackForm, GlobalMessageForm, ResponsibleSelectionForm, MessageResponsibleForm, BoardGameCreateForm
-from ..utils import user_is_admin, format_event_text, format_event_text_without_photo, ensure_draft_keys, draft_missing_fields, is_user_registered_for_event, register_user_for_event, unregister_user_from_event, get_user_registrations, get_event_registrations, is_event_full, get_event_available_slots_count, is_user_on_waitlist, add_user_to_waitlist, remove_user_from_waitlist, get_waitlist_position, get_user_chat_id, ensure_user_exists, get_event_participants, get_user_info, get_user_registrations_count, is_user_in_event_blacklist, add_user_to_event_blacklist, remove_user_from_event_blacklist, get_event_blacklist, save_event_feedback_rating, save_event_feedback_comment, get_all_users, add_user_to_global_blacklist, get_global_blacklist, remove_user_from_global_blacklist, get_all_admins, get_admin_past_events, get_user_events_history, get_board_games, create_board_game, format_game_text, format_game_text_without_photo, parse_event_datetime, is_future_datetime_str
-from ..supabase_client import get_supabase
+from aiogram.utils.deep_linking import create_start_link
+
+from ..keyboards import build_event_inline_keyboard, build_final_confirm_keyboard, build_series_rule_keyboard, build_series_cancel_confirm_keyboard, build_events_list_keyboard, build_event_edit_keyboard, build_event_management_keyboard, build_participants_list_keyboard, build_participant_info_keyboard, build_cancel_message_keyboard, build_blacklist_confirm_keyboard, build_blacklist_view_keyboard, build_blacklist_user_info_keyboard, build_edit_final_confirm_keyboard, build_past_event_actions_keyboard, build_feedback_rating_keyboard, build_feedback_comment_keyboard, build_feedback_stats_keyboard, build_import_cancel_keyboard, build_import_preview_keyboard, build_user_history_keyboard, build_attendance_keyboard, build_admin_users_main_keyboard, build_users_list_keyboard, build_global_user_info_keyboard, build_global_blacklist_list_keyboard, build_global_blacklist_user_keyboard, build_admins_list_keyboard, build_admin_info_keyboard, build_cancel_global_message_keyboard, build_admins_selection_keyboard, build_contact_responsible_keyboard, build_games_list_keyboard, build_game_view_keyboard, build_game_inline_keyboard, build_game_final_confirm_keyboard, build_board_games_selection_keyboard
+from ..states import EventForm, EventEditForm, MessageParticipantForm, BlacklistForm, MessageBlacklistUserForm, BroadcastForm, FeedbackForm, GlobalMessageForm, ResponsibleSelectionForm, MessageResponsibleForm, BoardGameCreateForm, ImportForm, SeriesForm, UserSearchForm, GameSearchForm
+from ..utils import get_upcoming_events_async, invalidate_event_caches, format_event_text, format_event_text_without_photo, ensure_draft_keys, draft_missing_fields, is_user_registered_for_event, register_user_for_event, unregister_user_from_event, get_user_registrations, get_event_registrations, is_event_full_async, get_event_available_slots_async, get_event_available_slots_count_async, is_user_on_waitlist, add_user_to_waitlist, remove_user_from_waitlist, get_waitlist_position, get_user_chat_id, ensure_user_exists, get_event_participants, get_user_info, get_user_registrations_count, is_user_in_event_blacklist, add_user_to_event_blacklist, remove_user_from_event_blacklist, get_event_blacklist, save_event_feedback_rating, save_event_feedback_comment, get_event_feedback_stats, format_feedback_stats, add_user_to_global_blacklist, get_global_blacklist, remove_user_from_global_blacklist, get_all_admins, get_admin_past_events, get_user_events_history, create_board_game, format_game_text, format_game_text_without_photo, parse_event_datetime, is_future_datetime_str, get_event_by_id, event_slots, split_event_list, get_events_with_game, search_users
+from ..supabase_client import get_supabase, execute
+from .. import replica, reminders
+from ..media import show_card, send_photo_card, photo_from_message, cached_photo
+from ..card_renderer import schedule_card_update, flush_card, forget_card
+from ..middlewares import UserContext, CallbackDedupeMiddleware, ThrottleMiddleware
+from ..imports import MAX_IMPORT_BYTES, MAX_IMPORT_ROWS, parse_import_file, validate_drafts, insert_events
+from ..feed import user_feed_url
+from ..series import RULES, MAX_OCCURRENCES, create_series, update_series, cancel_series, cancellation_messages, update_messages
+from ..notifications import send_batch
+from ..games import search_games_async, get_game, parse_game_params, format_game_params
+from ..exports import export_participants, export_users, export_feedback
+from ..analytics import PAGE_SIZE, get_user_stats, get_event_fill_stats, get_admin_stats, get_attendance_top, format_user_stats, format_fill_stats
+from ..callbacks import CallbackTable, AdminUsersCb, ContactCb, GlobalUserCb, GblCb, GamesCb, GamesItemCb, GameDraftCb, EventMenuCb, EventCb, FeedbackCb, DraftCb, DraftItemCb, EditDraftCb, EditDraftItemCb, ParticipantCb, BlacklistCb, UserHistoryCb, AttendanceCb, ExportCb, ImportCb, SeriesCb, UserDirCb, GamePickCb
 
 
 router = Router()
 
+# Префикс payload в ссылках t.me/<бот>?start=ev_<id>
+EVENT_LINK_PREFIX = "ev_"
+
+callbacks = CallbackTable()
+router.callback_query.register(callbacks.dispatch)
+# Повторные нажатия кнопок с побочными эффектами отбрасываются до обработчика
+router.callback_query.middleware(CallbackDedupeMiddleware(callbacks))
+# Тяжёлые обработчики (флаг heavy) ограничены по частоте; ведра общие для кнопок и сообщений
+throttle = ThrottleMiddleware(callbacks)
+router.callback_query.middleware(throttle)
+router.message.middleware(throttle)
+
 
 async def _safe_edit_message(message_obj: Message, new_text: str, keyboard: InlineKeyboardMarkup) -> None:
+	# Сообщение меняется в обход рендерера карточек — его сохранённый хэш больше не актуален
+	forget_card(message_obj.chat.id, message_obj.message_id)
 	try:
 		if message_obj.photo:
 			await message_obj.edit_caption(caption=new_text, reply_markup=keyboard)
@@ -33,11 +61,11 @@ async def _safe_edit_message(message_obj: Message, new_text: str, keyboard: Inli
 
 
 @router.message(lambda m: m.text == "Создать мероприятие")
-async def on_create_event(message: Message, state: FSMContext) -> None:
+async def on_create_event(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
     user = message.from_user
     if user is None:
         return
-    if not user_is_admin(user.username):
+    if not user_ctx.is_admin:
         await message.answer("Доступно только админам")
         return
 
@@ -54,17 +82,101 @@ async def on_create_event(message: Message, state: FSMContext) -> None:
     await state.update_data(event_draft=draft, card_chat_id=sent.chat.id, card_message_id=sent.message_id)
 
 
-@router.message(lambda m: m.text == "Предстоящие мероприятия")
-async def on_upcoming_events(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+@router.message(lambda m: m.text == "Импорт мероприятий")
+async def on_import_events(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        await message.answer("Доступно только админам")
+        return
+    await state.set_state(ImportForm.waiting_for_file)
+    await message.answer(
+        "Отправьте файл с мероприятиями:\n"
+        "- CSV со столбцами title, description, date, responsible, quantity, board_games (photo — по желанию);\n"
+        "- или календарь .ics (SUMMARY, DESCRIPTION, DTSTART и X-NASTOY-* для остальных полей).\n\n"
+        "Дата — в тех же форматах, что и при ручном создании, например 25.08.2025 18:30.",
+        reply_markup=build_import_cancel_keyboard()
+    )
+
+
+@router.message(ImportForm.waiting_for_file, flags={"heavy": True})
+async def on_import_file(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        return
+    document = message.document
+    if document is None:
+        await message.answer("Пришлите файл .csv или .ics документом", reply_markup=build_import_cancel_keyboard())
+        return
+    if (document.file_size or 0) > MAX_IMPORT_BYTES:
+        await message.answer("Файл слишком большой (максимум 1 МБ)", reply_markup=build_import_cancel_keyboard())
+        return
+    try:
+        buffer = await message.bot.download(document)
+        drafts = parse_import_file(document.file_name or "", buffer.read())
+    except Exception as e:
+        print(f"ERROR reading import file: {e}")
+        await message.answer("Не удалось прочитать файл", reply_markup=build_import_cancel_keyboard())
+        return
+    if len(drafts) > MAX_IMPORT_ROWS:
+        await message.answer(f"Слишком много мероприятий в файле (максимум {MAX_IMPORT_ROWS})", reply_markup=build_import_cancel_keyboard())
+        return
+    payloads, errors = validate_drafts(drafts)
+    await state.update_data(import_payloads=payloads)
+    lines = [f"📥 Найдено мероприятий: {len(drafts)}, готово к созданию: {len(payloads)}"]
+    for payload in payloads[:10]:
+        lines.append(f"• {payload['date']} — {payload['title']}")
+    if len(payloads) > 10:
+        lines.append(f"… и ещё {len(payloads) - 10}")
+    if errors:
+        lines.append(f"\n⚠️ Пропущено строк: {len(errors)}")
+        lines.extend(errors[:10])
+        if len(errors) > 10:
+            lines.append(f"… и ещё {len(errors) - 10}")
+    await message.answer("\n".join(lines), reply_markup=build_import_preview_keyboard(bool(payloads)))
+
+
+@callbacks.register(ImportCb, "confirm", flags={"idempotent": True, "heavy": True})
+async def on_import_confirm(callback: CallbackQuery, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    data = await state.get_data()
+    payloads = data.get("import_payloads") or []
+    if not payloads:
+        await callback.answer("Нечего импортировать — отправьте файл заново", show_alert=True)
+        return
+    try:
+        rows = insert_events(payloads)
+    except Exception as e:
+        print(f"EVENT_IMPORT_ERROR: {e}")
+        await callback.answer("Ошибка сохранения. Попробуйте позже", show_alert=True)
+        return
+    reminders.schedule_events(rows)
+    await state.clear()
+    try:
+        await callback.message.edit_reply_markup(reply_markup=None)
+    except Exception:
+        pass
+    await callback.answer(f"Создано мероприятий: {len(rows)}", show_alert=True)
+
+
+@callbacks.register(ImportCb, "cancel")
+async def on_import_cancel(callback: CallbackQuery, state: FSMContext) -> None:
+    await state.clear()
+    try:
+        await callback.message.edit_reply_markup(reply_markup=None)
+    except Exception:
+        pass
+    await callback.answer("Импорт отменён")
+
+
+@router.message(lambda m: m.text == "Предстоящие мероприятия", flags={"heavy": True})
+async def on_upcoming_events(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await message.answer("Доступно только админам")
         return
     
-    supabase = get_supabase()
     try:
         # Получаем только незавершённые мероприятия
-        response = supabase.table("events").select("*").eq("is_completed", False).eq("is_cancelled", False).execute()
-        events = response.data
+        events = await get_upcoming_events_async()
         
         print(f"UPCOMING_EVENTS: found {len(events)} upcoming events")
         for event in events:
@@ -95,16 +207,16 @@ async def on_upcoming_events(message: Message, state: FSMContext) -> None:
         await message.answer("Ошибка при загрузке мероприятий")
 
 
-@router.message(lambda m: m.text == "Прошедшие мероприятия")
-async def on_past_events(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+@router.message(lambda m: m.text == "Прошедшие мероприятия", flags={"heavy": True})
+async def on_past_events(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await message.answer("Доступно только админам")
         return
     
     supabase = get_supabase()
     try:
         # Получаем только завершённые мероприятия
-        response = supabase.table("events").select("*").eq("is_completed", True).execute()
+        response = execute(supabase.table("events").select("*").eq("is_completed", True))
         events = response.data
         
         print(f"PAST_EVENTS: found {len(events)} past events")
@@ -136,34 +248,33 @@ async def on_past_events(message: Message, state: FSMContext) -> None:
         await message.answer("Ошибка при загрузке мероприятий")
 
 
-@router.message(lambda m: m.text == "Посмотреть всех участников бота")
-async def on_admin_users_menu(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+@router.message(lambda m: m.text == "Посмотреть всех участников бота", flags={"heavy": True})
+async def on_admin_users_menu(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await message.answer("Доступно только админам")
         return
     kb = build_admin_users_main_keyboard()
     await message.answer("Выберите раздел:", reply_markup=kb)
 
 
-@router.callback_query(F.data == "admin_users:back")
-async def on_admin_users_back(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(AdminUsersCb, "back")
+async def on_admin_users_back(callback: CallbackQuery, state: FSMContext, callback_data: AdminUsersCb) -> None:
     kb = build_admin_users_main_keyboard()
     await _safe_edit_message(callback.message, "Выберите раздел:", kb)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("user:contact_resp_list:"))
-async def on_contact_responsible_list(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(ContactCb, "contact_resp_list")
+async def on_contact_responsible_list(callback: CallbackQuery, state: FSMContext, callback_data: ContactCb) -> None:
     # Извлекаем индекс мероприятия
-    event_index = int(callback.data.split(":")[-1])
+    event_index = callback_data.index
     data = await state.get_data()
     events = data.get("events_list", [])
     if event_index >= len(events):
         await callback.answer("Мероприятие не найдено", show_alert=True)
         return
     event = events[event_index]
-    responsibles_raw = event.get("responsible") or ""
-    responsibles = [s.strip() for s in responsibles_raw.split(",") if s.strip()]
+    responsibles = split_event_list(event.get("responsible"))
     if not responsibles:
         await callback.answer("Ответственные не указаны", show_alert=True)
         return
@@ -174,70 +285,158 @@ async def on_contact_responsible_list(callback: CallbackQuery, state: FSMContext
 
 # Убрали отправку через бота — всегда предлагаем прямой контакт
 
-@router.callback_query(F.data == "admin_users:participants")
-async def on_admin_users_participants(callback: CallbackQuery, state: FSMContext) -> None:
-    # Исключаем админов из списка участников
-    users = get_all_users()
-    admins = get_all_admins()
-    admin_tgs = set()
-    for a in admins:
-        tg = a.get("tg") or a.get("tg_username")
-        if tg:
-            admin_tgs.add(tg)
-    users = [u for u in users if (u.get("tg_username") not in admin_tgs)]
-    await state.update_data(global_users=users)
-    kb = build_users_list_keyboard(users)
-    await _safe_edit_message(callback.message, "👥 Все пользователи:", kb)
+async def _users_directory_page(state: FSMContext, page: int) -> tuple[str, InlineKeyboardMarkup]:
+    """Страница каталога пользователей (с учётом поискового запроса из состояния).
+    В global_users кладётся только текущая страница — индексы кнопок ссылаются на неё."""
+    data = await state.get_data()
+    query = data.get("users_dir_query")
+    # Админов в каталоге участников не показываем
+    admin_tgs = [a.get("tg") or a.get("tg_username") for a in get_all_admins()]
+    users, has_more = search_users(query, admin_tgs, page, PAGE_SIZE)
+    await state.update_data(global_users=users, users_dir_page=page)
+    title = f"👥 Пользователи по запросу «{query}»:" if query else "👥 Все пользователи:"
+    if not users:
+        title += "\n\nНикого не найдено"
+    elif page > 0 or has_more:
+        title += f"\n\nСтраница {page + 1}"
+    return title, build_users_list_keyboard(users, page, has_more, query)
+
+
+@callbacks.register(AdminUsersCb, "participants", flags={"heavy": True})
+async def on_admin_users_participants(callback: CallbackQuery, state: FSMContext, callback_data: AdminUsersCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    await state.update_data(users_dir_query=None)
+    text, kb = await _users_directory_page(state, 0)
+    await _safe_edit_message(callback.message, text, kb)
+    await callback.answer()
+
+
+@callbacks.register(UserDirCb, "page", flags={"heavy": True})
+async def on_users_directory_page(callback: CallbackQuery, state: FSMContext, callback_data: UserDirCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    text, kb = await _users_directory_page(state, max(callback_data.page, 0))
+    await _safe_edit_message(callback.message, text, kb)
+    await callback.answer()
+
+
+@callbacks.register(UserDirCb, "reset", flags={"heavy": True})
+async def on_users_directory_reset(callback: CallbackQuery, state: FSMContext, callback_data: UserDirCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    await state.update_data(users_dir_query=None)
+    text, kb = await _users_directory_page(state, 0)
+    await _safe_edit_message(callback.message, text, kb)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("global_user:show:"))
-async def on_global_user_show(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(UserDirCb, "search")
+async def on_users_directory_search(callback: CallbackQuery, state: FSMContext, callback_data: UserDirCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    await _ask_and_set_state(callback, state, "Введите начало ника пользователя:", UserSearchForm.waiting_for_query)
+
+
+@router.message(UserSearchForm.waiting_for_query, flags={"heavy": True})
+async def on_users_directory_query(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        return
+    query = (message.text or "").strip().lstrip("@")
+    if not query:
+        await message.answer("Введите хотя бы одну букву ника")
+        return
+    await _delete_prompt_and_input(message, state)
+    await state.set_state(None)
+    await state.update_data(users_dir_query=query, prompt_message_id=None)
+    text, kb = await _users_directory_page(state, 0)
+    await message.answer(text, reply_markup=kb)
+
+
+@callbacks.register(GlobalUserCb, "show")
+async def on_global_user_show(callback: CallbackQuery, state: FSMContext, callback_data: GlobalUserCb) -> None:
     data = await state.get_data()
     users = data.get("global_users", [])
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(users):
         await callback.answer("Пользователь не найден", show_alert=True)
         return
     user = users[idx]
     username = user.get("tg_username")
     text = f"👤 {username}\nchat_id: {user.get('chat_id') or '-'}\nВ боте с: {user.get('created_at') or '-'}"
-    kb = build_global_user_info_keyboard(idx)
+    kb = build_global_user_info_keyboard(idx, data.get("users_dir_page", 0))
     await _safe_edit_message(callback.message, text, kb)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("global_user:history:"))
-async def on_global_user_history(callback: CallbackQuery, state: FSMContext) -> None:
+async def _show_user_history(callback: CallbackQuery, state: FSMContext, idx: int, page: int, archived: bool = False) -> None:
     data = await state.get_data()
     users = data.get("global_users", [])
-    idx = int(callback.data.split(":")[-1])
     if idx >= len(users):
         await callback.answer("Пользователь не найден", show_alert=True)
         return
     username = users[idx].get("tg_username")
-    history = get_user_events_history(username)
-    if not history:
-        await callback.answer("История пуста", show_alert=True)
-        return
-    # Подготовим простой список
-    lines = ["📜 История мероприятий:"]
-    for rec in history[:30]:
+    history, has_more = get_user_events_history(username, page, PAGE_SIZE, archived)
+    if not history and page == 0:
+        await callback.answer("В архиве ничего нет" if archived else "История пуста", show_alert=True)
+        return
+    # Итоги берутся из сводной таблицы (с учётом архива), а список — одной страницей
+    header = f"🗄 Архив мероприятий {username}:" if archived else f"📜 История мероприятий {username}:"
+    lines = [header, format_user_stats(get_user_stats(username)), ""]
+    for rec in history:
         event = rec.get("events") or {}
         title = event.get("title", "Без названия")
         date = event.get("date", "-")
         status = rec.get("status", "?")
         lines.append(f"• {title} | {date} | {status}")
+    if page > 0 or has_more:
+        lines.append(f"\nСтраница {page + 1}")
     text = "\n".join(lines)
-    await _safe_edit_message(callback.message, text, build_global_user_info_keyboard(idx))
+    await _safe_edit_message(callback.message, text, build_user_history_keyboard(idx, page, has_more, archived))
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("global_user:blacklist_add:"))
-async def on_global_user_blacklist_add(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GlobalUserCb, "history", flags={"heavy": True})
+async def on_global_user_history(callback: CallbackQuery, state: FSMContext, callback_data: GlobalUserCb) -> None:
+    await _show_user_history(callback, state, callback_data.index, 0)
+
+
+@callbacks.register(UserHistoryCb, "page", flags={"heavy": True})
+async def on_user_history_page(callback: CallbackQuery, state: FSMContext, callback_data: UserHistoryCb) -> None:
+    await _show_user_history(callback, state, callback_data.index, callback_data.page)
+
+
+@callbacks.register(UserHistoryCb, "archive", flags={"heavy": True})
+async def on_user_history_archive(callback: CallbackQuery, state: FSMContext, callback_data: UserHistoryCb) -> None:
+    await _show_user_history(callback, state, callback_data.index, callback_data.page, archived=True)
+
+
+@callbacks.register(AttendanceCb, "page", flags={"heavy": True})
+async def on_attendance_page(callback: CallbackQuery, callback_data: AttendanceCb) -> None:
+    page = callback_data.page
+    rows, has_more = get_attendance_top(page)
+    if not rows and page == 0:
+        await callback.answer("Статистики пока нет", show_alert=True)
+        return
+    lines = ["📊 Посещаемость:"]
+    for i, row in enumerate(rows, start=page * PAGE_SIZE + 1):
+        lines.append(
+            f"{i}. {row.get('user_tg_username')} — посещений: {row.get('attended') or 0}, "
+            f"отмен: {row.get('cancellations') or 0}, из очереди: {row.get('waitlist_promotions') or 0}/{row.get('waitlist_joins') or 0}"
+        )
+    await _safe_edit_message(callback.message, "\n".join(lines), build_attendance_keyboard(page, has_more))
+    await callback.answer()
+
+
+@callbacks.register(GlobalUserCb, "blacklist_add", flags={"idempotent": True})
+async def on_global_user_blacklist_add(callback: CallbackQuery, state: FSMContext, callback_data: GlobalUserCb) -> None:
     data = await state.get_data()
     users = data.get("global_users", [])
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(users):
         await callback.answer("Пользователь не найден", show_alert=True)
         return
@@ -248,8 +447,8 @@ async def on_global_user_blacklist_add(callback: CallbackQuery, state: FSMContex
         await callback.answer("Не удалось добавить в ЧС", show_alert=True)
 
 
-@router.callback_query(F.data == "admin_users:blacklist")
-async def on_admin_users_blacklist(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(AdminUsersCb, "blacklist", flags={"heavy": True})
+async def on_admin_users_blacklist(callback: CallbackQuery, state: FSMContext, callback_data: AdminUsersCb) -> None:
     users = get_global_blacklist()
     await state.update_data(global_blacklist=users)
     kb = build_global_blacklist_list_keyboard(users)
@@ -257,11 +456,11 @@ async def on_admin_users_blacklist(callback: CallbackQuery, state: FSMContext) -
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("gbl:blacklist:show:"))
-async def on_global_blacklist_show(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GblCb, "blacklist", "show")
+async def on_global_blacklist_show(callback: CallbackQuery, state: FSMContext, callback_data: GblCb) -> None:
     data = await state.get_data()
     users = data.get("global_blacklist", [])
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(users):
         await callback.answer("Пользователь не найден", show_alert=True)
         return
@@ -272,11 +471,11 @@ async def on_global_blacklist_show(callback: CallbackQuery, state: FSMContext) -
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("gbl:blacklist:remove:"))
-async def on_global_blacklist_remove(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GblCb, "blacklist", "remove", flags={"idempotent": True})
+async def on_global_blacklist_remove(callback: CallbackQuery, state: FSMContext, callback_data: GblCb) -> None:
     data = await state.get_data()
     users = data.get("global_blacklist", [])
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(users):
         await callback.answer("Пользователь не найден", show_alert=True)
         return
@@ -292,8 +491,8 @@ async def on_global_blacklist_remove(callback: CallbackQuery, state: FSMContext)
         await callback.answer("Не удалось исключить", show_alert=True)
 
 
-@router.callback_query(F.data == "admin_users:admins")
-async def on_admin_users_admins(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(AdminUsersCb, "admins", flags={"heavy": True})
+async def on_admin_users_admins(callback: CallbackQuery, state: FSMContext, callback_data: AdminUsersCb) -> None:
     admins = get_all_admins()
     await state.update_data(global_admins=admins)
     kb = build_admins_list_keyboard(admins)
@@ -301,43 +500,147 @@ async def on_admin_users_admins(callback: CallbackQuery, state: FSMContext) -> N
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_users:games")
-async def on_admin_users_games(callback: CallbackQuery, state: FSMContext) -> None:
-    games = get_board_games()
-    await state.update_data(board_games_list=games)
-    kb = build_games_list_keyboard(games)
+# Списки настолок: поток -> (ключ списка в состоянии, ключ выбранных, меню, элемент)
+_GAME_PICK_FLOWS = {
+    "evt": ("evt_board_games_all", "evt_board_games_selected", DraftCb, DraftItemCb),
+    "evt_edit": ("evt_edit_board_games_all", "evt_edit_board_games_selected", EditDraftCb, EditDraftItemCb),
+    "list": ("board_games_list", None, None, None),
+}
+
+
+def _game_pick_text(flow: str) -> str:
+    return "🎲 Настольные игры:" if flow == "list" else "Выберите настолки (можно несколько):"
+
+
+async def _game_pick_keyboard(state: FSMContext, flow: str, refresh: bool = False) -> InlineKeyboardMarkup:
+    """Клавиатура списка настолок с текущими фильтрами и страницей.
+    В состоянии хранится только отфильтрованная проекция каталога (id, название, параметры)."""
+    data = await state.get_data()
+    list_key, selected_key, menu_cb, item_cb = _GAME_PICK_FLOWS[flow]
+    filters = data.get(f"game_filter_{flow}") or {}
+    games = data.get(list_key)
+    if refresh or games is None:
+        games = await search_games_async(filters)
+        await state.update_data({list_key: games})
+    page = filters.get("page", 0)
+    if flow == "list":
+        return build_games_list_keyboard(games, page, filters)
+    return build_board_games_selection_keyboard(games, data.get(selected_key) or [], menu_cb=menu_cb, item_cb=item_cb, page=page, filters=filters)
+
+
+async def _update_game_filter(state: FSMContext, flow: str, **changes: Any) -> None:
+    data = await state.get_data()
+    filters = dict(data.get(f"game_filter_{flow}") or {})
+    filters.update(changes)
+    await state.update_data({f"game_filter_{flow}": filters})
+
+
+@callbacks.register(AdminUsersCb, "games", flags={"heavy": True})
+async def on_admin_users_games(callback: CallbackQuery, state: FSMContext, callback_data: AdminUsersCb) -> None:
+    await state.update_data(game_filter_list={})
+    kb = await _game_pick_keyboard(state, "list", refresh=True)
     await _safe_edit_message(callback.message, "🎲 Настольные игры:", kb)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("games:show:"))
-async def on_show_game(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GamePickCb, "page")
+async def on_game_pick_page(callback: CallbackQuery, state: FSMContext, callback_data: GamePickCb) -> None:
+    if callback_data.flow not in _GAME_PICK_FLOWS:
+        await callback.answer()
+        return
+    await _update_game_filter(state, callback_data.flow, page=max(callback_data.value, 0))
+    kb = await _game_pick_keyboard(state, callback_data.flow)
+    await _safe_edit_message(callback.message, _game_pick_text(callback_data.flow), kb)
+    await callback.answer()
+
+
+@callbacks.register(GamePickCb, "players")
+@callbacks.register(GamePickCb, "duration")
+async def on_game_pick_filter(callback: CallbackQuery, state: FSMContext, callback_data: GamePickCb) -> None:
+    """Повторное нажатие на выбранный фильтр снимает его"""
+    if callback_data.flow not in _GAME_PICK_FLOWS:
+        await callback.answer()
+        return
+    data = await state.get_data()
+    current = (data.get(f"game_filter_{callback_data.flow}") or {}).get(callback_data.action)
+    value = None if current == callback_data.value else callback_data.value
+    await _update_game_filter(state, callback_data.flow, **{callback_data.action: value, "page": 0})
+    kb = await _game_pick_keyboard(state, callback_data.flow, refresh=True)
+    await _safe_edit_message(callback.message, _game_pick_text(callback_data.flow), kb)
+    await callback.answer()
+
+
+@callbacks.register(GamePickCb, "clear_query")
+async def on_game_pick_clear_query(callback: CallbackQuery, state: FSMContext, callback_data: GamePickCb) -> None:
+    if callback_data.flow not in _GAME_PICK_FLOWS:
+        await callback.answer()
+        return
+    await _update_game_filter(state, callback_data.flow, query=None, page=0)
+    kb = await _game_pick_keyboard(state, callback_data.flow, refresh=True)
+    await _safe_edit_message(callback.message, _game_pick_text(callback_data.flow), kb)
+    await callback.answer()
+
+
+@callbacks.register(GamePickCb, "search")
+async def on_game_pick_search(callback: CallbackQuery, state: FSMContext, callback_data: GamePickCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin or callback_data.flow not in _GAME_PICK_FLOWS:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    # Поиск может начаться посреди диалога создания/редактирования — после ответа вернёмся в него
+    await state.update_data(
+        game_pick_flow=callback_data.flow,
+        game_pick_chat_id=callback.message.chat.id,
+        game_pick_message_id=callback.message.message_id,
+        game_pick_prev_state=await state.get_state(),
+    )
+    await _ask_and_set_state(callback, state, "Введите часть названия игры:", GameSearchForm.waiting_for_query)
+
+
+@router.message(GameSearchForm.waiting_for_query)
+async def on_game_pick_query(message: Message, state: FSMContext) -> None:
+    data = await state.get_data()
+    flow = data.get("game_pick_flow") or "list"
+    query = (message.text or "").strip()
+    await _delete_prompt_and_input(message, state)
+    await state.set_state(data.get("game_pick_prev_state"))
+    await _update_game_filter(state, flow, query=query or None, page=0)
+    kb = await _game_pick_keyboard(state, flow, refresh=True)
+    try:
+        await message.bot.edit_message_reply_markup(chat_id=data.get("game_pick_chat_id"), message_id=data.get("game_pick_message_id"), reply_markup=kb)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            print(f"GAME_SEARCH_ERROR: {e}")
+    if not (await state.get_data()).get(_GAME_PICK_FLOWS[flow][0]):
+        await message.answer(f"Игр по запросу «{query}» не найдено")
+
+
+@callbacks.register(GamesItemCb, "show", flags={"heavy": True})
+async def on_show_game(callback: CallbackQuery, state: FSMContext, callback_data: GamesItemCb) -> None:
     data = await state.get_data()
     games = data.get("board_games_list", [])
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(games):
         await callback.answer("Игра не найдена", show_alert=True)
         return
-    game = games[idx]
+    # В списке только проекция каталога; правила и картинка читаются для одной игры
+    game = get_game(games[idx].get("id")) or games[idx]
     title = game.get("title") or "Без названия"
     rules = game.get("rules") or "Правила не указаны"
     caption = f"🎲 {title}\n\n📜 Правила:\n{rules}"
-    kb = build_game_view_keyboard()
-    if game.get("photo"):
-        try:
-            await callback.message.edit_media(
-                media=InputMediaPhoto(media=game["photo"], caption=caption),
-                reply_markup=kb
-            )
-        except Exception:
-            await _safe_edit_message(callback.message, caption, kb)
-    else:
-        await _safe_edit_message(callback.message, caption, kb)
+    if format_game_params(game):
+        caption = f"🎲 {title}\n{format_game_params(game)}\n\n📜 Правила:\n{rules}"
+    upcoming = get_events_with_game(game.get("title"))
+    if upcoming:
+        caption += "\n\n📅 Ближайшие мероприятия с этой игрой:\n" + "\n".join(
+            f"• {event.get('title', 'Без названия')} — {event.get('date') or '-'}" for event in upcoming[:5]
+        )
+    kb = build_game_view_keyboard((data.get("game_filter_list") or {}).get("page", 0))
+    await show_card(callback.message, game.get("photo"), caption, kb)
     await callback.answer()
 
 
-@router.callback_query(F.data == "games:create")
-async def on_create_game(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GamesCb, "create")
+async def on_create_game(callback: CallbackQuery, state: FSMContext, callback_data: GamesCb) -> None:
     draft = {"photo": None, "title": None, "rules": None}
     await state.update_data(game_draft=draft, game_card_chat_id=callback.message.chat.id, game_card_message_id=callback.message.message_id)
     # Показ карточки с кнопками
@@ -345,8 +648,8 @@ async def on_create_game(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "game:photo")
-async def game_cb_set_photo(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GameDraftCb, "photo")
+async def game_cb_set_photo(callback: CallbackQuery, state: FSMContext, callback_data: GameDraftCb) -> None:
     await _ask_and_set_state(callback, state, "Отправьте картинку игры (или пропустите, отправив '-' ):", BoardGameCreateForm.waiting_for_photo)
 
 
@@ -356,24 +659,28 @@ async def game_set_photo(message: Message, state: FSMContext) -> None:
     draft = data.get("game_draft", {})
     photo_value = None
     if (message.text or "").strip() != "-":
-        if message.photo:
-            try:
-                photo_value = message.photo[-1].file_id
-            except Exception:
-                photo_value = None
+        photo_value = photo_from_message(message)
         if not photo_value:
             photo_value = (message.text or "").strip() or None
     draft["photo"] = photo_value
-    await state.update_data(game_draft=draft)
     await _delete_prompt_and_input(message, state)
-    # Обновляем карточку
-    # Обновляем карточку
-    await message.answer(format_game_text(draft), reply_markup=build_game_inline_keyboard(draft))
+    # Обновляем карточку; ссылка проверяется отправкой один раз и заменяется на file_id
+    sent = None
+    if photo_value:
+        sent = await send_photo_card(message, photo_value, format_game_text(draft), build_game_inline_keyboard(draft))
+        if sent is None:
+            draft["photo"] = None
+            await message.answer("Не удалось загрузить картинку, игра будет сохранена без неё")
+        else:
+            draft["photo"] = cached_photo(photo_value) or photo_value
+    if sent is None:
+        await message.answer(format_game_text(draft), reply_markup=build_game_inline_keyboard(draft))
+    await state.update_data(game_draft=draft)
     await state.set_state(None)
 
 
-@router.callback_query(F.data == "game:title")
-async def game_cb_set_title(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GameDraftCb, "title")
+async def game_cb_set_title(callback: CallbackQuery, state: FSMContext, callback_data: GameDraftCb) -> None:
     await _ask_and_set_state(callback, state, "Введите название игры:", BoardGameCreateForm.waiting_for_title)
 
 
@@ -388,8 +695,28 @@ async def game_set_title(message: Message, state: FSMContext) -> None:
     await state.set_state(None)
 
 
-@router.callback_query(F.data == "game:rules")
-async def game_cb_set_rules(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GameDraftCb, "params")
+async def game_cb_set_params(callback: CallbackQuery, state: FSMContext, callback_data: GameDraftCb) -> None:
+    await _ask_and_set_state(callback, state, "Укажите число игроков и длительность партии в минутах, например «2-4 60»:", BoardGameCreateForm.waiting_for_params)
+
+
+@router.message(BoardGameCreateForm.waiting_for_params)
+async def game_set_params(message: Message, state: FSMContext) -> None:
+    params = parse_game_params(message.text or "")
+    if params is None:
+        await message.answer("Не удалось разобрать. Пример: «2-4 60» — от 2 до 4 игроков, партия 60 минут")
+        return
+    data = await state.get_data()
+    draft = data.get("game_draft", {})
+    draft.update(params)
+    await state.update_data(game_draft=draft)
+    await _delete_prompt_and_input(message, state)
+    await message.answer(format_game_text(draft), reply_markup=build_game_inline_keyboard(draft))
+    await state.set_state(None)
+
+
+@callbacks.register(GameDraftCb, "rules")
+async def game_cb_set_rules(callback: CallbackQuery, state: FSMContext, callback_data: GameDraftCb) -> None:
     await _ask_and_set_state(callback, state, "Вставьте правила (текст):", BoardGameCreateForm.waiting_for_rules)
 
 
@@ -404,8 +731,8 @@ async def game_set_rules(message: Message, state: FSMContext) -> None:
     await message.answer(format_game_text(draft), reply_markup=build_game_final_confirm_keyboard())
 
 
-@router.callback_query(F.data == "game:final_cancel")
-async def game_final_cancel(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GameDraftCb, "final_cancel")
+async def game_final_cancel(callback: CallbackQuery, state: FSMContext, callback_data: GameDraftCb) -> None:
     await callback.answer("Продолжайте редактирование", show_alert=False)
     data = await state.get_data()
     draft = data.get("game_draft", {})
@@ -420,8 +747,8 @@ async def game_final_cancel(callback: CallbackQuery, state: FSMContext) -> None:
     }), build_game_inline_keyboard(draft))
 
 
-@router.callback_query(F.data == "game:final_confirm")
-async def game_final_confirm(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GameDraftCb, "final_confirm", flags={"idempotent": True})
+async def game_final_confirm(callback: CallbackQuery, state: FSMContext, callback_data: GameDraftCb) -> None:
     data = await state.get_data()
     draft = data.get("game_draft", {})
     if not draft.get("title"):
@@ -431,36 +758,44 @@ async def game_final_confirm(callback: CallbackQuery, state: FSMContext) -> None
         "title": draft.get("title"),
         "photo": draft.get("photo"),
         "rules": draft.get("rules"),
+        "min_players": draft.get("min_players"),
+        "max_players": draft.get("max_players"),
+        "duration_minutes": draft.get("duration_minutes"),
     })
     if ok:
         await callback.answer("Игра создана", show_alert=True)
-        games = get_board_games()
-        await state.update_data(board_games_list=games, game_draft=None)
-        kb = build_games_list_keyboard(games)
+        await state.update_data(game_draft=None, game_filter_list={})
+        kb = await _game_pick_keyboard(state, "list", refresh=True)
         await _safe_edit_message(callback.message, "🎲 Настольные игры:", kb)
     else:
         await callback.answer("Ошибка при создании", show_alert=True)
-@router.callback_query(F.data.startswith("gbl:admins:show:"))
-async def on_admin_info(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GblCb, "admins", "show")
+async def on_admin_info(callback: CallbackQuery, state: FSMContext, callback_data: GblCb) -> None:
     data = await state.get_data()
     admins = data.get("global_admins", [])
-    idx = int(callback.data.split(":")[3])
+    idx = callback_data.index
     if idx >= len(admins):
         await callback.answer("Админ не найден", show_alert=True)
         return
     admin = admins[idx]
     tg = admin.get("tg") or admin.get("tg_username")
     text = f"🛡 {tg}"
+    stats = get_admin_stats(tg)
+    if stats:
+        text += (
+            f"\n\nМероприятий ответственным: {stats.get('events_total') or 0}"
+            f"\nЗавершено: {stats.get('events_completed') or 0}, отменено: {stats.get('events_cancelled') or 0}"
+        )
     kb = build_admin_info_keyboard(idx)
     await _safe_edit_message(callback.message, text, kb)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("gbl:admin:past_events:"))
-async def on_admin_past_events(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GblCb, "admin", "past_events", flags={"heavy": True})
+async def on_admin_past_events(callback: CallbackQuery, state: FSMContext, callback_data: GblCb) -> None:
     data = await state.get_data()
     admins = data.get("global_admins", [])
-    idx = int(callback.data.split(":")[3])
+    idx = callback_data.index
     if idx >= len(admins):
         await callback.answer("Админ не найден", show_alert=True)
         return
@@ -476,11 +811,11 @@ async def on_admin_past_events(callback: CallbackQuery, state: FSMContext) -> No
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("global_user:message:"))
-async def on_global_user_message(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GlobalUserCb, "message")
+async def on_global_user_message(callback: CallbackQuery, state: FSMContext, callback_data: GlobalUserCb) -> None:
     data = await state.get_data()
     users = data.get("global_users", [])
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(users):
         await callback.answer("Пользователь не найден", show_alert=True)
         return
@@ -488,45 +823,45 @@ async def on_global_user_message(callback: CallbackQuery, state: FSMContext) ->
     username = user.get("tg_username")
     chat_id = user.get("chat_id")
     await state.update_data(global_msg_target_username=username, global_msg_target_chat_id=chat_id)
-    kb = build_cancel_global_message_keyboard("admin_users:participants")
+    kb = build_cancel_global_message_keyboard(AdminUsersCb(section="participants").pack())
     await _safe_edit_message(callback.message, f"💬 Написать пользователю {username}\n\nВведите текст сообщения:", kb)
     await state.set_state(GlobalMessageForm.waiting_for_message)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("gbl:blacklist:message:"))
-async def on_global_blacklist_message(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GblCb, "blacklist", "message")
+async def on_global_blacklist_message(callback: CallbackQuery, state: FSMContext, callback_data: GblCb) -> None:
     data = await state.get_data()
     users = data.get("global_blacklist", [])
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(users):
         await callback.answer("Пользователь не найден", show_alert=True)
         return
     username = users[idx].get("user_tg_username")
     await state.update_data(global_msg_target_username=username, global_msg_target_chat_id=None)
-    kb = build_cancel_global_message_keyboard("admin_users:blacklist")
+    kb = build_cancel_global_message_keyboard(AdminUsersCb(section="blacklist").pack())
     await _safe_edit_message(callback.message, f"💬 Написать пользователю {username}\n\nВведите текст сообщения:", kb)
     await state.set_state(GlobalMessageForm.waiting_for_message)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("gbl:admin:message:"))
-async def on_admins_list_message(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(GblCb, "admin", "message")
+async def on_admins_list_message(callback: CallbackQuery, state: FSMContext, callback_data: GblCb) -> None:
     data = await state.get_data()
     admins = data.get("global_admins", [])
-    idx = int(callback.data.split(":")[3])
+    idx = callback_data.index
     if idx >= len(admins):
         await callback.answer("Админ не найден", show_alert=True)
         return
     tg = admins[idx].get("tg") or admins[idx].get("tg_username")
     await state.update_data(global_msg_target_username=tg, global_msg_target_chat_id=None)
-    kb = build_cancel_global_message_keyboard("admin_users:admins")
+    kb = build_cancel_global_message_keyboard(AdminUsersCb(section="admins").pack())
     await _safe_edit_message(callback.message, f"💬 Написать администратору {tg}\n\nВведите текст сообщения:", kb)
     await state.set_state(GlobalMessageForm.waiting_for_message)
     await callback.answer()
 
 
-@router.message(GlobalMessageForm.waiting_for_message)
+@router.message(GlobalMessageForm.waiting_for_message, flags={"heavy": True})
 async def on_global_message_send(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     username = data.get("global_msg_target_username")
@@ -549,14 +884,14 @@ async def on_global_message_send(message: Message, state: FSMContext) -> None:
             print(f"ERROR sending global msg by username: {e}")
     await message.answer("Сообщение отправлено" if delivered else "Не удалось доставить сообщение")
     await state.clear()
-@router.callback_query(F.data.startswith("event:complete:"))
-async def on_complete_event(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EventCb, "complete", flags={"idempotent": True, "heavy": True})
+async def on_complete_event(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
     # Извлекаем индекс мероприятия из callback_data
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     
     # Получаем список мероприятий из состояния
     data = await state.get_data()
@@ -576,8 +911,9 @@ async def on_complete_event(callback: CallbackQuery, state: FSMContext) -> None:
     # Обновляем мероприятие в базе данных
     supabase = get_supabase()
     try:
-        # Используем title для идентификации мероприятия, так как id может отсутствовать
-        supabase.table("events").update({"is_completed": True}).eq("title", event["title"]).execute()
+        # По id: у вхождений одной серии одинаковое название
+        replica.apply("events", execute(supabase.table("events").update({"is_completed": True}).eq("id", event["id"])).data)
+        invalidate_event_caches()
         
         await callback.answer("Мероприятие завершено! ✅", show_alert=True)
         
@@ -607,13 +943,12 @@ async def on_complete_event(callback: CallbackQuery, state: FSMContext) -> None:
         # Уведомляем всех зарегистрированных участников о завершении мероприятия
         try:
             # Получаем всех зарегистрированных участников
-            participants_resp = (
+            participants_resp = execute(
                 supabase
                 .table("event_registrations")
                 .select("user_tg_username")
                 .eq("event_id", event.get("id"))
                 .eq("status", "registered")
-                .execute()
             )
             
             if participants_resp.data:
@@ -639,21 +974,8 @@ async def on_complete_event(callback: CallbackQuery, state: FSMContext) -> None:
         await callback.answer("Ошибка при завершении мероприятия", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("event:show:"))
-async def on_show_event_details(callback: CallbackQuery, state: FSMContext) -> None:
-    # Извлекаем индекс мероприятия из callback_data
-    event_index = int(callback.data.split(":")[2])
-    
-    # Получаем список мероприятий из состояния
-    data = await state.get_data()
-    events = data.get("events_list", [])
-    
-    if event_index >= len(events):
-        await callback.answer("Мероприятие не найдено", show_alert=True)
-        return
-    
-    event = events[event_index]
-    
+async def _event_details(bot, event: Dict[str, Any], event_index: int, user_ctx: UserContext) -> tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Текст и клавиатура карточки мероприятия с учётом роли и статуса регистрации"""
     # Форматируем детали мероприятия
     details = f"📋 {event.get('title', 'Без названия')}\n\n"
     
@@ -678,9 +1000,16 @@ async def on_show_event_details(callback: CallbackQuery, state: FSMContext) -> N
     if event.get("quantity"):
         details += f"👤 Количество участников: {event['quantity']}\n\n"
     
-    # Добавляем информацию о доступных местах
-    available_slots = get_event_available_slots_count(event.get("id"))
-    if available_slots == -1:
+    # Места перечитываются: в снимке events_list счётчик устарел, а в реплике registered_count
+    # догоняет триггер только после синхронизации — поэтому через _fetch_event_slots
+    # (без реплики — одна строка events, с репликой — локальный подсчёт регистраций)
+    try:
+        occupied, max_slots = await get_event_available_slots_async(event.get("id"))
+    except Exception as e:
+        print(f"ERROR getting event available slots: {e}")
+        occupied, max_slots = event_slots(event)
+    available_slots = max(0, max_slots - occupied)
+    if not max_slots:
         details += "🎫 Мест: неограниченно\n\n"
     elif available_slots == 0:
         details += "🎫 Мест: нет свободных мест\n\n"
@@ -688,7 +1017,10 @@ async def on_show_event_details(callback: CallbackQuery, state: FSMContext) -> N
         details += f"🎫 Свободных мест: {available_slots}\n\n"
     
     # Проверяем, является ли пользователь админом
-    is_admin = user_is_admin(callback.from_user.username if callback.from_user else None)
+    is_admin = user_ctx.is_admin
+    if is_admin and not event.get("is_completed", False) and not event.get("is_cancelled", False):
+        # Ссылка, по которой пользователь сразу попадает в карточку записи
+        details += f"🔗 Ссылка для записи: {await create_start_link(bot, EVENT_LINK_PREFIX + str(event.get('id')))}\n\n"
     
     # Создаем клавиатуру для деталей мероприятия
     keyboard = []
@@ -697,7 +1029,7 @@ async def on_show_event_details(callback: CallbackQuery, state: FSMContext) -> N
         # Клавиатура для админов
         if not event.get("is_completed", False) and not event.get("is_cancelled", False):
             # Используем готовую клавиатуру управления
-            keyboard = build_event_management_keyboard(event_index).inline_keyboard
+            keyboard = build_event_management_keyboard(event_index, in_series=bool(event.get("series_id"))).inline_keyboard
         else:
             # Для завершённых/отменённых мероприятий показать кнопки: участники и сбор статистики
             keyboard = build_past_event_actions_keyboard(event_index).inline_keyboard
@@ -706,83 +1038,85 @@ async def on_show_event_details(callback: CallbackQuery, state: FSMContext) -> N
         if not event.get("is_completed", False) and not event.get("is_cancelled", False):
             # Проверяем, зарегистрирован ли пользователь на это мероприятие
             is_registered = is_user_registered_for_event(
-                callback.from_user.username if callback.from_user else None,
+                user_ctx.username,
                 event.get("id")
             )
             
             # Проверяем, находится ли пользователь в очереди ожидания
             is_on_waitlist = is_user_on_waitlist(
-                callback.from_user.username if callback.from_user else None,
+                user_ctx.username,
                 event.get("id")
             )
             
             if is_registered:
-                keyboard.append([InlineKeyboardButton(text="❌ Отменить регистрацию", callback_data=f"event:unregister:{event_index}")])
+                keyboard.append([InlineKeyboardButton(text="❌ Отменить регистрацию", callback_data=EventCb(action="unregister", index=event_index).pack())])
             elif is_on_waitlist:
                 # Показываем позицию в очереди
                 position = get_waitlist_position(
-                    callback.from_user.username if callback.from_user else None,
+                    user_ctx.username,
                     event.get("id")
                 )
-                keyboard.append([InlineKeyboardButton(text=f"⏳ В очереди (№{position})", callback_data=f"event:leave_waitlist:{event_index}")])
+                keyboard.append([InlineKeyboardButton(text=f"⏳ В очереди (№{position})", callback_data=EventCb(action="leave_waitlist", index=event_index).pack())])
             else:
                 # Проверяем, не заполнено ли мероприятие
-                if is_event_full(event.get("id")):
-                    keyboard.append([InlineKeyboardButton(text="📋 Занять место", callback_data=f"event:join_waitlist:{event_index}")])
+                if max_slots and available_slots == 0:
+                    keyboard.append([InlineKeyboardButton(text="📋 Занять место", callback_data=EventCb(action="join_waitlist", index=event_index).pack())])
                 else:
-                    keyboard.append([InlineKeyboardButton(text="📝 Зарегистрироваться", callback_data=f"event:register:{event_index}")])
+                    keyboard.append([InlineKeyboardButton(text="📝 Зарегистрироваться", callback_data=EventCb(action="register", index=event_index).pack())])
             # Добавим кнопку написать ответственному
-            responsibles_raw = event.get("responsible") or ""
-            responsibles = [s.strip() for s in responsibles_raw.split(",") if s.strip()]
-            if responsibles:
-                keyboard.append([InlineKeyboardButton(text="💬 Написать ответственному", callback_data=f"user:contact_resp_list:{event_index}")])
+            if split_event_list(event.get("responsible")):
+                keyboard.append([InlineKeyboardButton(text="💬 Написать ответственному", callback_data=ContactCb(action="contact_resp_list", index=event_index).pack())])
         else:
             details += "❌ Регистрация на это мероприятие закрыта\n\n"
     
-    # Создаем клавиатуру
-    inline_keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None
+    return details, InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None
+
+
+@callbacks.register(EventCb, "show", flags={"heavy": True})
+async def on_show_event_details(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
+    # Извлекаем индекс мероприятия из callback_data
+    event_index = callback_data.index
     
-    # Редактируем существующее сообщение
-    if event.get("photo"):
-        # Проверяем, является ли photo валидным file_id
-        photo_value = event['photo']
-        is_valid_file_id = (
-            isinstance(photo_value, str) and 
-            len(photo_value) > 20 and 
-            not any(char in photo_value for char in [' ', '\n', '\t', 'ывп'])  # Простая проверка
-        )
-        
-        if is_valid_file_id:
-            # Если есть фото и оно валидное, редактируем как фото
-            try:
-                await callback.message.edit_media(
-                    media=InputMediaPhoto(
-                        media=photo_value,
-                        caption=details
-                    ),
-                    reply_markup=inline_keyboard
-                )
-            except Exception as e:
-                print(f"PHOTO_EDIT_ERROR: {e}")
-                # Если не удалось отредактировать как фото, редактируем как текст
-                await callback.message.edit_text(details, reply_markup=inline_keyboard)
-        else:
-            # Если фото невалидное, редактируем как текст
-            await callback.message.edit_text(details, reply_markup=inline_keyboard)
-    else:
-        # Если нет фото, редактируем как текст
-        await callback.message.edit_text(details, reply_markup=inline_keyboard)
+    # Получаем список мероприятий из состояния
+    data = await state.get_data()
+    events = data.get("events_list", [])
+    
+    if event_index >= len(events):
+        await callback.answer("Мероприятие не найдено", show_alert=True)
+        return
+    
+    event = events[event_index]
+    details, inline_keyboard = await _event_details(callback.bot, event, event_index, user_ctx)
+    
+    # Редактируем существующее сообщение (картинка проверяется через реестр один раз)
+    await show_card(callback.message, event.get("photo"), details, inline_keyboard)
     
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("event:collect_stats:"))
-async def on_collect_stats(callback: CallbackQuery, state: FSMContext) -> None:
+async def open_event_from_link(message: Message, state: FSMContext, user_ctx: UserContext, event_id: int) -> None:
+    """Карточка мероприятия по ссылке /start ev_<id>: один запрос по ключу вместо загрузки всего списка.
+    Мероприятие кладётся в events_list единственным элементом, поэтому кнопки карточки работают как обычно."""
+    event = get_event_by_id(event_id)
+    if not event:
+        await message.answer("Мероприятие не найдено или уже удалено")
+        return
+    await state.update_data(events_list=[event])
+    details, inline_keyboard = await _event_details(message.bot, event, 0, user_ctx)
+    if event.get("photo"):
+        sent = await send_photo_card(message, event["photo"], details, inline_keyboard)
+        if sent is not None:
+            return
+    await message.answer(details, reply_markup=inline_keyboard)
+
+
+@callbacks.register(EventCb, "collect_stats", flags={"idempotent": True, "heavy": True})
+async def on_collect_stats(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
     """Отправляет всем участникам прошедшего мероприятия запрос на оценку 1-10 и комментарий"""
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     data = await state.get_data()
     events = data.get("events_list", [])
     if event_index >= len(events):
@@ -815,13 +1149,80 @@ async def on_collect_stats(callback: CallbackQuery, state: FSMContext) -> None:
             print(f"ERROR sending feedback request to {username}: {e}")
             failed += 1
     await callback.answer(f"Запрос отправлен. Успешно: {sent}, ошибок: {failed}", show_alert=True)
-@router.callback_query(F.data.startswith("feedback:rate:"))
-async def on_feedback_rate(callback: CallbackQuery, state: FSMContext) -> None:
+
+
+@callbacks.register(EventCb, "feedback_stats")
+async def on_feedback_stats(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
+    """Сводка оценок, последних комментариев и заполненности прошедшего мероприятия"""
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    event_index = callback_data.index
+    data = await state.get_data()
+    events = data.get("events_list", [])
+    if event_index >= len(events):
+        await callback.answer("Мероприятие не найдено", show_alert=True)
+        return
+    event = events[event_index]
+    stats = get_event_feedback_stats(event.get("id"))
+    text = format_feedback_stats(event.get("title", "Мероприятие"), stats)
+    text += "\n\n" + format_fill_stats(get_event_fill_stats(event.get("id")))
+    await _safe_edit_message(callback.message, text, build_feedback_stats_keyboard(event_index))
+    await callback.answer()
+
+
+async def _send_export(callback: CallbackQuery, build: Callable[[], str], filename: str) -> None:
+    """Собирает CSV в фоновом потоке и отправляет документом; временный файл удаляется"""
+    await callback.answer("Готовлю файл…")
+    try:
+        path = await asyncio.to_thread(build)
+    except Exception as e:
+        print(f"ERROR building export {filename}: {e}")
+        await callback.message.answer("Не удалось сформировать выгрузку")
+        return
+    try:
+        await callback.message.answer_document(FSInputFile(path, filename=filename))
+    finally:
+        os.remove(path)
+
+
+async def _export_event(callback: CallbackQuery, state: FSMContext, callback_data: ExportCb, user_ctx: UserContext, build: Callable[[int], str], name: str) -> None:
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    data = await state.get_data()
+    events = data.get("events_list", [])
+    if callback_data.index >= len(events):
+        await callback.answer("Мероприятие не найдено", show_alert=True)
+        return
+    event_id = events[callback_data.index].get("id")
+    await _send_export(callback, lambda: build(event_id), f"{name}_{event_id}.csv")
+
+
+@callbacks.register(ExportCb, "participants", flags={"idempotent": True, "heavy": True})
+async def on_export_participants(callback: CallbackQuery, state: FSMContext, callback_data: ExportCb, user_ctx: UserContext) -> None:
+    await _export_event(callback, state, callback_data, user_ctx, export_participants, "participants")
+
+
+@callbacks.register(ExportCb, "feedback", flags={"idempotent": True, "heavy": True})
+async def on_export_feedback(callback: CallbackQuery, state: FSMContext, callback_data: ExportCb, user_ctx: UserContext) -> None:
+    await _export_event(callback, state, callback_data, user_ctx, export_feedback, "feedback")
+
+
+@callbacks.register(ExportCb, "users", flags={"idempotent": True, "heavy": True})
+async def on_export_users(callback: CallbackQuery, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    await _send_export(callback, export_users, "users.csv")
+
+
+@callbacks.register(FeedbackCb, "rate", flags={"idempotent": True})
+async def on_feedback_rate(callback: CallbackQuery, state: FSMContext, callback_data: FeedbackCb, user_ctx: UserContext) -> None:
     """Прием оценки от 1 до 10 и запрос комментария"""
-    parts = callback.data.split(":")
-    event_id = int(parts[2])
-    rating = int(parts[3])
-    username = callback.from_user.username if callback.from_user else None
+    event_id = callback_data.event_id
+    rating = callback_data.rating
+    username = user_ctx.username
     if not save_event_feedback_rating(username, event_id, rating):
         await callback.answer("Не удалось сохранить оценку", show_alert=True)
         return
@@ -835,11 +1236,10 @@ async def on_feedback_rate(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("feedback:skip_comment:"))
-async def on_feedback_skip_comment(callback: CallbackQuery, state: FSMContext) -> None:
-    parts = callback.data.split(":")
-    event_id = int(parts[2])
-    rating = int(parts[3])
+@callbacks.register(FeedbackCb, "skip_comment", flags={"idempotent": True})
+async def on_feedback_skip_comment(callback: CallbackQuery, state: FSMContext, callback_data: FeedbackCb) -> None:
+    event_id = callback_data.event_id
+    rating = callback_data.rating
     await state.clear()
     await callback.answer("Спасибо за отзыв!", show_alert=True)
     try:
@@ -849,19 +1249,19 @@ async def on_feedback_skip_comment(callback: CallbackQuery, state: FSMContext) -
 
 
 @router.message(FeedbackForm.waiting_for_comment)
-async def on_feedback_comment(message: Message, state: FSMContext) -> None:
+async def on_feedback_comment(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
     data = await state.get_data()
     event_id = data.get("feedback_event_id")
     rating = data.get("feedback_rating")
     comment = message.text or ""
-    username = message.from_user.username if message.from_user else None
+    username = user_ctx.username
     save_event_feedback_comment(username, event_id, comment)
     await message.answer("Спасибо! Ваш отзыв сохранен.")
     await state.clear()
 
 
-@router.callback_query(F.data == "event:back_to_list")
-async def on_back_to_list(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EventMenuCb, "back_to_list", flags={"heavy": True})
+async def on_back_to_list(callback: CallbackQuery, state: FSMContext, callback_data: EventMenuCb, user_ctx: UserContext) -> None:
     # Получаем список мероприятий из состояния
     data = await state.get_data()
     events = data.get("events_list", [])
@@ -877,7 +1277,7 @@ async def on_back_to_list(callback: CallbackQuery, state: FSMContext) -> None:
     is_past_events = events[0].get("is_completed", False) if events else False
     
     # Проверяем, является ли пользователь админом
-    is_admin = user_is_admin(callback.from_user.username if callback.from_user else None)
+    is_admin = user_ctx.is_admin
     
     if is_admin:
         if is_past_events:
@@ -917,11 +1317,11 @@ async def _ask_and_set_state(callback: CallbackQuery, state: FSMContext, text: s
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("evt:responsible_toggle"))
-async def on_responsible_toggle(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(DraftItemCb, "responsible_toggle")
+async def on_responsible_toggle(callback: CallbackQuery, state: FSMContext, callback_data: DraftItemCb) -> None:
     data = await state.get_data()
     admins = data.get("responsible_admins") or data.get("edit_responsible_admins") or []
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(admins):
         await callback.answer()
         return
@@ -933,16 +1333,17 @@ async def on_responsible_toggle(callback: CallbackQuery, state: FSMContext) -> N
     else:
         selected.append(tg)
     await state.update_data(**{key_selected: selected})
-    kb = build_admins_selection_keyboard(admins, selected, done_callback=("evt:responsible_done" if key_selected=="selected_responsibles" else "evt_edit:responsible_done"), toggle_prefix=("evt:responsible_toggle" if key_selected=="selected_responsibles" else "evt_edit:responsible_toggle"), back_callback=("evt:responsible_back" if key_selected=="selected_responsibles" else "evt_edit:responsible_back"))
+    is_new = key_selected == "selected_responsibles"
+    kb = build_admins_selection_keyboard(admins, selected, menu_cb=(DraftCb if is_new else EditDraftCb), item_cb=(DraftItemCb if is_new else EditDraftItemCb))
     await _safe_edit_message(callback.message, "Выберите ответственных (можно несколько):", kb)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("evt:board_games_toggle"))
-async def on_evt_board_games_toggle(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(DraftItemCb, "board_games_toggle")
+async def on_evt_board_games_toggle(callback: CallbackQuery, state: FSMContext, callback_data: DraftItemCb) -> None:
     data = await state.get_data()
     games = data.get("evt_board_games_all", [])
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(games):
         await callback.answer()
         return
@@ -954,14 +1355,13 @@ async def on_evt_board_games_toggle(callback: CallbackQuery, state: FSMContext)
         selected.add(title)
     selected_list = list(selected)
     await state.update_data(evt_board_games_selected=selected_list)
-    from ..keyboards import build_board_games_selection_keyboard
-    kb = build_board_games_selection_keyboard(games, selected_list, done_callback="evt:board_games_done", toggle_prefix="evt:board_games_toggle", back_callback="evt:board_games_back")
+    kb = await _game_pick_keyboard(state, "evt")
     await _safe_edit_message(callback.message, "Выберите настолки (можно несколько):", kb)
     await callback.answer()
 
 
-@router.callback_query(F.data == "evt:board_games_done")
-async def on_evt_board_games_done(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(DraftCb, "board_games_done")
+async def on_evt_board_games_done(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb) -> None:
     data = await state.get_data()
     draft = data.get("event_draft") or {}
     selected = data.get("evt_board_games_selected", [])
@@ -971,16 +1371,16 @@ async def on_evt_board_games_done(callback: CallbackQuery, state: FSMContext) ->
     await callback.answer()
 
 
-@router.callback_query(F.data == "evt:board_games_back")
-async def on_evt_board_games_back(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(DraftCb, "board_games_back")
+async def on_evt_board_games_back(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb) -> None:
     data = await state.get_data()
     draft = data.get("event_draft") or {}
     await _safe_edit_message(callback.message, format_event_text(draft), build_event_inline_keyboard(draft))
     await callback.answer()
 
 
-@router.callback_query(F.data == "evt:responsible_done")
-async def on_responsible_done(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(DraftCb, "responsible_done")
+async def on_responsible_done(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb) -> None:
     data = await state.get_data()
     draft = data.get("event_draft") or {}
     selected: list[str] = data.get("selected_responsibles", [])
@@ -992,8 +1392,8 @@ async def on_responsible_done(callback: CallbackQuery, state: FSMContext) -> Non
     await callback.answer("Ответственные обновлены", show_alert=True)
 
 
-@router.callback_query(F.data == "evt:responsible_back")
-async def on_responsible_back(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(DraftCb, "responsible_back")
+async def on_responsible_back(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb) -> None:
     data = await state.get_data()
     draft = data.get("event_draft") or {}
     await _safe_edit_message(callback.message, format_event_text(draft), build_event_inline_keyboard(draft))
@@ -1001,11 +1401,11 @@ async def on_responsible_back(callback: CallbackQuery, state: FSMContext) -> Non
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("evt_edit:responsible_toggle"))
-async def on_edit_responsible_toggle(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EditDraftItemCb, "responsible_toggle")
+async def on_edit_responsible_toggle(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftItemCb) -> None:
     data = await state.get_data()
     admins = data.get("edit_responsible_admins") or []
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(admins):
         await callback.answer()
         return
@@ -1016,16 +1416,16 @@ async def on_edit_responsible_toggle(callback: CallbackQuery, state: FSMContext)
     else:
         selected.append(tg)
     await state.update_data(edit_selected_responsibles=selected)
-    kb = build_admins_selection_keyboard(admins, selected, done_callback="evt_edit:responsible_done", toggle_prefix="evt_edit:responsible_toggle", back_callback="evt_edit:responsible_back")
+    kb = build_admins_selection_keyboard(admins, selected, menu_cb=EditDraftCb, item_cb=EditDraftItemCb)
     await _safe_edit_message(callback.message, "Выберите ответственных (можно несколько):", kb)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("evt_edit:board_games_toggle"))
-async def on_evt_edit_board_games_toggle(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EditDraftItemCb, "board_games_toggle")
+async def on_evt_edit_board_games_toggle(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftItemCb) -> None:
     data = await state.get_data()
     games = data.get("evt_edit_board_games_all", [])
-    idx = int(callback.data.split(":")[-1])
+    idx = callback_data.index
     if idx >= len(games):
         await callback.answer()
         return
@@ -1037,14 +1437,13 @@ async def on_evt_edit_board_games_toggle(callback: CallbackQuery, state: FSMCont
         selected.add(title)
     selected_list = list(selected)
     await state.update_data(evt_edit_board_games_selected=selected_list)
-    from ..keyboards import build_board_games_selection_keyboard
-    kb = build_board_games_selection_keyboard(games, selected_list, done_callback="evt_edit:board_games_done", toggle_prefix="evt_edit:board_games_toggle", back_callback="evt_edit:board_games_back")
+    kb = await _game_pick_keyboard(state, "evt_edit")
     await _safe_edit_message(callback.message, "Выберите настолки (можно несколько):", kb)
     await callback.answer()
 
 
-@router.callback_query(F.data == "evt_edit:board_games_done")
-async def on_evt_edit_board_games_done(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EditDraftCb, "board_games_done")
+async def on_evt_edit_board_games_done(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb) -> None:
     data = await state.get_data()
     edit_draft = data.get("edit_draft") or {}
     selected = data.get("evt_edit_board_games_selected", [])
@@ -1055,8 +1454,8 @@ async def on_evt_edit_board_games_done(callback: CallbackQuery, state: FSMContex
     await callback.answer()
 
 
-@router.callback_query(F.data == "evt_edit:board_games_back")
-async def on_evt_edit_board_games_back(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EditDraftCb, "board_games_back")
+async def on_evt_edit_board_games_back(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb) -> None:
     data = await state.get_data()
     edit_draft = data.get("edit_draft") or {}
     kb = build_event_edit_keyboard(edit_draft)
@@ -1064,8 +1463,8 @@ async def on_evt_edit_board_games_back(callback: CallbackQuery, state: FSMContex
     await callback.answer()
 
 
-@router.callback_query(F.data == "evt_edit:responsible_done")
-async def on_edit_responsible_done(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EditDraftCb, "responsible_done")
+async def on_edit_responsible_done(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb) -> None:
     data = await state.get_data()
     edit_draft = data.get("edit_draft") or {}
     selected: list[str] = data.get("edit_selected_responsibles", [])
@@ -1078,53 +1477,51 @@ async def on_edit_responsible_done(callback: CallbackQuery, state: FSMContext) -
     await callback.answer("Ответственные обновлены", show_alert=True)
 
 
-@router.callback_query(F.data == "evt_edit:responsible_back")
-async def on_edit_responsible_back(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EditDraftCb, "responsible_back")
+async def on_edit_responsible_back(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb) -> None:
     data = await state.get_data()
     edit_draft = data.get("edit_draft") or {}
     kb = build_event_edit_keyboard(edit_draft)
     await _safe_edit_message(callback.message, "✏️ Редактирование мероприятия\n\nВыберите поле для изменения:", kb)
     await state.set_state(None)
     await callback.answer()
-@router.callback_query(F.data == "evt:title")
-async def cb_set_title(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(DraftCb, "title")
+async def cb_set_title(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     await _ask_and_set_state(callback, state, "Введите название мероприятия:", EventForm.waiting_for_title)
 
 
-@router.callback_query(F.data == "evt:description")
-async def cb_set_description(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(DraftCb, "description")
+async def cb_set_description(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     await _ask_and_set_state(callback, state, "Введите описание мероприятия:", EventForm.waiting_for_description)
 
 
-@router.callback_query(F.data == "evt:photo")
-async def cb_set_photo(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(DraftCb, "photo")
+async def cb_set_photo(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     await _ask_and_set_state(callback, state, "Отправьте ссылку на картинку или просто прикрепите фото сообщением:", EventForm.waiting_for_photo)
 
 
-@router.callback_query(F.data == "evt:board_games")
-async def cb_set_board_games(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(DraftCb, "board_games")
+async def cb_set_board_games(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
-    games = get_board_games()
-    await state.update_data(evt_board_games_all=games, evt_board_games_selected=[])
-    from ..keyboards import build_board_games_selection_keyboard
-    kb = build_board_games_selection_keyboard(games, [], done_callback="evt:board_games_done", toggle_prefix="evt:board_games_toggle", back_callback="evt:board_games_back")
+    await state.update_data(evt_board_games_selected=[], game_filter_evt={})
+    kb = await _game_pick_keyboard(state, "evt", refresh=True)
     await _safe_edit_message(callback.message, "Выберите настолки (можно несколько):", kb)
 
 
-@router.callback_query(F.data == "evt:datetime")
-async def cb_set_datetime(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(DraftCb, "datetime")
+async def cb_set_datetime(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     hint = (
@@ -1137,22 +1534,22 @@ async def cb_set_datetime(callback: CallbackQuery, state: FSMContext) -> None:
     await _ask_and_set_state(callback, state, hint, EventForm.waiting_for_datetime)
 
 
-@router.callback_query(F.data == "evt:responsible")
-async def cb_set_responsible(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(DraftCb, "responsible")
+async def cb_set_responsible(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     # Переход на выбор из списка админов
     admins = get_all_admins()
     await state.update_data(responsible_admins=admins, selected_responsibles=[])
-    kb = build_admins_selection_keyboard(admins, [], done_callback="evt:responsible_done", toggle_prefix="evt:responsible_toggle", back_callback="evt:responsible_back")
+    kb = build_admins_selection_keyboard(admins, [], menu_cb=DraftCb, item_cb=DraftItemCb)
     await _safe_edit_message(callback.message, "Выберите ответственных (можно несколько):", kb)
     await state.set_state(ResponsibleSelectionForm.waiting_for_responsibles)
 
 
-@router.callback_query(F.data == "evt:quantity")
-async def cb_set_quantity(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(DraftCb, "quantity")
+async def cb_set_quantity(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     await _ask_and_set_state(callback, state, "Введите количество участников (число):", EventForm.waiting_for_quantity)
@@ -1177,47 +1574,20 @@ async def _update_card(message: Message, state: FSMContext) -> None:
     draft = data.get("event_draft") or {}
     chat_id = data.get("card_chat_id")
     msg_id = data.get("card_message_id")
-    print(f"UPDATE_CARD: chat_id={chat_id}, msg_id={msg_id}, has_photo={bool(draft.get('photo'))}")
     
     if chat_id and msg_id:
-        try:
-            # Если есть фото, редактируем caption у фото-сообщения
-            if draft.get("photo"):
-                print(f"EDIT_PHOTO_CAPTION: {msg_id}")
-                await message.bot.edit_message_caption(
-                    chat_id=chat_id,
-                    message_id=msg_id,
-                    caption=format_event_text(draft),
-                    reply_markup=build_event_inline_keyboard(draft),
-                )
-                print(f"PHOTO_CAPTION_UPDATED: {msg_id}")
-            else:
-                # Нет фото, редактируем как текст
-                print(f"EDIT_TEXT_MESSAGE: {msg_id}")
-                await message.bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=msg_id,
-                    text=format_event_text_without_photo(draft),
-                    reply_markup=build_event_inline_keyboard(draft),
-                )
-                print(f"TEXT_MESSAGE_UPDATED: {msg_id}")
-        except Exception as e:
-            print(f"UPDATE_CARD_ERROR: {e}")
-            # Если не удалось отредактировать, пытаемся как текст
-            try:
-                await message.bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=msg_id,
-                    text=format_event_text_without_photo(draft),
-                    reply_markup=build_event_inline_keyboard(draft),
-                )
-            except Exception:
-                pass
+        # Если есть фото, редактируем caption у фото-сообщения; быстрые правки склеиваются,
+        # а неизменившееся содержимое не отправляется повторно
+        if draft.get("photo"):
+            text = format_event_text(draft)
+        else:
+            text = format_event_text_without_photo(draft)
+        schedule_card_update(message.bot, chat_id, msg_id, text, build_event_inline_keyboard(draft), as_caption=bool(draft.get("photo")))
 
 
 @router.message(EventForm.waiting_for_title)
-async def set_title(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def set_title(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     data = await state.get_data()
     draft = data.get("event_draft") or {}
@@ -1231,8 +1601,8 @@ async def set_title(message: Message, state: FSMContext) -> None:
 
 
 @router.message(EventForm.waiting_for_description)
-async def set_description(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def set_description(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     data = await state.get_data()
     draft = data.get("event_draft") or {}
@@ -1246,62 +1616,58 @@ async def set_description(message: Message, state: FSMContext) -> None:
 
 
 @router.message(EventForm.waiting_for_photo)
-async def set_photo(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def set_photo(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
-    photo_value: Optional[str] = None
-    if message.photo:
-        try:
-            # Берем file_id как маркер фото (текстово сохраним)
-            photo_value = message.photo[-1].file_id
-        except Exception:
-            photo_value = None
+    # Присланное фото уже имеет канонический file_id, ссылку проверяем отправкой один раз
+    photo_value: Optional[str] = photo_from_message(message)
     if not photo_value:
         photo_value = (message.text or "").strip() or None
     
     data = await state.get_data()
     draft = data.get("event_draft") or {}
     old_photo = draft.get("photo")
-    draft["photo"] = photo_value
     await _delete_prompt_and_input(message, state)
     
-    # Если фото добавляется впервые, пересоздаём карточку
-    if not old_photo and photo_value:
+    # Новая картинка (первая или замена) проверяется отправкой новой карточки и заменяется
+    # на канонический file_id; старая карточка удаляется только после успеха
+    if photo_value:
         chat_id = data.get("card_chat_id")
         msg_id = data.get("card_message_id")
+        draft["photo"] = photo_value
+        sent = await send_photo_card(message, photo_value, format_event_text(draft), build_event_inline_keyboard(draft))
+        if sent is None:
+            draft["photo"] = old_photo
+            await state.update_data(event_draft=draft, prompt_message_id=None)
+            await message.answer("Не удалось загрузить картинку. Прикрепите фото или отправьте другую ссылку")
+            await state.set_state(None)
+            return
+        draft["photo"] = cached_photo(photo_value) or photo_value
         if chat_id and msg_id:
+            forget_card(chat_id, msg_id)
             try:
-                # Удаляем старое текстовое сообщение
                 await message.bot.delete_message(chat_id=chat_id, message_id=msg_id)
-                # Отправляем новое с фото
-                sent = await message.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=photo_value,
-                    caption=format_event_text(draft),
-                    reply_markup=build_event_inline_keyboard(draft),
-                )
-                # Обновляем состояние с новым ID сообщения
-                await state.update_data(
-                    event_draft=draft,
-                    card_message_id=sent.message_id,
-                    prompt_message_id=None
-                )
-                print(f"PHOTO_CARD_CREATED: new_msg_id={sent.message_id}")
-            except Exception as e:
-                print(f"PHOTO_CREATE_ERROR: {e}")
-                # В случае ошибки всё равно обновляем draft
-                await state.update_data(event_draft=draft, prompt_message_id=None)
+            except Exception:
+                pass
+        await state.update_data(
+            event_draft=draft,
+            card_chat_id=sent.chat.id,
+            card_message_id=sent.message_id,
+            prompt_message_id=None
+        )
+        print(f"PHOTO_CARD_CREATED: new_msg_id={sent.message_id}")
     else:
-        # Фото уже есть или удаляется, редактируем существующую карточку
-        await _update_card(message, state)
+        # Фото удаляется, редактируем существующую карточку
+        draft["photo"] = photo_value
         await state.update_data(event_draft=draft, prompt_message_id=None)
+        await _update_card(message, state)
     
     await state.set_state(None)
 
 
 @router.message(EventForm.waiting_for_board_games)
-async def set_board_games(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def set_board_games(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     data = await state.get_data()
     draft = data.get("event_draft") or {}
@@ -1315,8 +1681,8 @@ async def set_board_games(message: Message, state: FSMContext) -> None:
 
 
 @router.message(EventForm.waiting_for_datetime)
-async def set_datetime(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def set_datetime(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     data = await state.get_data()
     draft = data.get("event_draft") or {}
@@ -1343,8 +1709,8 @@ async def set_datetime(message: Message, state: FSMContext) -> None:
 
 
 @router.message(EventForm.waiting_for_responsible)
-async def set_responsible(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def set_responsible(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     data = await state.get_data()
     draft = data.get("event_draft") or {}
@@ -1358,8 +1724,8 @@ async def set_responsible(message: Message, state: FSMContext) -> None:
 
 
 @router.message(EventForm.waiting_for_quantity)
-async def set_quantity(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def set_quantity(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     value = (message.text or "").strip()
     try:
@@ -1378,9 +1744,9 @@ async def set_quantity(message: Message, state: FSMContext) -> None:
     await state.update_data(**data)
 
 
-@router.callback_query(F.data == "evt:confirm")
-async def cb_confirm(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(DraftCb, "confirm")
+async def cb_confirm(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     data = await state.get_data()
@@ -1405,6 +1771,9 @@ async def cb_confirm(callback: CallbackQuery, state: FSMContext) -> None:
         chat_id = data.get("card_chat_id")
         msg_id = data.get("card_message_id")
         if chat_id and msg_id:
+            # Отложенная перерисовка не должна затереть финальные кнопки
+            await flush_card(chat_id, msg_id)
+            forget_card(chat_id, msg_id)
             await callback.message.bot.edit_message_reply_markup(
                 chat_id=chat_id,
                 message_id=msg_id,
@@ -1415,9 +1784,9 @@ async def cb_confirm(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer("Проверьте карточку и подтвердите сохранение", show_alert=True)
 
 
-@router.callback_query(F.data == "evt:final_cancel")
-async def cb_final_cancel(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(DraftCb, "final_cancel")
+async def cb_final_cancel(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     data = await state.get_data()
@@ -1427,6 +1796,7 @@ async def cb_final_cancel(callback: CallbackQuery, state: FSMContext) -> None:
         chat_id = data.get("card_chat_id")
         msg_id = data.get("card_message_id")
         if chat_id and msg_id:
+            forget_card(chat_id, msg_id)
             await callback.message.bot.edit_message_reply_markup(
                 chat_id=chat_id,
                 message_id=msg_id,
@@ -1437,9 +1807,9 @@ async def cb_final_cancel(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer("Продолжайте редактирование", show_alert=False)
 
 
-@router.callback_query(F.data == "evt:final_confirm")
-async def cb_final_confirm(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(DraftCb, "final_confirm", flags={"idempotent": True})
+async def cb_final_confirm(callback: CallbackQuery, state: FSMContext, callback_data: DraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     data = await state.get_data()
@@ -1455,13 +1825,17 @@ async def cb_final_confirm(callback: CallbackQuery, state: FSMContext) -> None:
             "responsible": draft.get("responsible"),
             "quantity": draft.get("quantity"),
         }
-        supabase.table("events").insert(payload).execute()
+        created = execute(supabase.table("events").insert(payload)).data
+        replica.apply("events", created)
+        invalidate_event_caches()
+        reminders.schedule_events(created or [])
         await callback.answer("Мероприятие добавлено", show_alert=True)
         # Убираем клавиатуру у карточки
         try:
             chat_id = data.get("card_chat_id")
             msg_id = data.get("card_message_id")
             if chat_id and msg_id:
+                forget_card(chat_id, msg_id)
                 await callback.message.bot.edit_message_reply_markup(chat_id=chat_id, message_id=msg_id, reply_markup=None)
         except Exception:
             pass
@@ -1474,20 +1848,171 @@ async def cb_final_confirm(callback: CallbackQuery, state: FSMContext) -> None:
         await callback.answer("Ошибка сохранения. Попробуйте позже", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("event:edit:"))
-async def on_edit_event(callback: CallbackQuery, state: FSMContext) -> None:
-    """Начинает редактирование мероприятия"""
-    # Проверяем, является ли пользователь админом
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(SeriesCb, "new")
+async def on_series_new(callback: CallbackQuery, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
-    
-    # Извлекаем индекс мероприятия
+    labels = [label for label, _ in RULES.values()]
+    await callback.message.edit_reply_markup(reply_markup=build_series_rule_keyboard(labels))
+    await callback.answer("Дата из карточки станет первой датой серии")
+
+
+@callbacks.register(SeriesCb, "rule")
+async def on_series_rule(callback: CallbackQuery, state: FSMContext, callback_data: SeriesCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    rules = list(RULES)
+    if callback_data.index >= len(rules):
+        await callback.answer()
+        return
+    await state.update_data(series_rule=rules[callback_data.index])
+    await _ask_and_set_state(callback, state, f"Сколько раз провести мероприятие? Введите число от 2 до {MAX_OCCURRENCES}:", SeriesForm.waiting_for_count)
+
+
+@router.message(SeriesForm.waiting_for_count, flags={"heavy": True})
+async def on_series_count(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        return
+    try:
+        count = int((message.text or "").strip())
+    except ValueError:
+        count = 0
+    if not 2 <= count <= MAX_OCCURRENCES:
+        await message.answer(f"Введите целое число от 2 до {MAX_OCCURRENCES}")
+        return
+    data = await state.get_data()
+    draft = ensure_draft_keys(data.get("event_draft") or {})
+    if draft_missing_fields(draft) or not data.get("series_rule"):
+        await message.answer("Черновик мероприятия не найден. Начните создание заново")
+        await state.clear()
+        return
+    # Черновик мог пролежать, пока выбирали повтор: первая дата серии должна быть ещё впереди
+    if not is_future_datetime_str(draft.get("datetime") or ""):
+        await message.answer("Время должно быть в будущем. Измените дату в черновике и сохраните серию заново")
+        return
+    try:
+        created = create_series(draft, data["series_rule"], count)
+    except Exception as e:
+        print(f"SERIES_SAVE_ERROR: {e}")
+        await message.answer("Ошибка сохранения. Попробуйте позже")
+        return
+    reminders.schedule_events(created)
+    await _delete_prompt_and_input(message, state)
     try:
-        event_index = int(callback.data.split(":")[2])
+        chat_id = data.get("card_chat_id")
+        msg_id = data.get("card_message_id")
+        if chat_id and msg_id:
+            forget_card(chat_id, msg_id)
+            await message.bot.edit_message_reply_markup(chat_id=chat_id, message_id=msg_id, reply_markup=None)
     except Exception:
-        await callback.answer("Некорректные данные", show_alert=True)
+        pass
+    await state.clear()
+    await message.answer(
+        f"🔁 Серия сохранена: {count} дат ({RULES[data['series_rule']][0].lower()}).\n"
+        f"Уже создано мероприятий: {len(created)}, остальные появятся по мере приближения дат."
+    )
+
+
+@callbacks.register(SeriesCb, "edit_confirm", flags={"idempotent": True, "heavy": True})
+async def on_series_edit_confirm(callback: CallbackQuery, state: FSMContext, user_ctx: UserContext) -> None:
+    """Применяет правку ко всем будущим датам серии одним обновлением"""
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
         return
+    data = await state.get_data()
+    edit_draft = data.get("edit_draft") or {}
+    original_event = data.get("original_event") or {}
+    series_id = original_event.get("series_id")
+    if not series_id:
+        await callback.answer("Мероприятие не входит в серию", show_alert=True)
+        return
+    try:
+        updated, registrations = update_series(series_id, edit_draft)
+    except Exception as e:
+        print(f"SERIES_UPDATE_ERROR: {e}")
+        await callback.answer("Ошибка сохранения. Попробуйте позже", show_alert=True)
+        return
+    await state.update_data(edit_draft=None, editing_event_index=None, original_event=None)
+    try:
+        await callback.message.edit_reply_markup(reply_markup=None)
+    except Exception:
+        pass
+    # Дата не входит в шаблон серии: у каждого вхождения она своя и правкой серии не сдвигается
+    date_note = ""
+    if edit_draft.get("datetime") and edit_draft["datetime"] != original_event.get("date"):
+        date_note = "\nНовая дата проигнорирована: её можно изменить только у отдельного мероприятия"
+    await callback.answer(f"Изменены будущие даты серии: {len(updated)}. Даты и время не меняются{date_note}", show_alert=True)
+    # Список изменений — как при правке одного мероприятия; дата у серии не меняется
+    changes = []
+    def add_change(label: str, old_val, new_val):
+        if (old_val or "") != (new_val or ""):
+            changes.append(f"- {label}: {new_val if new_val else '—'}")
+    add_change("Название", original_event.get("title"), edit_draft.get("title"))
+    add_change("Описание", original_event.get("description"), edit_draft.get("description"))
+    add_change("Картинка", bool(original_event.get("photo")), bool(edit_draft.get("photo")))
+    add_change("Настолки", original_event.get("board_games"), edit_draft.get("board_games"))
+    add_change("Ответственные", original_event.get("responsible"), edit_draft.get("responsible"))
+    add_change("Количество участников", str(original_event.get("quantity")), str(edit_draft.get("quantity")))
+    sent, failed = await send_batch(callback.bot, update_messages(updated, registrations, "\n".join(changes) or "(детали обновлены)"))
+    if failed:
+        print(f"SERIES_UPDATE_NOTIFY: отправлено {sent}, ошибок {failed}")
+
+
+@callbacks.register(SeriesCb, "cancel")
+async def on_series_cancel(callback: CallbackQuery, state: FSMContext, callback_data: SeriesCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    data = await state.get_data()
+    events = data.get("events_list", [])
+    if callback_data.index >= len(events) or not events[callback_data.index].get("series_id"):
+        await callback.answer("Мероприятие не найдено", show_alert=True)
+        return
+    event = events[callback_data.index]
+    text = (
+        f"🔁 Отменить серию «{event.get('title', 'Без названия')}»?\n\n"
+        "Будут отменены все будущие даты серии; записанные участники получат одно сообщение со списком дат."
+    )
+    await _safe_edit_message(callback.message, text, build_series_cancel_confirm_keyboard(callback_data.index))
+    await callback.answer()
+
+
+@callbacks.register(SeriesCb, "cancel_confirm", flags={"idempotent": True, "heavy": True})
+async def on_series_cancel_confirm(callback: CallbackQuery, state: FSMContext, callback_data: SeriesCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    data = await state.get_data()
+    events = data.get("events_list", [])
+    if callback_data.index >= len(events) or not events[callback_data.index].get("series_id"):
+        await callback.answer("Мероприятие не найдено", show_alert=True)
+        return
+    try:
+        cancelled, registrations = cancel_series(events[callback_data.index]["series_id"])
+    except Exception as e:
+        print(f"SERIES_CANCEL_ERROR: {e}")
+        await callback.answer("Ошибка при отмене серии", show_alert=True)
+        return
+    await callback.answer()
+    sent, failed = await send_batch(callback.bot, cancellation_messages(cancelled, registrations))
+    await _safe_edit_message(
+        callback.message,
+        f"❌ Серия отменена. Отменено дат: {len(cancelled)}\nУведомлено участников: {sent}, ошибок: {failed}",
+        InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Назад к списку", callback_data=EventMenuCb(action="back_to_list").pack())]])
+    )
+
+
+@callbacks.register(EventCb, "edit")
+async def on_edit_event(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
+    """Начинает редактирование мероприятия"""
+    # Проверяем, является ли пользователь админом
+    if not user_ctx.is_admin:
+        await callback.answer("Только для админов", show_alert=True)
+        return
+    
+    event_index = callback_data.index
     
     # Получаем список мероприятий из состояния
     data = await state.get_data()
@@ -1534,7 +2059,7 @@ async def on_edit_event(callback: CallbackQuery, state: FSMContext) -> None:
     await state.update_data(
         edit_draft=edit_draft,
         original_event={k: event.get(k) for k in [
-            "id", "title", "description", "photo", "board_games", "date", "responsible", "quantity",
+            "id", "title", "description", "photo", "board_games", "date", "responsible", "quantity", "series_id",
         ]},
         editing_event_index=event_index,
         edit_card_message_id=callback.message.message_id,
@@ -1543,16 +2068,16 @@ async def on_edit_event(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("event:participants:"))
-async def on_show_participants(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EventCb, "participants", flags={"heavy": True})
+async def on_show_participants(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
     """Показывает список участников мероприятия"""
     # Проверяем, является ли пользователь админом
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
     # Извлекаем индекс мероприятия из callback_data
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     
     # Получаем список мероприятий из состояния
     data = await state.get_data()
@@ -1599,18 +2124,17 @@ async def on_show_participants(callback: CallbackQuery, state: FSMContext) -> No
         )
 
 
-@router.callback_query(F.data.startswith("participant:show:"))
-async def on_show_participant_info(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(ParticipantCb, "show")
+async def on_show_participant_info(callback: CallbackQuery, state: FSMContext, callback_data: ParticipantCb, user_ctx: UserContext) -> None:
     """Показывает подробную информацию об участнике"""
     # Проверяем, является ли пользователь админом
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
     # Извлекаем индексы из callback_data
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
-    participant_index = int(parts[3])
+    event_index = callback_data.event_index
+    participant_index = callback_data.participant_index
     
     # Получаем список участников из состояния
     data = await state.get_data()
@@ -1657,18 +2181,17 @@ async def on_show_participant_info(callback: CallbackQuery, state: FSMContext) -
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("participant:remove:"))
-async def on_remove_participant(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(ParticipantCb, "remove", flags={"idempotent": True})
+async def on_remove_participant(callback: CallbackQuery, state: FSMContext, callback_data: ParticipantCb, user_ctx: UserContext) -> None:
     """Удаляет участника с мероприятия"""
     # Проверяем, является ли пользователь админом
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
     # Извлекаем индексы из callback_data
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
-    participant_index = int(parts[3])
+    event_index = callback_data.event_index
+    participant_index = callback_data.participant_index
     
     # Получаем данные из состояния
     data = await state.get_data()
@@ -1700,23 +2223,22 @@ async def on_remove_participant(callback: CallbackQuery, state: FSMContext) -> N
         await state.update_data(participants_list=updated_participants)
         
         # Возвращаемся к списку участников
-        await on_show_participants(callback, state)
+        await on_show_participants(callback, state, EventCb(action="participants", index=event_index), user_ctx)
     else:
         await callback.answer("Ошибка при удалении участника", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("participant:message:"))
-async def on_message_participant(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(ParticipantCb, "message")
+async def on_message_participant(callback: CallbackQuery, state: FSMContext, callback_data: ParticipantCb, user_ctx: UserContext) -> None:
     """Начинает переписку с участником"""
     # Проверяем, является ли пользователь админом
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
     # Извлекаем индексы из callback_data
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
-    participant_index = int(parts[3])
+    event_index = callback_data.event_index
+    participant_index = callback_data.participant_index
     
     # Получаем данные из состояния
     data = await state.get_data()
@@ -1754,18 +2276,17 @@ async def on_message_participant(callback: CallbackQuery, state: FSMContext) ->
         )
 
 
-@router.callback_query(F.data.startswith("participant:blacklist:"))
-async def on_blacklist_participant(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(ParticipantCb, "blacklist")
+async def on_blacklist_participant(callback: CallbackQuery, state: FSMContext, callback_data: ParticipantCb, user_ctx: UserContext) -> None:
     """Добавляет участника в чёрный список"""
     # Проверяем, является ли пользователь админом
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
     # Извлекаем индексы из callback_data
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
-    participant_index = int(parts[3])
+    event_index = callback_data.event_index
+    participant_index = callback_data.participant_index
     
     # Получаем данные из состояния
     data = await state.get_data()
@@ -1803,20 +2324,14 @@ async def on_blacklist_participant(callback: CallbackQuery, state: FSMContext) -
         )
 
 
-@router.callback_query(F.data.startswith("event:blacklist:"))
-async def on_event_blacklist(callback: CallbackQuery, state: FSMContext) -> None:
-    """Проксирует к полноценному показу чёрного списка ниже"""
-    await on_show_event_blacklist(callback, state)
-
-
-@router.callback_query(F.data.startswith("event:broadcast:"))
-async def on_event_broadcast(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EventCb, "broadcast")
+async def on_event_broadcast(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
     """Старт ввода текста рассылки"""
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     data = await state.get_data()
     events = data.get("events_list", [])
     if event_index >= len(events):
@@ -1825,22 +2340,21 @@ async def on_event_broadcast(callback: CallbackQuery, state: FSMContext) -> None
     
     await state.update_data(broadcast_event_index=event_index)
     await state.set_state(BroadcastForm.waiting_for_message)
-    kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="❌ Отменить", callback_data=f"event:broadcast_cancel:{event_index}")]])
+    kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="❌ Отменить", callback_data=EventCb(action="broadcast_cancel", index=event_index).pack())]])
     await _safe_edit_message(callback.message, "💬 Введите текст рассылки для участников этого мероприятия:", kb)
 
 
-@router.callback_query(F.data.startswith("event:broadcast_cancel:"))
-async def on_event_broadcast_cancel(callback: CallbackQuery, state: FSMContext) -> None:
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
+@callbacks.register(EventCb, "broadcast_cancel")
+async def on_event_broadcast_cancel(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
+    event_index = callback_data.index
     data = await state.get_data()
     await state.clear()
     await state.update_data(events_list=data.get("events_list", []), participants_list=data.get("participants_list", []))
     # Вернуть карточку мероприятия
-    await on_show_event_details(callback, state)
+    await on_show_event_details(callback, state, EventCb(action="show", index=event_index), user_ctx)
 
 
-@router.message(BroadcastForm.waiting_for_message)
+@router.message(BroadcastForm.waiting_for_message, flags={"heavy": True})
 async def on_event_broadcast_message(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     event_index = data.get("broadcast_event_index")
@@ -1879,30 +2393,30 @@ async def on_event_broadcast_message(message: Message, state: FSMContext) -> Non
     await state.clear()
 
 
-@router.callback_query(F.data.startswith("event:cancel:"))
-async def on_cancel_event_request(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EventCb, "cancel")
+async def on_cancel_event_request(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     data = await state.get_data()
     events = data.get("events_list", [])
     if event_index >= len(events):
         await callback.answer("Мероприятие не найдено", show_alert=True)
         return
     kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✅ Подтвердить отмену", callback_data=f"event:cancel_confirm:{event_index}")],
-        [InlineKeyboardButton(text="⬅️ Назад", callback_data=f"event:show:{event_index}")]
+        [InlineKeyboardButton(text="✅ Подтвердить отмену", callback_data=EventCb(action="cancel_confirm", index=event_index).pack())],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data=EventCb(action="show", index=event_index).pack())]
     ])
     await _safe_edit_message(callback.message, "⚠️ Вы уверены, что хотите отменить мероприятие?", kb)
 
 
-@router.callback_query(F.data.startswith("event:cancel_confirm:"))
-async def on_cancel_event_confirm(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EventCb, "cancel_confirm", flags={"idempotent": True, "heavy": True})
+async def on_cancel_event_confirm(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     data = await state.get_data()
     events = data.get("events_list", [])
     if event_index >= len(events):
@@ -1913,7 +2427,8 @@ async def on_cancel_event_confirm(callback: CallbackQuery, state: FSMContext) ->
     # Помечаем в БД как отменённое
     try:
         supabase = get_supabase()
-        supabase.table("events").update({"is_cancelled": True}).eq("id", event_id).execute()
+        replica.apply("events", execute(supabase.table("events").update({"is_cancelled": True}).eq("id", event_id)).data)
+        invalidate_event_caches(event_id)
         # Обновляем локальные данные
         event["is_cancelled"] = True
         events[event_index] = event
@@ -1936,83 +2451,79 @@ async def on_cancel_event_confirm(callback: CallbackQuery, state: FSMContext) ->
     except Exception as e:
         print(f"ERROR collecting participants to notify: {e}")
     # Вернёмся к карточке
-    await on_show_event_details(callback, state)
+    await on_show_event_details(callback, state, EventCb(action="show", index=event_index), user_ctx)
 
 
 # Обработчики для редактирования мероприятия
-@router.callback_query(F.data == "evt_edit:title")
-async def cb_edit_title(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "title")
+async def cb_edit_title(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     await _ask_and_set_edit_state(callback, state, "Введите новое название мероприятия:", EventEditForm.waiting_for_title)
 
 
-@router.callback_query(F.data == "evt_edit:description")
-async def cb_edit_description(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "description")
+async def cb_edit_description(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     await _ask_and_set_edit_state(callback, state, "Введите новое описание мероприятия:", EventEditForm.waiting_for_description)
 
 
-@router.callback_query(F.data == "evt_edit:photo")
-async def cb_edit_photo(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "photo")
+async def cb_edit_photo(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     await _ask_and_set_edit_state(callback, state, "Отправьте новую ссылку на картинку или просто прикрепите фото сообщением:", EventEditForm.waiting_for_photo)
 
 
-@router.callback_query(F.data == "evt_edit:board_games")
-async def cb_edit_board_games(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "board_games")
+async def cb_edit_board_games(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
-    games = get_board_games()
     data = await state.get_data()
-    current = (data.get("edit_draft") or {}).get("board_games") or ""
-    selected = [s.strip() for s in current.split(",") if s.strip()]
-    await state.update_data(evt_edit_board_games_all=games, evt_edit_board_games_selected=selected)
-    from ..keyboards import build_board_games_selection_keyboard
-    kb = build_board_games_selection_keyboard(games, selected, done_callback="evt_edit:board_games_done", toggle_prefix="evt_edit:board_games_toggle", back_callback="evt_edit:board_games_back")
+    selected = split_event_list((data.get("edit_draft") or {}).get("board_games"))
+    await state.update_data(evt_edit_board_games_selected=selected, game_filter_evt_edit={})
+    kb = await _game_pick_keyboard(state, "evt_edit", refresh=True)
     await _safe_edit_message(callback.message, "Выберите настолки (можно несколько):", kb)
 
 
-@router.callback_query(F.data == "evt_edit:datetime")
-async def cb_edit_datetime(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "datetime")
+async def cb_edit_datetime(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     await _ask_and_set_edit_state(callback, state, "Введите новую дату и время (любой текстовый формат):", EventEditForm.waiting_for_datetime)
 
 
-@router.callback_query(F.data == "evt_edit:responsible")
-async def cb_edit_responsible(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "responsible")
+async def cb_edit_responsible(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     admins = get_all_admins()
     data = await state.get_data()
-    current = (data.get("edit_draft") or {}).get("responsible") or ""
-    selected = [s.strip() for s in current.split(",") if s.strip()]
+    selected = split_event_list((data.get("edit_draft") or {}).get("responsible"))
     await state.update_data(edit_responsible_admins=admins, edit_selected_responsibles=selected)
-    kb = build_admins_selection_keyboard(admins, selected, done_callback="evt_edit:responsible_done", toggle_prefix="evt_edit:responsible_toggle", back_callback="evt_edit:responsible_back")
+    kb = build_admins_selection_keyboard(admins, selected, menu_cb=EditDraftCb, item_cb=EditDraftItemCb)
     await _safe_edit_message(callback.message, "Выберите ответственных (можно несколько):", kb)
     await state.set_state(ResponsibleSelectionForm.waiting_for_responsibles)
 
 
-@router.callback_query(F.data == "evt_edit:quantity")
-async def cb_edit_quantity(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "quantity")
+async def cb_edit_quantity(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     await _ask_and_set_edit_state(callback, state, "Введите новое количество участников (число):", EventEditForm.waiting_for_quantity)
 
 
-@router.callback_query(F.data == "evt_edit:confirm")
-async def cb_edit_confirm(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "confirm")
+async def cb_edit_confirm(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
@@ -2020,32 +2531,22 @@ async def cb_edit_confirm(callback: CallbackQuery, state: FSMContext) -> None:
     edit_draft = data.get("edit_draft", {})
     
     # Показываем финальную карточку для подтверждения
-    keyboard = build_edit_final_confirm_keyboard()
+    keyboard = build_edit_final_confirm_keyboard(in_series=bool((data.get("original_event") or {}).get("series_id")))
     
     # Форматируем текст карточки
     card_text = format_event_text(edit_draft)
     
     # Редактируем сообщение с финальной карточкой
-    if callback.message.photo:
-        await callback.message.edit_media(
-            media=InputMediaPhoto(
-                media=edit_draft.get("photo", ""),
-                caption=card_text
-            ),
-            reply_markup=keyboard
-        )
-    else:
-        await callback.message.edit_text(
-            card_text,
-            reply_markup=keyboard
-        )
+    await flush_card(callback.message.chat.id, callback.message.message_id)
+    forget_card(callback.message.chat.id, callback.message.message_id)
+    await show_card(callback.message, edit_draft.get("photo"), card_text, keyboard)
     
     await callback.answer("Проверьте карточку и подтвердите изменения", show_alert=True)
 
 
-@router.callback_query(F.data == "evt_edit:cancel")
-async def cb_edit_cancel(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "cancel")
+async def cb_edit_cancel(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
@@ -2081,42 +2582,20 @@ async def cb_edit_cancel(callback: CallbackQuery, state: FSMContext) -> None:
         # Создаем клавиатуру для деталей мероприятия
         keyboard = []
         if not event.get("is_completed", False):
-            keyboard.append([InlineKeyboardButton(text="🏁 Завершить мероприятие", callback_data=f"event:complete:{event_index}")])
-            keyboard.append([InlineKeyboardButton(text="✏️ Изменить мероприятие", callback_data=f"event:edit:{event_index}")])
-            keyboard.append([InlineKeyboardButton(text="👥 Посмотреть участников", callback_data=f"event:participants:{event_index}")])
-            keyboard.append([InlineKeyboardButton(text="🚫 Чёрный список", callback_data=f"event:blacklist:{event_index}")])
-            keyboard.append([InlineKeyboardButton(text="📢 Отправить рассылку", callback_data=f"event:broadcast:{event_index}")])
-            keyboard.append([InlineKeyboardButton(text="❌ Отменить мероприятие", callback_data=f"event:cancel:{event_index}")])
+            keyboard.append([InlineKeyboardButton(text="🏁 Завершить мероприятие", callback_data=EventCb(action="complete", index=event_index).pack())])
+            keyboard.append([InlineKeyboardButton(text="✏️ Изменить мероприятие", callback_data=EventCb(action="edit", index=event_index).pack())])
+            keyboard.append([InlineKeyboardButton(text="👥 Посмотреть участников", callback_data=EventCb(action="participants", index=event_index).pack())])
+            keyboard.append([InlineKeyboardButton(text="🚫 Чёрный список", callback_data=EventCb(action="blacklist", index=event_index).pack())])
+            keyboard.append([InlineKeyboardButton(text="📢 Отправить рассылку", callback_data=EventCb(action="broadcast", index=event_index).pack())])
+            keyboard.append([InlineKeyboardButton(text="❌ Отменить мероприятие", callback_data=EventCb(action="cancel", index=event_index).pack())])
         
-        keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="event:back_to_list")])
+        keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data=EventMenuCb(action="back_to_list").pack())])
         
         inline_keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None
         
         # Редактируем сообщение
-        if event.get("photo"):
-            photo_value = event['photo']
-            is_valid_file_id = (
-                isinstance(photo_value, str) and 
-                len(photo_value) > 20 and 
-                not any(char in photo_value for char in [' ', '\n', '\t', 'ывп'])
-            )
-            
-            if is_valid_file_id:
-                try:
-                    await callback.message.edit_media(
-                        media=InputMediaPhoto(
-                            media=photo_value,
-                            caption=details
-                        ),
-                        reply_markup=inline_keyboard
-                    )
-                except Exception as e:
-                    print(f"PHOTO_EDIT_ERROR: {e}")
-                    await callback.message.edit_text(details, reply_markup=inline_keyboard)
-            else:
-                await callback.message.edit_text(details, reply_markup=inline_keyboard)
-        else:
-            await callback.message.edit_text(details, reply_markup=inline_keyboard)
+        forget_card(callback.message.chat.id, callback.message.message_id)
+        await show_card(callback.message, event.get("photo"), details, inline_keyboard)
     
     # Очищаем данные редактирования
     await state.update_data(edit_draft=None, editing_event_index=None, original_event=None)
@@ -2133,8 +2612,8 @@ async def _ask_and_set_edit_state(callback: CallbackQuery, state: FSMContext, te
 
 # Обработчики ввода для редактирования мероприятия
 @router.message(EventEditForm.waiting_for_title)
-async def edit_title(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def edit_title(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     data = await state.get_data()
     edit_draft = data.get("edit_draft", {})
@@ -2148,8 +2627,8 @@ async def edit_title(message: Message, state: FSMContext) -> None:
 
 
 @router.message(EventEditForm.waiting_for_description)
-async def edit_description(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def edit_description(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     data = await state.get_data()
     edit_draft = data.get("edit_draft", {})
@@ -2163,56 +2642,60 @@ async def edit_description(message: Message, state: FSMContext) -> None:
 
 
 @router.message(EventEditForm.waiting_for_photo)
-async def edit_photo(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def edit_photo(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
-    photo_value: Optional[str] = None
-    if message.photo:
-        try:
-            photo_value = message.photo[-1].file_id
-        except Exception:
-            photo_value = None
+    photo_value: Optional[str] = photo_from_message(message)
     if not photo_value:
         photo_value = (message.text or "").strip() or None
     
     data = await state.get_data()
     edit_draft = data.get("edit_draft", {})
     old_photo = edit_draft.get("photo")
-    edit_draft["photo"] = photo_value
     await _delete_edit_prompt_and_input(message, state)
     
-    # Если фото добавляется впервые, пересоздаём карточку
-    if not old_photo and photo_value:
-        try:
-            # Удаляем старое текстовое сообщение
-            await message.bot.delete_message(chat_id=message.chat.id, message_id=message.message_id - 1)
-            # Отправляем новое с фото
-            sent = await message.bot.send_photo(
-                chat_id=message.chat.id,
-                photo=photo_value,
-                caption="✏️ Редактирование мероприятия\n\nВыберите поле для изменения:",
-                reply_markup=build_event_edit_keyboard(edit_draft)
-            )
-            # Обновляем состояние с новым ID сообщения
-            await state.update_data(
-                edit_draft=edit_draft,
-                edit_card_message_id=sent.message_id,
-                edit_prompt_message_id=None
-            )
-        except Exception as e:
-            print(f"EDIT_PHOTO_CREATE_ERROR: {e}")
+    # Новая картинка (первая или замена) проверяется отправкой новой карточки и заменяется
+    # на канонический file_id; старая карточка удаляется только после успеха
+    if photo_value:
+        edit_draft["photo"] = photo_value
+        sent = await send_photo_card(
+            message,
+            photo_value,
+            "✏️ Редактирование мероприятия\n\nВыберите поле для изменения:",
+            build_event_edit_keyboard(edit_draft),
+        )
+        if sent is None:
+            edit_draft["photo"] = old_photo
             await state.update_data(edit_draft=edit_draft, edit_prompt_message_id=None)
+            await message.answer("Не удалось загрузить картинку. Прикрепите фото или отправьте другую ссылку")
+            await state.set_state(None)
+            return
+        edit_draft["photo"] = cached_photo(photo_value) or photo_value
+        card_msg_id = data.get("edit_card_message_id")
+        if card_msg_id:
+            forget_card(message.chat.id, card_msg_id)
+            try:
+                await message.bot.delete_message(chat_id=message.chat.id, message_id=card_msg_id)
+            except Exception:
+                pass
+        # Обновляем состояние с новым ID сообщения
+        await state.update_data(
+            edit_draft=edit_draft,
+            edit_card_message_id=sent.message_id,
+            edit_prompt_message_id=None
+        )
     else:
-        # Фото уже есть или удаляется, редактируем существующую карточку
-        await _update_edit_card(message, state)
+        # Фото удаляется, редактируем существующую карточку
+        edit_draft["photo"] = photo_value
         await state.update_data(edit_draft=edit_draft, edit_prompt_message_id=None)
+        await _update_edit_card(message, state)
     
     await state.set_state(None)
 
 
 @router.message(EventEditForm.waiting_for_board_games)
-async def edit_board_games(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def edit_board_games(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     data = await state.get_data()
     edit_draft = data.get("edit_draft", {})
@@ -2226,8 +2709,8 @@ async def edit_board_games(message: Message, state: FSMContext) -> None:
 
 
 @router.message(EventEditForm.waiting_for_datetime)
-async def edit_datetime(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def edit_datetime(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     data = await state.get_data()
     edit_draft = data.get("edit_draft", {})
@@ -2255,8 +2738,8 @@ async def edit_datetime(message: Message, state: FSMContext) -> None:
 
 
 @router.message(EventEditForm.waiting_for_responsible)
-async def edit_responsible(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def edit_responsible(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     data = await state.get_data()
     edit_draft = data.get("edit_draft", {})
@@ -2270,8 +2753,8 @@ async def edit_responsible(message: Message, state: FSMContext) -> None:
 
 
 @router.message(EventEditForm.waiting_for_quantity)
-async def edit_quantity(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+async def edit_quantity(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         return
     value = (message.text or "").strip()
     try:
@@ -2312,41 +2795,20 @@ async def _update_edit_card(message: Message, state: FSMContext) -> None:
     card_msg_id = data.get("edit_card_message_id")
     
     if card_msg_id:
-        try:
-            # Если есть фото, редактируем caption у фото-сообщения
-            if edit_draft.get("photo"):
-                await message.bot.edit_message_caption(
-                    chat_id=message.chat.id,
-                    message_id=card_msg_id,
-                    caption="✏️ Редактирование мероприятия\n\nВыберите поле для изменения:",
-                    reply_markup=build_event_edit_keyboard(edit_draft),
-                )
-            else:
-                # Нет фото, редактируем как текст
-                await message.bot.edit_message_text(
-                    chat_id=message.chat.id,
-                    message_id=card_msg_id,
-                    text="✏️ Редактирование мероприятия\n\nВыберите поле для изменения:",
-                    reply_markup=build_event_edit_keyboard(edit_draft),
-                )
-        except Exception as e:
-            print(f"UPDATE_EDIT_CARD_ERROR: {e}")
-            # Если не удалось отредактировать, пытаемся как текст
-            try:
-                await message.bot.edit_message_text(
-                    chat_id=message.chat.id,
-                    message_id=card_msg_id,
-                    text="✏️ Редактирование мероприятия\n\nВыберите поле для изменения:",
-                    reply_markup=build_event_edit_keyboard(edit_draft),
-                )
-            except Exception:
-                pass
+        schedule_card_update(
+            message.bot,
+            message.chat.id,
+            card_msg_id,
+            "✏️ Редактирование мероприятия\n\nВыберите поле для изменения:",
+            build_event_edit_keyboard(edit_draft),
+            as_caption=bool(edit_draft.get("photo")),
+        )
 
 
 # Обработчики финального подтверждения редактирования
-@router.callback_query(F.data == "evt_edit:final_confirm")
-async def cb_edit_final_confirm(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "final_confirm", flags={"idempotent": True})
+async def cb_edit_final_confirm(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
@@ -2367,8 +2829,12 @@ async def cb_edit_final_confirm(callback: CallbackQuery, state: FSMContext) -> N
             "quantity": edit_draft.get("quantity"),
         }
         
-        # Используем title для идентификации мероприятия
-        supabase.table("events").update(payload).eq("title", original_event.get("title")).execute()
+        # По id: у вхождений одной серии одинаковое название, а дата у каждого своя
+        updated = execute(supabase.table("events").update(payload).eq("id", original_event.get("id"))).data
+        replica.apply("events", updated)
+        invalidate_event_caches()
+        # При переносе даты напоминания встают на новое время; старые отсеются при срабатывании
+        reminders.schedule_events(updated or [])
         
         await callback.answer("Мероприятие обновлено! ✅", show_alert=True)
         
@@ -2404,42 +2870,20 @@ async def cb_edit_final_confirm(callback: CallbackQuery, state: FSMContext) -> N
             # Создаем клавиатуру для деталей мероприятия
             keyboard = []
             if not events[event_index].get("is_completed", False):
-                keyboard.append([InlineKeyboardButton(text="🏁 Завершить мероприятие", callback_data=f"event:complete:{event_index}")])
-                keyboard.append([InlineKeyboardButton(text="✏️ Изменить мероприятие", callback_data=f"event:edit:{event_index}")])
-                keyboard.append([InlineKeyboardButton(text="👥 Посмотреть участников", callback_data=f"event:participants:{event_index}")])
-                keyboard.append([InlineKeyboardButton(text="🚫 Чёрный список", callback_data=f"event:blacklist:{event_index}")])
-                keyboard.append([InlineKeyboardButton(text="📢 Отправить рассылку", callback_data=f"event:broadcast:{event_index}")])
-                keyboard.append([InlineKeyboardButton(text="❌ Отменить мероприятие", callback_data=f"event:cancel:{event_index}")])
+                keyboard.append([InlineKeyboardButton(text="🏁 Завершить мероприятие", callback_data=EventCb(action="complete", index=event_index).pack())])
+                keyboard.append([InlineKeyboardButton(text="✏️ Изменить мероприятие", callback_data=EventCb(action="edit", index=event_index).pack())])
+                keyboard.append([InlineKeyboardButton(text="👥 Посмотреть участников", callback_data=EventCb(action="participants", index=event_index).pack())])
+                keyboard.append([InlineKeyboardButton(text="🚫 Чёрный список", callback_data=EventCb(action="blacklist", index=event_index).pack())])
+                keyboard.append([InlineKeyboardButton(text="📢 Отправить рассылку", callback_data=EventCb(action="broadcast", index=event_index).pack())])
+                keyboard.append([InlineKeyboardButton(text="❌ Отменить мероприятие", callback_data=EventCb(action="cancel", index=event_index).pack())])
             
-            keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="event:back_to_list")])
+            keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data=EventMenuCb(action="back_to_list").pack())])
             
             inline_keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None
             
             # Обновляем сообщение
-            if payload.get("photo"):
-                photo_value = payload['photo']
-                is_valid_file_id = (
-                    isinstance(photo_value, str) and 
-                    len(photo_value) > 20 and 
-                    not any(char in photo_value for char in [' ', '\n', '\t', 'ывп'])
-                )
-                
-                if is_valid_file_id:
-                    try:
-                        await callback.message.edit_media(
-                            media=InputMediaPhoto(
-                                media=photo_value,
-                                caption=details
-                            ),
-                            reply_markup=inline_keyboard
-                        )
-                    except Exception as e:
-                        print(f"PHOTO_EDIT_ERROR: {e}")
-                        await callback.message.edit_text(details, reply_markup=inline_keyboard)
-                else:
-                    await callback.message.edit_text(details, reply_markup=inline_keyboard)
-            else:
-                await callback.message.edit_text(details, reply_markup=inline_keyboard)
+            forget_card(callback.message.chat.id, callback.message.message_id)
+            await show_card(callback.message, payload.get("photo"), details, inline_keyboard)
         
         # Уведомляем участников об изменениях
         try:
@@ -2483,9 +2927,9 @@ async def cb_edit_final_confirm(callback: CallbackQuery, state: FSMContext) -> N
         await callback.answer("Ошибка обновления. Попробуйте позже", show_alert=True)
 
 
-@router.callback_query(F.data == "evt_edit:final_cancel")
-async def cb_edit_final_cancel(callback: CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+@callbacks.register(EditDraftCb, "final_cancel")
+async def cb_edit_final_cancel(callback: CallbackQuery, state: FSMContext, callback_data: EditDraftCb, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
@@ -2494,6 +2938,7 @@ async def cb_edit_final_cancel(callback: CallbackQuery, state: FSMContext) -> No
     
     # Возвращаемся к клавиатуре редактирования
     keyboard = build_event_edit_keyboard(edit_draft)
+    forget_card(callback.message.chat.id, callback.message.message_id)
     
     # Редактируем сообщение
     if callback.message.photo:
@@ -2510,29 +2955,20 @@ async def cb_edit_final_cancel(callback: CallbackQuery, state: FSMContext) -> No
     await callback.answer("Продолжайте редактирование", show_alert=False)
 
 
-@router.message(lambda m: m.text == "Зарегистрироваться на мероприятие")
-async def on_register_for_event(message: Message, state: FSMContext) -> None:
+@router.message(lambda m: m.text == "Зарегистрироваться на мероприятие", flags={"heavy": True})
+async def on_register_for_event(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
     user = message.from_user
     if user is None:
         return
     
     # Проверяем, не является ли пользователь админом
-    if user_is_admin(user.username):
+    if user_ctx.is_admin:
         await message.answer("Админы не могут регистрироваться на мероприятия")
         return
     
-    supabase = get_supabase()
     try:
         # Получаем только незавершённые и неотменённые мероприятия
-        response = (
-            supabase
-            .table("events")
-            .select("*")
-            .eq("is_completed", False)
-            .eq("is_cancelled", False)
-            .execute()
-        )
-        events = response.data
+        events = await get_upcoming_events_async()
         
         if not events:
             await message.answer("Пока нет доступных мероприятий для регистрации")
@@ -2557,25 +2993,24 @@ async def on_register_for_event(message: Message, state: FSMContext) -> None:
         await message.answer("Ошибка при загрузке мероприятий")
 
 
-@router.message(lambda m: m.text == "Настольные игры")
-async def on_admin_games_menu(message: Message, state: FSMContext) -> None:
-    if not user_is_admin(message.from_user.username if message.from_user else None):
+@router.message(lambda m: m.text == "Настольные игры", flags={"heavy": True})
+async def on_admin_games_menu(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    if not user_ctx.is_admin:
         await message.answer("Доступно только админам")
         return
-    games = get_board_games()
-    await state.update_data(board_games_list=games)
-    kb = build_games_list_keyboard(games)
+    await state.update_data(game_filter_list={})
+    kb = await _game_pick_keyboard(state, "list", refresh=True)
     await message.answer("🎲 Настольные игры:", reply_markup=kb)
 
 
-@router.message(lambda m: m.text == "Мои мероприятия")
-async def on_my_events(message: Message, state: FSMContext) -> None:
+@router.message(lambda m: m.text == "Мои мероприятия", flags={"heavy": True})
+async def on_my_events(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
     user = message.from_user
     if user is None:
         return
     
     # Проверяем, не является ли пользователь админом
-    if user_is_admin(user.username):
+    if user_ctx.is_admin:
         await message.answer("Эта функция недоступна для админов")
         return
     
@@ -2606,21 +3041,22 @@ async def on_my_events(message: Message, state: FSMContext) -> None:
     # Создаем клавиатуру со списком мероприятий
     keyboard = build_events_list_keyboard(events)
     
-    await message.answer(
-        f"Мои мероприятия ({len(events)}):\n\nВыберите мероприятие для просмотра деталей:",
-        reply_markup=keyboard
-    )
+    text = f"Мои мероприятия ({len(events)}):\n\nВыберите мероприятие для просмотра деталей:"
+    feed_url = user_feed_url(user_ctx.username)
+    if feed_url:
+        text += f"\n\n📅 Подписка на календарь: {feed_url}"
+    await message.answer(text, reply_markup=keyboard)
 
 
-@router.callback_query(F.data.startswith("event:register:"))
-async def on_register_for_event_callback(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EventCb, "register", flags={"idempotent": True, "heavy": True})
+async def on_register_for_event_callback(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
     # Проверяем, не является ли пользователь админом
-    if user_is_admin(callback.from_user.username if callback.from_user else None):
+    if user_ctx.is_admin:
         await callback.answer("Админы не могут регистрироваться на мероприятия", show_alert=True)
         return
     
     # Извлекаем индекс мероприятия из callback_data
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     
     # Получаем список мероприятий из состояния
     data = await state.get_data()
@@ -2639,46 +3075,39 @@ async def on_register_for_event_callback(callback: CallbackQuery, state: FSMCont
     
     # Проверяем, не зарегистрирован ли уже пользователь
     if is_user_registered_for_event(
-        callback.from_user.username if callback.from_user else None,
+        user_ctx.username,
         event.get("id")
     ):
         await callback.answer("Вы уже зарегистрированы на это мероприятие", show_alert=True)
         return
     
     # Проверяем, не заполнено ли мероприятие
-    if is_event_full(event.get("id")):
+    if await is_event_full_async(event.get("id")):
         await callback.answer("К сожалению, все места на это мероприятие уже заняты", show_alert=True)
         return
     
     # Проверяем, не находится ли пользователь в черном списке
-    if is_user_in_event_blacklist(event.get("id"), callback.from_user.username if callback.from_user else None):
+    if is_user_in_event_blacklist(event.get("id"), user_ctx.username):
         await callback.answer("Вы находитесь в черном списке этого мероприятия", show_alert=True)
         return
     # Глобальный ЧС
-    try:
-        from ..utils import get_global_blacklist
-        gbl = get_global_blacklist()
-        tg = (callback.from_user.username or "")
-        tg = tg if tg.startswith("@") else (f"@{tg}" if tg else tg)
-        if any(item.get("user_tg_username") == tg for item in gbl):
-            await callback.answer("Вы заблокированы для участия в мероприятиях", show_alert=True)
-            return
-    except Exception:
-        pass
+    if user_ctx.is_globally_blacklisted:
+        await callback.answer("Вы заблокированы для участия в мероприятиях", show_alert=True)
+        return
     
     # Регистрируем пользователя
     if register_user_for_event(
-        callback.from_user.username if callback.from_user else None,
+        user_ctx.username,
         event.get("id")
     ):
         # Сохраняем chat_id пользователя в базе данных
         ensure_user_exists(
-            callback.from_user.username if callback.from_user else None,
+            user_ctx.username,
             callback.from_user.id if callback.from_user else None
         )
         
         # Получаем обновленную информацию о доступных местах
-        available_slots = get_event_available_slots_count(event.get("id"))
+        available_slots = await get_event_available_slots_count_async(event.get("id"))
         if available_slots == 0:
             message = "Вы успешно зарегистрированы на мероприятие! ✅\n\n🎫 Это было последнее свободное место!"
         elif available_slots == -1:
@@ -2709,8 +3138,8 @@ async def on_register_for_event_callback(callback: CallbackQuery, state: FSMCont
         
         # Обновляем кнопку на "Отменить регистрацию"
         keyboard = []
-        keyboard.append([InlineKeyboardButton(text="❌ Отменить регистрацию", callback_data=f"event:unregister:{event_index}")])
-        keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="event:back_to_list")])
+        keyboard.append([InlineKeyboardButton(text="❌ Отменить регистрацию", callback_data=EventCb(action="unregister", index=event_index).pack())])
+        keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data=EventMenuCb(action="back_to_list").pack())])
         
         inline_keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard)
         
@@ -2726,15 +3155,15 @@ async def on_register_for_event_callback(callback: CallbackQuery, state: FSMCont
         await callback.answer("Ошибка при регистрации. Попробуйте позже", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("event:unregister:"))
-async def on_unregister_from_event_callback(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EventCb, "unregister", flags={"idempotent": True, "heavy": True})
+async def on_unregister_from_event_callback(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
     # Проверяем, не является ли пользователь админом
-    if user_is_admin(callback.from_user.username if callback.from_user else None):
+    if user_ctx.is_admin:
         await callback.answer("Админы не могут отменять регистрации", show_alert=True)
         return
     
     # Извлекаем индекс мероприятия из callback_data
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     
     # Получаем список мероприятий из состояния
     data = await state.get_data()
@@ -2748,7 +3177,7 @@ async def on_unregister_from_event_callback(callback: CallbackQuery, state: FSMC
     
     # Проверяем, зарегистрирован ли пользователь
     if not is_user_registered_for_event(
-        callback.from_user.username if callback.from_user else None,
+        user_ctx.username,
         event.get("id")
     ):
         await callback.answer("Вы не зарегистрированы на это мероприятие", show_alert=True)
@@ -2756,17 +3185,17 @@ async def on_unregister_from_event_callback(callback: CallbackQuery, state: FSMC
     
     # Отменяем регистрацию
     if unregister_user_from_event(
-        callback.from_user.username if callback.from_user else None,
+        user_ctx.username,
         event.get("id")
     ):
         # Получаем обновленную информацию о доступных местах
-        available_slots = get_event_available_slots_count(event.get("id"))
+        available_slots = await get_event_available_slots_count_async(event.get("id"))
         
         # Проверяем, есть ли люди в очереди ожидания
         supabase = get_supabase()
         try:
             # Получаем первого пользователя из очереди
-            waitlist_resp = (
+            waitlist_resp = execute(
                 supabase
                 .table("event_registrations")
                 .select("user_tg_username, id")
@@ -2774,19 +3203,20 @@ async def on_unregister_from_event_callback(callback: CallbackQuery, state: FSMC
                 .eq("status", "waitlist")
                 .order("registration_date", desc=False)
                 .limit(1)
-                .execute()
             )
             
             if waitlist_resp.data and len(waitlist_resp.data) > 0:
                 # Автоматически регистрируем первого из очереди
                 first_in_waitlist = waitlist_resp.data[0]
-                supabase.table("event_registrations").update({
+                replica.apply("event_registrations", execute(supabase.table("event_registrations").update({
                     "status": "registered",
-                    "registration_date": "NOW()"
-                }).eq("id", first_in_waitlist["id"]).execute()
+                    "registration_date": "NOW()",
+                    "promoted_from_waitlist": True
+                }).eq("id", first_in_waitlist["id"])).data)
+                invalidate_event_caches(event.get("id"))
                 
                 # Обновляем количество доступных мест
-                available_slots = get_event_available_slots_count(event.get("id"))
+                available_slots = await get_event_available_slots_count_async(event.get("id"))
                 
                 message = f"Регистрация отменена\n\n🎫 Свободных мест: {available_slots}\n\n✅ Первый из очереди автоматически зарегистрирован!"
                 
@@ -2836,15 +3266,15 @@ async def on_unregister_from_event_callback(callback: CallbackQuery, state: FSMC
         await callback.answer("Ошибка при отмене регистрации. Попробуйте позже", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("event:join_waitlist:"))
-async def on_join_waitlist_callback(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EventCb, "join_waitlist", flags={"idempotent": True, "heavy": True})
+async def on_join_waitlist_callback(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
     # Проверяем, не является ли пользователь админом
-    if user_is_admin(callback.from_user.username if callback.from_user else None):
+    if user_ctx.is_admin:
         await callback.answer("Админы не могут занимать места в очереди", show_alert=True)
         return
     
     # Извлекаем индекс мероприятия из callback_data
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     
     # Получаем список мероприятий из состояния
     data = await state.get_data()
@@ -2868,7 +3298,7 @@ async def on_join_waitlist_callback(callback: CallbackQuery, state: FSMContext)
     
     # Проверяем, не зарегистрирован ли уже пользователь
     if is_user_registered_for_event(
-        callback.from_user.username if callback.from_user else None,
+        user_ctx.username,
         event.get("id")
     ):
         await callback.answer("Вы уже зарегистрированы на это мероприятие", show_alert=True)
@@ -2876,47 +3306,40 @@ async def on_join_waitlist_callback(callback: CallbackQuery, state: FSMContext)
     
     # Проверяем, не в очереди ли уже пользователь
     if is_user_on_waitlist(
-        callback.from_user.username if callback.from_user else None,
+        user_ctx.username,
         event.get("id")
     ):
         await callback.answer("Вы уже в очереди ожидания", show_alert=True)
         return
     
     # Проверяем, не находится ли пользователь в черном списке
-    if is_user_in_event_blacklist(event.get("id"), callback.from_user.username if callback.from_user else None):
+    if is_user_in_event_blacklist(event.get("id"), user_ctx.username):
         await callback.answer("Вы находитесь в черном списке этого мероприятия", show_alert=True)
         return
     # Глобальный ЧС
-    try:
-        from ..utils import get_global_blacklist
-        gbl = get_global_blacklist()
-        tg = (callback.from_user.username or "")
-        tg = tg if tg.startswith("@") else (f"@{tg}" if tg else tg)
-        if any(item.get("user_tg_username") == tg for item in gbl):
-            await callback.answer("Вы заблокированы для участия в мероприятиях", show_alert=True)
-            return
-    except Exception:
-        pass
+    if user_ctx.is_globally_blacklisted:
+        await callback.answer("Вы заблокированы для участия в мероприятиях", show_alert=True)
+        return
     
     # Проверяем, что мероприятие действительно заполнено
-    if not is_event_full(event.get("id")):
+    if not await is_event_full_async(event.get("id")):
         await callback.answer("Мероприятие не заполнено, используйте обычную регистрацию", show_alert=True)
         return
     
     # Добавляем в очередь ожидания
     if add_user_to_waitlist(
-        callback.from_user.username if callback.from_user else None,
+        user_ctx.username,
         event.get("id")
     ):
         # Сохраняем chat_id пользователя в базе данных
         ensure_user_exists(
-            callback.from_user.username if callback.from_user else None,
+            user_ctx.username,
             callback.from_user.id if callback.from_user else None
         )
         
         # Получаем позицию в очереди
         position = get_waitlist_position(
-            callback.from_user.username if callback.from_user else None,
+            user_ctx.username,
             event.get("id")
         )
         
@@ -2938,8 +3361,8 @@ async def on_join_waitlist_callback(callback: CallbackQuery, state: FSMContext)
         
         # Обновляем кнопку на "В очереди"
         keyboard = []
-        keyboard.append([InlineKeyboardButton(text=f"⏳ В очереди (№{position})", callback_data=f"event:leave_waitlist:{event_index}")])
-        keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="event:back_to_list")])
+        keyboard.append([InlineKeyboardButton(text=f"⏳ В очереди (№{position})", callback_data=EventCb(action="leave_waitlist", index=event_index).pack())])
+        keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data=EventMenuCb(action="back_to_list").pack())])
         
         inline_keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard)
         
@@ -2955,15 +3378,15 @@ async def on_join_waitlist_callback(callback: CallbackQuery, state: FSMContext)
         await callback.answer("Ошибка при добавлении в очередь. Попробуйте позже", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("event:leave_waitlist:"))
-async def on_leave_waitlist_callback(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EventCb, "leave_waitlist", flags={"idempotent": True, "heavy": True})
+async def on_leave_waitlist_callback(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
     # Проверяем, не является ли пользователь админом
-    if user_is_admin(callback.from_user.username if callback.from_user else None):
+    if user_ctx.is_admin:
         await callback.answer("Админы не могут покидать очередь", show_alert=True)
         return
     
     # Извлекаем индекс мероприятия из callback_data
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     
     # Получаем список мероприятий из состояния
     data = await state.get_data()
@@ -2977,7 +3400,7 @@ async def on_leave_waitlist_callback(callback: CallbackQuery, state: FSMContext)
     
     # Проверяем, в очереди ли пользователь
     if not is_user_on_waitlist(
-        callback.from_user.username if callback.from_user else None,
+        user_ctx.username,
         event.get("id")
     ):
         await callback.answer("Вы не в очереди ожидания", show_alert=True)
@@ -2985,7 +3408,7 @@ async def on_leave_waitlist_callback(callback: CallbackQuery, state: FSMContext)
     
     # Удаляем из очереди
     if remove_user_from_waitlist(
-        callback.from_user.username if callback.from_user else None,
+        user_ctx.username,
         event.get("id")
     ):
         await callback.answer("Вы покинули очередь ожидания", show_alert=True)
@@ -2993,22 +3416,22 @@ async def on_leave_waitlist_callback(callback: CallbackQuery, state: FSMContext)
         # Обновляем кнопку на "Занять место" (если мероприятие всё ещё заполнено)
         keyboard = []
         # Проверяем, не заполнено ли мероприятие
-        if is_event_full(event.get("id")):
+        if await is_event_full_async(event.get("id")):
             # Проверяем, не в очереди ли пользователь
             if is_user_on_waitlist(
-                callback.from_user.username if callback.from_user else None,
+                user_ctx.username,
                 event.get("id")
             ):
                 position = get_waitlist_position(
-                    callback.from_user.username if callback.from_user else None,
+                    user_ctx.username,
                     event.get("id")
                 )
-                keyboard.append([InlineKeyboardButton(text=f"⏳ В очереди (№{position})", callback_data=f"event:leave_waitlist:{event_index}")])
+                keyboard.append([InlineKeyboardButton(text=f"⏳ В очереди (№{position})", callback_data=EventCb(action="leave_waitlist", index=event_index).pack())])
             else:
-                keyboard.append([InlineKeyboardButton(text="📋 Занять место", callback_data=f"event:join_waitlist:{event_index}")])
+                keyboard.append([InlineKeyboardButton(text="📋 Занять место", callback_data=EventCb(action="join_waitlist", index=event_index).pack())])
         else:
-            keyboard.append([InlineKeyboardButton(text="📝 Зарегистрироваться", callback_data=f"event:register:{event_index}")])
-        keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="event:back_to_list")])
+            keyboard.append([InlineKeyboardButton(text="📝 Зарегистрироваться", callback_data=EventCb(action="register", index=event_index).pack())])
+        keyboard.append([InlineKeyboardButton(text="⬅️ Назад к списку", callback_data=EventMenuCb(action="back_to_list").pack())])
         
         inline_keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard)
         
@@ -3070,12 +3493,11 @@ async def on_message_text_received(message: Message, state: FSMContext) -> None:
         await message.answer("❌ Ошибка при отправке сообщения. Попробуйте позже.")
 
 
-@router.callback_query(F.data.startswith("participant:cancel_message:"))
-async def on_cancel_message(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(ParticipantCb, "cancel_message")
+async def on_cancel_message(callback: CallbackQuery, state: FSMContext, callback_data: ParticipantCb) -> None:
     """Отменяет отправку сообщения"""
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
-    participant_index = int(parts[3])
+    event_index = callback_data.event_index
+    participant_index = callback_data.participant_index
     
     # Сохраняем необходимые данные до очистки состояния
     data = await state.get_data()
@@ -3141,12 +3563,11 @@ async def on_blacklist_reason_received(message: Message, state: FSMContext) -> N
     await _return_to_participant_info(message, state, event_index, participant_index)
 
 
-@router.callback_query(F.data.startswith("participant:cancel_blacklist:"))
-async def on_cancel_blacklist(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(ParticipantCb, "cancel_blacklist")
+async def on_cancel_blacklist(callback: CallbackQuery, state: FSMContext, callback_data: ParticipantCb) -> None:
     """Отменяет добавление в черный список"""
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
-    participant_index = int(parts[3])
+    event_index = callback_data.event_index
+    participant_index = callback_data.participant_index
     
     await state.clear()
     
@@ -3160,8 +3581,8 @@ async def on_cancel_blacklist(callback: CallbackQuery, state: FSMContext) -> Non
     await _return_to_participant_info(callback, state, event_index, participant_index)
 
 
-@router.callback_query(F.data.startswith("participant:confirm_blacklist:"))
-async def on_confirm_blacklist(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(ParticipantCb, "confirm_blacklist", flags={"idempotent": True})
+async def on_confirm_blacklist(callback: CallbackQuery, state: FSMContext, callback_data: ParticipantCb) -> None:
     """Подтверждает добавление в черный список (использует сохраненную причину)"""
     data = await state.get_data()
     target_username = data.get("blacklist_target_username")
@@ -3213,16 +3634,16 @@ async def on_confirm_blacklist(callback: CallbackQuery, state: FSMContext) -> No
 
 
 # Обработчики для просмотра черного списка
-@router.callback_query(F.data.startswith("event:blacklist:"))
-async def on_show_event_blacklist(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(EventCb, "blacklist", flags={"heavy": True})
+async def on_show_event_blacklist(callback: CallbackQuery, state: FSMContext, callback_data: EventCb, user_ctx: UserContext) -> None:
     """Показывает черный список мероприятия"""
     # Проверяем, является ли пользователь админом
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
     # Извлекаем индекс мероприятия из callback_data
-    event_index = int(callback.data.split(":")[2])
+    event_index = callback_data.index
     
     # Получаем данные из состояния
     data = await state.get_data()
@@ -3240,7 +3661,7 @@ async def on_show_event_blacklist(callback: CallbackQuery, state: FSMContext) ->
     if not blacklist:
         empty_text = f"📋 Черный список мероприятия \"{event.get('title')}\"\n\nСписок пуст"
         back_keyboard = InlineKeyboardMarkup(inline_keyboard=[[
-            InlineKeyboardButton(text="⬅️ Назад к мероприятию", callback_data=f"event:show:{event_index}")
+            InlineKeyboardButton(text="⬅️ Назад к мероприятию", callback_data=EventCb(action="show", index=event_index).pack())
         ]])
         await _safe_edit_message(callback.message, empty_text, back_keyboard)
         return
@@ -3258,18 +3679,17 @@ async def on_show_event_blacklist(callback: CallbackQuery, state: FSMContext) ->
     )
 
 
-@router.callback_query(F.data.startswith("blacklist:show:"))
-async def on_show_blacklist_user_info(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(BlacklistCb, "show")
+async def on_show_blacklist_user_info(callback: CallbackQuery, state: FSMContext, callback_data: BlacklistCb, user_ctx: UserContext) -> None:
     """Показывает информацию о пользователе в черном списке"""
     # Проверяем, является ли пользователь админом
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
     # Извлекаем индексы из callback_data
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
-    blacklist_index = int(parts[3])
+    event_index = callback_data.event_index
+    blacklist_index = callback_data.index
     
     # Получаем данные из состояния
     data = await state.get_data()
@@ -3305,18 +3725,17 @@ async def on_show_blacklist_user_info(callback: CallbackQuery, state: FSMContext
     )
 
 
-@router.callback_query(F.data.startswith("blacklist:remove:"))
-async def on_remove_from_blacklist(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(BlacklistCb, "remove", flags={"idempotent": True})
+async def on_remove_from_blacklist(callback: CallbackQuery, state: FSMContext, callback_data: BlacklistCb, user_ctx: UserContext) -> None:
     """Удаляет пользователя из черного списка"""
     # Проверяем, является ли пользователь админом
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
     # Извлекаем индексы из callback_data
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
-    blacklist_index = int(parts[3])
+    event_index = callback_data.event_index
+    blacklist_index = callback_data.index
     
     # Получаем данные из состояния
     data = await state.get_data()
@@ -3353,7 +3772,7 @@ async def on_remove_from_blacklist(callback: CallbackQuery, state: FSMContext) -
         await state.update_data(blacklist_list=updated_blacklist)
         
         # Возвращаемся к черному списку
-        await on_show_event_blacklist(callback, state)
+        await on_show_event_blacklist(callback, state, EventCb(action="blacklist", index=event_index), user_ctx)
     else:
         await callback.answer("❌ Ошибка при удалении из черного списка", show_alert=True)
 
@@ -3407,16 +3826,15 @@ async def _return_to_participant_info(message_or_callback, state: FSMContext, ev
         await message_or_callback.answer(message_text, reply_markup=keyboard)
 
 
-@router.callback_query(F.data.startswith("blacklist:message:"))
-async def on_message_blacklist_user(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.register(BlacklistCb, "message")
+async def on_message_blacklist_user(callback: CallbackQuery, state: FSMContext, callback_data: BlacklistCb, user_ctx: UserContext) -> None:
     """Начало отправки сообщения пользователю из ЧС"""
-    if not user_is_admin(callback.from_user.username if callback.from_user else None):
+    if not user_ctx.is_admin:
         await callback.answer("Только для админов", show_alert=True)
         return
     
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
-    blacklist_index = int(parts[3])
+    event_index = callback_data.event_index
+    blacklist_index = callback_data.index
     
     data = await state.get_data()
     events = data.get("events_list", [])
@@ -3436,7 +3854,7 @@ async def on_message_blacklist_user(callback: CallbackQuery, state: FSMContext)
     )
     await state.set_state(MessageBlacklistUserForm.waiting_for_message)
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="❌ Отменить", callback_data=f"blacklist:cancel_message:{event_index}:{blacklist_index}")]])
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="❌ Отменить", callback_data=BlacklistCb(action="cancel_message", event_index=event_index, index=blacklist_index).pack())]])
     await _safe_edit_message(
         callback.message,
         f"💬 Написать пользователю {username} (в ЧС)\n\nВведите текст сообщения:",
@@ -3444,11 +3862,10 @@ async def on_message_blacklist_user(callback: CallbackQuery, state: FSMContext)
     )
 
 
-@router.callback_query(F.data.startswith("blacklist:cancel_message:"))
-async def on_cancel_message_blacklist(callback: CallbackQuery, state: FSMContext) -> None:
-    parts = callback.data.split(":")
-    event_index = int(parts[2])
-    blacklist_index = int(parts[3])
+@callbacks.register(BlacklistCb, "cancel_message")
+async def on_cancel_message_blacklist(callback: CallbackQuery, state: FSMContext, callback_data: BlacklistCb, user_ctx: UserContext) -> None:
+    event_index = callback_data.event_index
+    blacklist_index = callback_data.index
     
     # Возврат к карточке пользователя в ЧС
     data = await state.get_data()
@@ -3457,7 +3874,7 @@ async def on_cancel_message_blacklist(callback: CallbackQuery, state: FSMContext
         events_list=data.get("events_list", []),
         blacklist_list=data.get("blacklist_list", [])
     )
-    await on_show_blacklist_user_info(callback, state)
+    await on_show_blacklist_user_info(callback, state, BlacklistCb(action="show", event_index=event_index, index=blacklist_index), user_ctx)
 
 
 @router.message(MessageBlacklistUserForm.waiting_for_message)
@@ -3489,7 +3906,7 @@ async def on_blacklist_message_text(message: Message, state: FSMContext) -> None
     await state.clear()
     await state.update_data(bl_msg_username=username)  # сохранить минимум, если нужно
     # Создаем компактную клавиатуру назад
-    kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Назад к ЧС", callback_data=f"event:blacklist:{event_index}")]])
+    kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Назад к ЧС", callback_data=EventCb(action="blacklist", index=event_index).pack())]])
     await message.answer("Возврат к чёрному списку", reply_markup=kb)
 
 
@@ -0,0 +1,62 @@
+import asyncio
+
+from aiogram import Router
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.utils.deep_linking import create_start_link
+
+from ..config import INLINE_CACHE_TIME
+from ..event_search import search_events
+from ..utils import event_slots
+from .events import EVENT_LINK_PREFIX
+
+
+router = Router()
+
+# Telegram принимает не больше 50 результатов за ответ; остальное — через next_offset
+RESULTS_PER_PAGE = 20
+
+
+def _card_text(event: dict) -> str:
+    text = f"📋 {event.get('title', 'Без названия')}\n\n"
+    if event.get("description"):
+        text += f"📝 Описание: {event['description']}\n\n"
+    if event.get("board_games"):
+        text += f"🎲 Настольные игры: {event['board_games']}\n\n"
+    if event.get("date"):
+        text += f"📅 Дата и время: {event['date']}\n\n"
+    if event.get("responsible"):
+        text += f"👥 Ответственные: {event['responsible']}\n\n"
+    if event.get("quantity"):
+        text += f"👤 Количество участников: {event['quantity']}\n\n"
+    # Счётчик приходит в той же строке мероприятия — без отдельного запроса
+    occupied, max_slots = event_slots(event)
+    if max_slots:
+        text += f"🎫 Свободных мест: {max(0, max_slots - occupied)}\n\n"
+    return text.rstrip()
+
+
+@router.inline_query()
+async def on_inline_query(inline_query: InlineQuery) -> None:
+    """@бот <запрос>: поиск по индексу в памяти, без запросов к базе на каждый ввод"""
+    try:
+        # Поиск по памяти быстрый, но пересборка индекса читает базу — не в потоке event loop
+        found = await asyncio.to_thread(search_events, inline_query.query)
+    except Exception as e:
+        print(f"INLINE_SEARCH_ERROR: {e}")
+        found = []
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    page = found[offset:offset + RESULTS_PER_PAGE]
+    results = []
+    for event in page:
+        # Кнопка ведёт в бота по ссылке /start ev_<id> — прямо в карточку записи
+        link = await create_start_link(inline_query.bot, EVENT_LINK_PREFIX + str(event["id"]))
+        description = " · ".join(part for part in (event.get("date"), event.get("board_games")) if part)
+        results.append(InlineQueryResultArticle(
+            id=str(event["id"]),
+            title=event.get("title") or "Без названия",
+            description=description or None,
+            input_message_content=InputTextMessageContent(message_text=_card_text(event)),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="📝 Зарегистрироваться", url=link)]]),
+        ))
+    next_offset = str(offset + RESULTS_PER_PAGE) if offset + RESULTS_PER_PAGE < len(found) else ""
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True, next_offset=next_offset)
@@ -1,28 +1,21 @@
 from aiogram import Router, F
+from aiogram.filters import CommandStart, CommandObject
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram.types import ReplyKeyboardRemove
 
 from ..keyboards import build_admin_main_keyboard, build_user_main_keyboard
-from ..utils import user_is_admin, ensure_user_exists
+from ..utils import ensure_user_exists
+from ..middlewares import UserContext
+from .events import EVENT_LINK_PREFIX, open_event_from_link
 
 
 router = Router()
 
 
-@router.message(F.text == "/start")
-async def cmd_start(message: Message, state: FSMContext) -> None:
-    user = message.from_user
-    if user is None:
-        return
-    # Сохраняем пользователя и его chat_id для возможности связи
-    try:
-        ensure_user_exists(user.username, user.id)
-    except Exception:
-        pass
-    
+async def _send_main_keyboard(message: Message, user_ctx: UserContext) -> None:
     # Проверяем, является ли пользователь админом
-    if user_is_admin(user.username):
+    if user_ctx.is_admin:
         # Отправляем админскую клавиатуру
         await message.answer(
             "Добро пожаловать! Вы являетесь администратором.",
@@ -36,3 +29,36 @@ async def cmd_start(message: Message, state: FSMContext) -> None:
         )
 
 
+@router.message(CommandStart(deep_link=True, magic=F.args.startswith(EVENT_LINK_PREFIX)))
+async def cmd_start_event_link(message: Message, command: CommandObject, state: FSMContext, user_ctx: UserContext) -> None:
+    """/start ev_<id>: сразу открывает карточку записи на мероприятие"""
+    user = message.from_user
+    if user is None:
+        return
+    try:
+        ensure_user_exists(user.username, user.id)
+    except Exception:
+        pass
+    # По ссылке часто приходят впервые — меню нужно и им
+    await _send_main_keyboard(message, user_ctx)
+    event_id = command.args[len(EVENT_LINK_PREFIX):]
+    if not event_id.isdigit():
+        await message.answer("Ссылка на мероприятие повреждена")
+        return
+    await open_event_from_link(message, state, user_ctx, int(event_id))
+
+
+@router.message(F.text == "/start")
+async def cmd_start(message: Message, state: FSMContext, user_ctx: UserContext) -> None:
+    user = message.from_user
+    if user is None:
+        return
+    # Сохраняем пользователя и его chat_id для возможности связи
+    try:
+        ensure_user_exists(user.username, user.id)
+    except Exception:
+        pass
+    
+    await _send_main_keyboard(message, user_ctx)
+
+
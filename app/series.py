@@ -0,0 +1,165 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from .config import SERIES_WINDOW_DAYS, SERIES_MATERIALIZE_INTERVAL
+from .supabase_client import get_supabase, execute
+from . import replica, reminders
+from .utils import invalidate_event_caches
+
+
+# Правило повтора -> (подпись, шаг в днях)
+RULES: Dict[str, Tuple[str, int]] = {
+    "weekly": ("Каждую неделю", 7),
+    "biweekly": ("Раз в две недели", 14),
+    "daily": ("Каждый день", 1),
+}
+MAX_OCCURRENCES = 52
+
+# Поля шаблона, которые серия передаёт каждому вхождению
+TEMPLATE_FIELDS = ("title", "description", "photo", "board_games", "responsible", "quantity")
+
+
+def occurrence_dates(start_date: str, rule: str, count: int) -> List[str]:
+    start = datetime.strptime(start_date, "%Y-%m-%d %H:%M")
+    step = timedelta(days=RULES[rule][1])
+    return [(start + step * i).strftime("%Y-%m-%d %H:%M") for i in range(count)]
+
+
+def _now_str() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M")
+
+
+def materialize(series: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Создаёт вхождения серии, попадающие в окно SERIES_WINDOW_DAYS, одним запросом.
+    Первое вхождение создаётся всегда. Возвращает созданные строки events."""
+    if series.get("is_cancelled"):
+        return []
+    done = series.get("materialized_count") or 0
+    dates = occurrence_dates(series["start_date"], series["rule"], series["occurrences"])[done:]
+    horizon = (datetime.now() + timedelta(days=SERIES_WINDOW_DAYS)).strftime("%Y-%m-%d %H:%M")
+    due = [d for i, d in enumerate(dates) if d <= horizon or (done == 0 and i == 0)]
+    if not due:
+        return []
+    template = {field: series.get(field) for field in TEMPLATE_FIELDS}
+    supabase = get_supabase()
+    rows = execute(
+        supabase
+        .table("events")
+        .upsert([{**template, "date": d, "series_id": series["id"]} for d in due], on_conflict="series_id,date", ignore_duplicates=True)
+    ).data or []
+    execute(supabase.table("event_series").update({"materialized_count": done + len(due)}).eq("id", series["id"]))
+    series["materialized_count"] = done + len(due)
+    replica.apply("events", rows)
+    invalidate_event_caches()
+    return rows
+
+
+def create_series(draft: Dict[str, Any], rule: str, count: int) -> List[Dict[str, Any]]:
+    """Сохраняет серию по черновику мероприятия и сразу создаёт ближайшие вхождения"""
+    payload = {field: draft.get(field) for field in TEMPLATE_FIELDS}
+    payload.update({"start_date": draft.get("datetime"), "rule": rule, "occurrences": count})
+    series = execute(get_supabase().table("event_series").insert(payload)).data[0]
+    return materialize(series)
+
+
+def materialize_due() -> List[Dict[str, Any]]:
+    """Досоздаёт вхождения всех активных серий, у которых окно сдвинулось"""
+    resp = execute(get_supabase().table("event_series").select("*").eq("is_cancelled", False))
+    created: List[Dict[str, Any]] = []
+    for series in resp.data or []:
+        if (series.get("materialized_count") or 0) < series["occurrences"]:
+            created.extend(materialize(series))
+    return created
+
+
+def _active_registrations(events: List[Dict[str, Any]], statuses: List[str]) -> List[Dict[str, Any]]:
+    """Регистрации на вхождения серии с chat_id — одним запросом на всю пачку"""
+    if not events:
+        return []
+    return execute(
+        get_supabase()
+        .table("event_registrations")
+        .select("user_tg_username, event_id, users(chat_id)")
+        .in_("event_id", [event["id"] for event in events])
+        .in_("status", statuses)
+    ).data or []
+
+
+def update_series(series_id: int, fields: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Меняет шаблон серии и все её будущие вхождения двумя запросами (дата не меняется).
+    Возвращает (изменённые мероприятия, записанных на них участников с chat_id) — для сводной рассылки."""
+    fields = {k: v for k, v in fields.items() if k in TEMPLATE_FIELDS}
+    supabase = get_supabase()
+    execute(supabase.table("event_series").update(fields).eq("id", series_id))
+    rows = execute(
+        supabase
+        .table("events")
+        .update(fields)
+        .eq("series_id", series_id)
+        .eq("is_completed", False)
+        .eq("is_cancelled", False)
+        .gte("date", _now_str())
+    ).data or []
+    replica.apply("events", rows)
+    invalidate_event_caches()
+    # Как и при правке одного мероприятия, уведомляем только записанных, без очереди
+    return rows, _active_registrations(rows, ["registered"])
+
+
+def cancel_series(series_id: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Отменяет серию и все её будущие вхождения. Возвращает (отменённые мероприятия,
+    регистрации на них с chat_id) — для одной сводной рассылки участникам."""
+    supabase = get_supabase()
+    execute(supabase.table("event_series").update({"is_cancelled": True}).eq("id", series_id))
+    rows = execute(
+        supabase
+        .table("events")
+        .update({"is_cancelled": True})
+        .eq("series_id", series_id)
+        .eq("is_completed", False)
+        .eq("is_cancelled", False)
+        .gte("date", _now_str())
+    ).data or []
+    replica.apply("events", rows)
+    invalidate_event_caches()
+    return rows, _active_registrations(rows, ["registered", "waitlist"])
+
+
+def _dates_by_chat(events: List[Dict[str, Any]], registrations: List[Dict[str, Any]]) -> Dict[int, List[str]]:
+    by_id = {event["id"]: event for event in events}
+    dates: Dict[int, List[str]] = {}
+    for reg in registrations:
+        chat_id = (reg.get("users") or {}).get("chat_id") if isinstance(reg.get("users"), dict) else None
+        event = by_id.get(reg.get("event_id"))
+        if chat_id and event:
+            dates.setdefault(chat_id, []).append(event.get("date") or "-")
+    return dates
+
+
+def cancellation_messages(events: List[Dict[str, Any]], registrations: List[Dict[str, Any]]) -> List[Tuple[int, str]]:
+    """Одно сообщение на участника со всеми отменёнными датами вместо сообщения на каждое вхождение"""
+    title = events[0].get("title") if events else "Мероприятие"
+    return [
+        (chat_id, f"❌ Серия мероприятий «{title}» отменена.\n\nОтменены даты, на которые вы записаны:\n" + "\n".join(f"• {d}" for d in sorted(user_dates)))
+        for chat_id, user_dates in _dates_by_chat(events, registrations).items()
+    ]
+
+
+def update_messages(events: List[Dict[str, Any]], registrations: List[Dict[str, Any]], changes_text: str) -> List[Tuple[int, str]]:
+    """Одно сообщение на участника об изменении серии со списком его дат"""
+    title = events[0].get("title") if events else "Мероприятие"
+    return [
+        (chat_id, f"📢 Обновление серии мероприятий «{title}»\n\nИзменено:\n{changes_text}\n\nВаши даты:\n" + "\n".join(f"• {d}" for d in sorted(user_dates)))
+        for chat_id, user_dates in _dates_by_chat(events, registrations).items()
+    ]
+
+
+async def materialize_loop() -> None:
+    """Периодически сдвигает окно серий; запросы идут в отдельном потоке"""
+    while True:
+        try:
+            reminders.schedule_events(await asyncio.to_thread(materialize_due))
+        except Exception as e:
+            print(f"SERIES_MATERIALIZE_ERROR: {e}")
+        await asyncio.sleep(SERIES_MATERIALIZE_INTERVAL)
@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """Запрос, который сейчас выполняется; остальные вызовы с тем же ключом ждут его результат"""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        # Ключ сбросили, пока запрос был в полёте — результат уже устарел и не кэшируется
+        self.stale = False
+
+
+def call_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    if not kwargs:
+        return args
+    return args + tuple(sorted(kwargs.items()))
+
+
+def on_event_loop() -> bool:
+    """Вызов идёт из потока, в котором крутится event loop (а не из asyncio.to_thread)"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def singleflight(ttl: float = 0.0) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Склеивает одинаковые одновременные вызовы функции чтения в один запрос.
+
+    Пока запрос с данными аргументами выполняется, повторные вызовы ждут его и получают
+    тот же результат (или то же исключение). При ttl > 0 удачный результат ещё ttl секунд
+    отдаётся из памяти. Исключения не кэшируются.
+
+    Обёртка синхронная и ждёт лидера в своём потоке — её вызывают из asyncio.to_thread.
+    Обработчики в event loop читают через shared_call: запрос уходит в рабочий поток,
+    а одновременные вызовы с теми же аргументами ждут один общий Future, не блокируя loop.
+
+    У обёрнутой функции есть invalidate(*args, **kwargs) — сбросить один ключ после записи,
+    и clear() — сбросить всё.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        lock = threading.Lock()
+        inflight: Dict[Hashable, _Call] = {}
+        cache: Dict[Hashable, Tuple[float, Any]] = {}
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = call_key(args, kwargs)
+            with lock:
+                hit = cache.get(key)
+                if hit is not None:
+                    if hit[0] > time.monotonic():
+                        return hit[1]
+                    del cache[key]
+                call = inflight.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    inflight[key] = call
+
+            if not leader:
+                call.done.wait()
+                if call.error is not None:
+                    raise call.error
+                return call.value
+
+            try:
+                call.value = func(*args, **kwargs)
+                return call.value
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with lock:
+                    inflight.pop(key, None)
+                    if ttl > 0 and call.error is None and not call.stale:
+                        cache[key] = (time.monotonic() + ttl, call.value)
+                call.done.set()
+
+        def peek(*args: Any, **kwargs: Any) -> Tuple[bool, Any]:
+            """(есть ли свежий результат в кэше, результат) — без запроса"""
+            with lock:
+                hit = cache.get(call_key(args, kwargs))
+            if hit is not None and hit[0] > time.monotonic():
+                return True, hit[1]
+            return False, None
+
+        def invalidate(*args: Any, **kwargs: Any) -> None:
+            key = call_key(args, kwargs)
+            with lock:
+                cache.pop(key, None)
+                call = inflight.get(key)
+                if call is not None:
+                    call.stale = True
+
+        def clear() -> None:
+            with lock:
+                cache.clear()
+                for call in inflight.values():
+                    call.stale = True
+
+        wrapper.peek = peek  # type: ignore[attr-defined]
+        wrapper.invalidate = invalidate  # type: ignore[attr-defined]
+        wrapper.clear = clear  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
+
+
+# Запросы shared_call в полёте: (функция, аргументы) -> общий Future. Живут только в потоке event loop
+_loop_calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+
+def _forget_loop_call(key: Hashable, done: "asyncio.Future[Any]") -> None:
+    _loop_calls.pop(key, None)
+    # Ошибку получат ожидающие; если все они отменены, не даём asyncio ругаться на непрочитанное исключение
+    if not done.cancelled():
+        done.exception()
+
+
+async def shared_call(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Вызывает синхронное чтение из event loop: свежий результат — из кэша singleflight сразу,
+    иначе запрос уходит в asyncio.to_thread, а одновременные вызовы с теми же аргументами
+    ждут один общий Future. Отмена одного ожидающего не отменяет запрос для остальных."""
+    peek = getattr(func, "peek", None)
+    if peek is not None:
+        found, value = peek(*args, **kwargs)
+        if found:
+            return value
+    key = (func, call_key(args, kwargs))
+    future = _loop_calls.get(key)
+    if future is None:
+        future = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+        _loop_calls[key] = future
+        future.add_done_callback(lambda done: _forget_loop_call(key, done))
+    return await asyncio.shield(future)
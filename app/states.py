@@ -57,6 +57,21 @@ class BoardGameCreateForm(StatesGroup):
     waiting_for_photo = State()
     waiting_for_title = State()
     waiting_for_rules = State()
+    waiting_for_params = State()
     waiting_prompt_message = State()
 
 
+class ImportForm(StatesGroup):
+    waiting_for_file = State()
+
+
+class SeriesForm(StatesGroup):
+    waiting_for_count = State()
+
+
+class UserSearchForm(StatesGroup):
+    waiting_for_query = State()
+
+
+class GameSearchForm(StatesGroup):
+    waiting_for_query = State()
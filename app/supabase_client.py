@@ -1,16 +1,71 @@
+import random
+import time
+from typing import Any, Optional
+
+import httpx
+from postgrest.exceptions import APIError
 from supabase import Client, create_client
-from typing import Optional
+from supabase.lib.client_options import ClientOptions
 
-from .config import SUPABASE_URL, SUPABASE_KEY
+from .config import SUPABASE_URL, SUPABASE_KEY, SUPABASE_TIMEOUT, SUPABASE_READ_RETRIES, SUPABASE_BREAKER_THRESHOLD, SUPABASE_BREAKER_RESET
+from .resilience import CircuitBreaker
+from .singleflight import on_event_loop
 
 _client: Optional[Client] = None
 
+breaker = CircuitBreaker(failure_threshold=SUPABASE_BREAKER_THRESHOLD, reset_timeout=SUPABASE_BREAKER_RESET)
+
+# Базовая пауза перед повтором чтения; растёт вдвое с каждой попыткой, плюс случайный разброс
+_RETRY_BASE_DELAY = 0.1
+
 
 def get_supabase() -> Client:
     global _client
     assert SUPABASE_URL and SUPABASE_KEY
     if _client is None:
-        _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        _client = create_client(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT),
+        )
     return _client
 
 
+def _is_outage(error: Exception) -> bool:
+    """Сбой инфраструктуры (сеть, таймаут, перегрузка БД), а не ошибка самого запроса"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, APIError):
+        # SQLSTATE классов 53/57/58 (нехватка ресурсов, statement timeout) и HTTP 5xx
+        return str(error.code or "").startswith("5")
+    return False
+
+
+def execute(query: Any) -> Any:
+    """Выполняет запрос PostgREST через автомат.
+
+    Пока автомат разомкнут, сразу бросает CircuitOpenError. Чтения (GET/HEAD) при сбое
+    повторяются с экспоненциальной паузой и разбросом; записи не повторяются, чтобы не
+    выполнить их дважды. Повторы делаются только в рабочих потоках (asyncio.to_thread):
+    в потоке event loop пауза и лишние таймауты остановили бы обработку всех апдейтов,
+    поэтому там чтение пробуется один раз, а сбой закрывает stale_fallback.
+    """
+    method = str(getattr(query, "http_method", "")).upper()
+    retries = SUPABASE_READ_RETRIES if method in ("GET", "HEAD") and not on_event_loop() else 0
+    attempts = 1 + retries
+    for attempt in range(attempts):
+        breaker.before_call()
+        try:
+            response = query.execute()
+        except Exception as e:
+            if not _is_outage(e):
+                # База ответила — запрос просто некорректен
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt + 1 >= attempts:
+                raise
+            time.sleep(random.uniform(0, _RETRY_BASE_DELAY * (2 ** attempt)))
+            continue
+        breaker.record_success()
+        return response
@@ -1,26 +1,37 @@
-from typing import Optional, Dict, Any
-
-from .supabase_client import get_supabase
+from typing import Callable, Optional, Dict, Any
+
+from .supabase_client import get_supabase, execute
+from .singleflight import singleflight, shared_call
+from . import replica
+from .resilience import stale_fallback
+from .config import READ_CACHE_TTL
+from .games import invalidate_games, format_game_params
 from datetime import datetime
 
 
+def normalize_username(username: Optional[str]) -> Optional[str]:
+    """Приводит ник к виду "@username", в котором он хранится в базе"""
+    if not username:
+        return None
+    return username if username.startswith("@") else f"@{username}"
+
+
+@stale_fallback(default=False)
 def user_is_admin(username: Optional[str]) -> bool:
     if not username:
         return False
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
+    if replica.is_ready():
+        return bool(replica.select("admin", {"tg": tg_username}, limit=1))
     supabase = get_supabase()
-    try:
-        resp = (
-            supabase
-            .table("admin")
-            .select("tg")
-            .eq("tg", tg_username)
-            .limit(1)
-            .execute()
-        )
-        return bool(resp.data) and len(resp.data) > 0
-    except Exception:
-        return False
+    resp = execute(
+        supabase
+        .table("admin")
+        .select("tg")
+        .eq("tg", tg_username)
+        .limit(1)
+    )
+    return bool(resp.data) and len(resp.data) > 0
 
 
 def format_event_text(draft: Dict[str, Any]) -> str:
@@ -86,23 +97,22 @@ def ensure_user_exists(username: Optional[str], chat_id: Optional[int] = None) -
     if not username:
         return False
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
         # Проверяем, существует ли пользователь
-        resp = (
+        resp = execute(
             supabase
             .table("users")
             .select("id")
             .eq("tg_username", tg_username)
             .limit(1)
-            .execute()
         )
         
         if resp.data and len(resp.data) > 0:
             # Пользователь существует, обновляем chat_id если он передан
             if chat_id is not None:
-                supabase.table("users").update({"chat_id": chat_id}).eq("tg_username", tg_username).execute()
+                execute(supabase.table("users").update({"chat_id": chat_id}).eq("tg_username", tg_username))
             return True
         else:
             # Пользователь не существует, создаем его
@@ -110,35 +120,33 @@ def ensure_user_exists(username: Optional[str], chat_id: Optional[int] = None) -
             if chat_id is not None:
                 user_data["chat_id"] = chat_id
             
-            supabase.table("users").insert(user_data).execute()
+            execute(supabase.table("users").insert(user_data))
             return True
     except Exception as e:
         print(f"ERROR ensuring user exists: {e}")
         return False
 
 
+@stale_fallback(default=False)
 def is_user_registered_for_event(username: Optional[str], event_id: int) -> bool:
     """Проверяет, зарегистрирован ли пользователь на мероприятие"""
     if not username or not event_id:
         return False
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
+    if replica.is_ready():
+        return bool(replica.select("event_registrations", {"user_tg_username": tg_username, "event_id": event_id, "status": "registered"}, limit=1))
     supabase = get_supabase()
-    try:
-        resp = (
-            supabase
-            .table("event_registrations")
-            .select("id")
-            .eq("user_tg_username", tg_username)
-            .eq("event_id", event_id)
-            .eq("status", "registered")
-            .limit(1)
-            .execute()
-        )
-        return bool(resp.data) and len(resp.data) > 0
-    except Exception as e:
-        print(f"ERROR checking registration: {e}")
-        return False
+    resp = execute(
+        supabase
+        .table("event_registrations")
+        .select("id")
+        .eq("user_tg_username", tg_username)
+        .eq("event_id", event_id)
+        .eq("status", "registered")
+        .limit(1)
+    )
+    return bool(resp.data) and len(resp.data) > 0
 
 
 def register_user_for_event(username: Optional[str], event_id: int) -> bool:
@@ -162,35 +170,36 @@ def register_user_for_event(username: Optional[str], event_id: int) -> bool:
     if is_event_full(event_id):
         return False
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
         # Проверяем, есть ли уже запись (возможно, отменённая)
-        existing_resp = (
+        existing_resp = execute(
             supabase
             .table("event_registrations")
             .select("id, status")
             .eq("user_tg_username", tg_username)
             .eq("event_id", event_id)
             .limit(1)
-            .execute()
         )
         
         if existing_resp.data and len(existing_resp.data) > 0:
             # Запись уже существует, обновляем статус
             existing_record = existing_resp.data[0]
-            supabase.table("event_registrations").update({
+            replica.apply("event_registrations", execute(supabase.table("event_registrations").update({
                 "status": "registered",
-                "registration_date": datetime.utcnow().isoformat()
-            }).eq("id", existing_record["id"]).execute()
+                "registration_date": datetime.utcnow().isoformat(),
+                "promoted_from_waitlist": False
+            }).eq("id", existing_record["id"])).data)
         else:
             # Создаём новую запись
-            supabase.table("event_registrations").insert({
+            replica.apply("event_registrations", execute(supabase.table("event_registrations").insert({
                 "user_tg_username": tg_username,
                 "event_id": event_id,
                 "status": "registered"
-            }).execute()
+            })).data)
         
+        invalidate_event_caches(event_id)
         return True
     except Exception as e:
         print(f"ERROR registering user: {e}")
@@ -202,18 +211,17 @@ def unregister_user_from_event(username: Optional[str], event_id: int) -> bool:
     if not username or not event_id:
         return False
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
         # Проверяем, есть ли активная регистрация
-        existing_resp = (
+        existing_resp = execute(
             supabase
             .table("event_registrations")
             .select("id, status")
             .eq("user_tg_username", tg_username)
             .eq("event_id", event_id)
             .limit(1)
-            .execute()
         )
         
         if not existing_resp.data or len(existing_resp.data) == 0:
@@ -226,36 +234,39 @@ def unregister_user_from_event(username: Optional[str], event_id: int) -> bool:
             return False
         
         # Отменяем регистрацию
-        supabase.table("event_registrations").update({
+        replica.apply("event_registrations", execute(supabase.table("event_registrations").update({
             "status": "cancelled"
-        }).eq("id", existing_record["id"]).execute()
+        }).eq("id", existing_record["id"])).data)
         
+        invalidate_event_caches(event_id)
         return True
     except Exception as e:
         print(f"ERROR unregistering user: {e}")
         return False
 
 
+@stale_fallback(default=[])
 def get_user_registrations(username: Optional[str]) -> list[Dict[str, Any]]:
     """Получает список мероприятий, на которые зарегистрирован пользователь"""
     if not username:
         return []
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
+    if replica.is_ready():
+        registrations = replica.select("event_registrations", {"user_tg_username": tg_username, "status": "registered"})
+        for record in registrations:
+            found = replica.select("events", {"id": record.get("event_id")}, limit=1)
+            record["events"] = found[0] if found else None
+        return registrations
     supabase = get_supabase()
-    try:
-        resp = (
-            supabase
-            .table("event_registrations")
-            .select("*, events(*)")
-            .eq("user_tg_username", tg_username)
-            .eq("status", "registered")
-            .execute()
-        )
-        return resp.data or []
-    except Exception as e:
-        print(f"ERROR getting user registrations: {e}")
-        return []
+    resp = execute(
+        supabase
+        .table("event_registrations")
+        .select("*, events(*)")
+        .eq("user_tg_username", tg_username)
+        .eq("status", "registered")
+    )
+    return resp.data or []
 
 
 def get_user_chat_id(username: Optional[str]) -> Optional[int]:
@@ -263,16 +274,15 @@ def get_user_chat_id(username: Optional[str]) -> Optional[int]:
     if not username:
         return None
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
-        resp = (
+        resp = execute(
             supabase
             .table("users")
             .select("chat_id")
             .eq("tg_username", tg_username)
             .limit(1)
-            .execute()
         )
         if resp.data and len(resp.data) > 0:
             return resp.data[0].get("chat_id")
@@ -289,13 +299,12 @@ def get_event_registrations(event_id: int) -> list[Dict[str, Any]]:
     
     supabase = get_supabase()
     try:
-        resp = (
+        resp = execute(
             supabase
             .table("event_registrations")
             .select("*, users(*)")
             .eq("event_id", event_id)
             .eq("status", "registered")
-            .execute()
         )
         return resp.data or []
     except Exception as e:
@@ -303,72 +312,158 @@ def get_event_registrations(event_id: int) -> list[Dict[str, Any]]:
         return []
 
 
+def event_slots(event: Dict[str, Any]) -> tuple[int, int]:
+    """(занято мест, максимум) по строке мероприятия: registered_count ведёт триггер (миграция 007)"""
+    max_slots = event.get("quantity") or 0
+    if not max_slots:
+        return (0, 0)  # Если количество не ограничено
+    return (event.get("registered_count") or 0, max_slots)
+
+
+@stale_fallback()
+@singleflight(ttl=READ_CACHE_TTL)
+def _fetch_event_slots(event_id: int) -> tuple[int, int]:
+    if replica.is_ready():
+        # Свои записи реплика видит сразу, а пересчитанный триггером счётчик — только после
+        # синхронизации; локальный подсчёт точен и обходится без сети
+        found = replica.select("events", {"id": event_id}, limit=1)
+        max_slots = found[0].get("quantity", 0) if found else 0
+        if not max_slots:
+            return (0, 0)
+        return (replica.count("event_registrations", {"event_id": event_id, "status": "registered"}), max_slots)
+    # Один запрос: лимит и счётчик лежат в одной строке
+    resp = execute(
+        get_supabase()
+        .table("events")
+        .select("quantity, registered_count")
+        .eq("id", event_id)
+        .limit(1)
+    )
+    return event_slots(resp.data[0]) if resp.data else (0, 0)
+
+
 def get_event_available_slots(event_id: int) -> tuple[int, int]:
     """Получает количество доступных мест на мероприятии
-    Возвращает: (занято мест, максимальное количество мест)"""
+    Возвращает: (занято мест, максимальное количество мест).
+    Если база недоступна и запомненного значения нет — пробрасывает ошибку:
+    (0, 0) означало бы «без ограничений»."""
     if not event_id:
         return (0, 0)
-    
-    supabase = get_supabase()
-    try:
-        # Получаем информацию о мероприятии
-        event_resp = (
-            supabase
-            .table("events")
-            .select("quantity")
-            .eq("id", event_id)
-            .limit(1)
-            .execute()
-        )
-        
-        if not event_resp.data:
-            return (0, 0)
-        
-        max_slots = event_resp.data[0].get("quantity", 0)
-        if not max_slots:
-            return (0, 0)  # Если количество не ограничено
-        
-        # Получаем количество зарегистрированных участников
-        registrations_resp = (
-            supabase
-            .table("event_registrations")
-            .select("id", count="exact")
-            .eq("event_id", event_id)
-            .eq("status", "registered")
-            .execute()
-        )
-        
-        occupied_slots = registrations_resp.count or 0
-        return (occupied_slots, max_slots)
-        
-    except Exception as e:
-        print(f"ERROR getting event available slots: {e}")
+    return _fetch_event_slots(event_id)
+
+
+async def get_event_available_slots_async(event_id: int) -> tuple[int, int]:
+    """То же для обработчиков: запрос в рабочем потоке, одинаковые одновременные чтения склеиваются"""
+    if not event_id:
         return (0, 0)
+    return await shared_call(_fetch_event_slots, event_id)
 
 
-def is_event_full(event_id: int) -> bool:
-    """Проверяет, заполнено ли мероприятие"""
-    occupied, max_slots = get_event_available_slots(event_id)
+@stale_fallback()
+@singleflight(ttl=READ_CACHE_TTL)
+def _fetch_upcoming_events() -> list[Dict[str, Any]]:
+    if replica.is_ready():
+        return replica.select("events", {"is_completed": False, "is_cancelled": False})
+    supabase = get_supabase()
+    resp = execute(
+        supabase
+        .table("events")
+        .select("*")
+        .eq("is_completed", False)
+        .eq("is_cancelled", False)
+    )
+    return resp.data or []
+
+
+def get_upcoming_events() -> list[Dict[str, Any]]:
+    """Незавершённые и неотменённые мероприятия.
+    Ошибку запроса пробрасывает — обработчик сам сообщает пользователю."""
+    # Копии строк: обработчики меняют события в своём списке
+    return [dict(event) for event in _fetch_upcoming_events()]
+
+
+async def get_upcoming_events_async() -> list[Dict[str, Any]]:
+    """get_upcoming_events для обработчиков, не блокирующий event loop"""
+    return [dict(event) for event in await shared_call(_fetch_upcoming_events)]
+
+
+# Кэши вне этого модуля (например, календарный фид), которые сбрасываются вместе с кэшами чтений
+_invalidation_listeners: list[Callable[[Optional[int]], None]] = []
+
+
+def add_invalidation_listener(listener: Callable[[Optional[int]], None]) -> None:
+    _invalidation_listeners.append(listener)
+
+
+def invalidate_event_caches(event_id: Optional[int] = None) -> None:
+    """Сбрасывает кэш чтений после записи в events/event_registrations"""
+    _fetch_upcoming_events.clear()
+    if event_id:
+        _fetch_event_slots.invalidate(event_id)
+    else:
+        _fetch_event_slots.clear()
+    for listener in _invalidation_listeners:
+        listener(event_id)
+
+
+def _is_full(slots: tuple[int, int]) -> bool:
+    occupied, max_slots = slots
     return max_slots > 0 and occupied >= max_slots
 
 
-def get_event_available_slots_count(event_id: int) -> int:
-    """Получает количество оставшихся свободных мест"""
-    occupied, max_slots = get_event_available_slots(event_id)
+def _free_slots(slots: tuple[int, int]) -> int:
+    occupied, max_slots = slots
     if max_slots == 0:
         return -1  # Неограниченное количество
     return max(0, max_slots - occupied)
 
 
+def is_event_full(event_id: int) -> bool:
+    """Проверяет, заполнено ли мероприятие. Если места узнать не удалось — считает заполненным,
+    чтобы не записать сверх лимита"""
+    try:
+        return _is_full(get_event_available_slots(event_id))
+    except Exception as e:
+        print(f"ERROR getting event available slots: {e}")
+        return True
+
+
+async def is_event_full_async(event_id: int) -> bool:
+    try:
+        return _is_full(await get_event_available_slots_async(event_id))
+    except Exception as e:
+        print(f"ERROR getting event available slots: {e}")
+        return True
+
+
+def get_event_available_slots_count(event_id: int) -> int:
+    """Получает количество оставшихся свободных мест (0, если узнать не удалось)"""
+    try:
+        return _free_slots(get_event_available_slots(event_id))
+    except Exception as e:
+        print(f"ERROR getting event available slots: {e}")
+        return 0
+
+
+async def get_event_available_slots_count_async(event_id: int) -> int:
+    try:
+        return _free_slots(await get_event_available_slots_async(event_id))
+    except Exception as e:
+        print(f"ERROR getting event available slots: {e}")
+        return 0
+
+
 def is_user_on_waitlist(username: Optional[str], event_id: int) -> bool:
     """Проверяет, находится ли пользователь в очереди ожидания"""
     if not username or not event_id:
         return False
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
+    if replica.is_ready():
+        return bool(replica.select("event_registrations", {"user_tg_username": tg_username, "event_id": event_id, "status": "waitlist"}, limit=1))
     supabase = get_supabase()
     try:
-        resp = (
+        resp = execute(
             supabase
             .table("event_registrations")
             .select("id")
@@ -376,7 +471,6 @@ def is_user_on_waitlist(username: Optional[str], event_id: int) -> bool:
             .eq("event_id", event_id)
             .eq("status", "waitlist")
             .limit(1)
-            .execute()
         )
         return bool(resp.data) and len(resp.data) > 0
     except Exception as e:
@@ -405,35 +499,38 @@ def add_user_to_waitlist(username: Optional[str], event_id: int) -> bool:
     if not is_event_full(event_id):
         return False
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
         # Проверяем, есть ли уже запись (возможно, отменённая)
-        existing_resp = (
+        existing_resp = execute(
             supabase
             .table("event_registrations")
             .select("id, status")
             .eq("user_tg_username", tg_username)
             .eq("event_id", event_id)
             .limit(1)
-            .execute()
         )
         
         if existing_resp.data and len(existing_resp.data) > 0:
             # Запись уже существует, обновляем статус
             existing_record = existing_resp.data[0]
-            supabase.table("event_registrations").update({
+            replica.apply("event_registrations", execute(supabase.table("event_registrations").update({
                 "status": "waitlist",
-                "registration_date": datetime.utcnow().isoformat()
-            }).eq("id", existing_record["id"]).execute()
+                "registration_date": datetime.utcnow().isoformat(),
+                # Сбрасываем флаг прошлого перехода из очереди, иначе следующий не попадёт в статистику
+                "promoted_from_waitlist": False
+            }).eq("id", existing_record["id"])).data)
         else:
             # Создаём новую запись
-            supabase.table("event_registrations").insert({
+            replica.apply("event_registrations", execute(supabase.table("event_registrations").insert({
                 "user_tg_username": tg_username,
                 "event_id": event_id,
-                "status": "waitlist"
-            }).execute()
+                "status": "waitlist",
+                "promoted_from_waitlist": False
+            })).data)
         
+        invalidate_event_caches(event_id)
         return True
     except Exception as e:
         print(f"ERROR adding to waitlist: {e}")
@@ -445,18 +542,17 @@ def remove_user_from_waitlist(username: Optional[str], event_id: int) -> bool:
     if not username or not event_id:
         return False
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
         # Проверяем, есть ли запись в очереди
-        existing_resp = (
+        existing_resp = execute(
             supabase
             .table("event_registrations")
             .select("id, status")
             .eq("user_tg_username", tg_username)
             .eq("event_id", event_id)
             .limit(1)
-            .execute()
         )
         
         if not existing_resp.data or len(existing_resp.data) == 0:
@@ -467,10 +563,11 @@ def remove_user_from_waitlist(username: Optional[str], event_id: int) -> bool:
             return False
         
         # Удаляем из очереди
-        supabase.table("event_registrations").update({
+        replica.apply("event_registrations", execute(supabase.table("event_registrations").update({
             "status": "cancelled"
-        }).eq("id", existing_record["id"]).execute()
+        }).eq("id", existing_record["id"])).data)
         
+        invalidate_event_caches(event_id)
         return True
     except Exception as e:
         print(f"ERROR removing from waitlist: {e}")
@@ -482,25 +579,27 @@ def get_waitlist_position(username: Optional[str], event_id: int) -> int:
     if not username or not event_id:
         return -1
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
         # Получаем всех пользователей в очереди для этого мероприятия
-        waitlist_resp = (
-            supabase
-            .table("event_registrations")
-            .select("user_tg_username, registration_date")
-            .eq("event_id", event_id)
-            .eq("status", "waitlist")
-            .order("registration_date", desc=False)
-            .execute()
-        )
+        if replica.is_ready():
+            waitlist = replica.select("event_registrations", {"event_id": event_id, "status": "waitlist"}, order_by="registration_date")
+        else:
+            waitlist = execute(
+                supabase
+                .table("event_registrations")
+                .select("user_tg_username, registration_date")
+                .eq("event_id", event_id)
+                .eq("status", "waitlist")
+                .order("registration_date", desc=False)
+            ).data
         
-        if not waitlist_resp.data:
+        if not waitlist:
             return -1
         
         # Ищем позицию пользователя
-        for i, record in enumerate(waitlist_resp.data):
+        for i, record in enumerate(waitlist):
             if record["user_tg_username"] == tg_username:
                 return i + 1  # Позиция начинается с 1
         
@@ -510,38 +609,34 @@ def get_waitlist_position(username: Optional[str], event_id: int) -> int:
         return -1
 
 
+@stale_fallback(default=[])
 def get_event_participants(event_id: int) -> list:
     """Получает список всех участников мероприятия (зарегистрированных и в очереди)"""
     if not event_id:
         return []
     
     supabase = get_supabase()
-    try:
-        # Получаем всех зарегистрированных участников
-        registered_resp = (
-            supabase
-            .table("event_registrations")
-            .select("user_tg_username, registration_date, status, users(chat_id)")
-            .eq("event_id", event_id)
-            .in_("status", ["registered", "waitlist"])
-            .order("registration_date", desc=False)
-            .execute()
-        )
-        
-        participants = []
-        if registered_resp.data:
-            for record in registered_resp.data:
-                participants.append({
-                    "username": record["user_tg_username"],
-                    "status": record["status"],
-                    "registration_date": record["registration_date"],
-                    "chat_id": (record.get("users") or {}).get("chat_id") if isinstance(record.get("users"), dict) else None
-                })
-        
-        return participants
-    except Exception as e:
-        print(f"ERROR getting event participants: {e}")
-        return []
+    # Получаем всех зарегистрированных участников
+    registered_resp = execute(
+        supabase
+        .table("event_registrations")
+        .select("user_tg_username, registration_date, status, users(chat_id)")
+        .eq("event_id", event_id)
+        .in_("status", ["registered", "waitlist"])
+        .order("registration_date", desc=False)
+    )
+    
+    participants = []
+    if registered_resp.data:
+        for record in registered_resp.data:
+            participants.append({
+                "username": record["user_tg_username"],
+                "status": record["status"],
+                "registration_date": record["registration_date"],
+                "chat_id": (record.get("users") or {}).get("chat_id") if isinstance(record.get("users"), dict) else None
+            })
+    
+    return participants
 
 
 def get_user_info(username: str) -> dict:
@@ -549,16 +644,15 @@ def get_user_info(username: str) -> dict:
     if not username:
         return {}
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
-        resp = (
+        resp = execute(
             supabase
             .table("users")
             .select("id, tg_username, chat_id, created_at")
             .eq("tg_username", tg_username)
             .limit(1)
-            .execute()
         )
         
         if resp.data and len(resp.data) > 0:
@@ -574,65 +668,87 @@ def get_user_registrations_count(username: str) -> int:
     if not username:
         return 0
 
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
-        resp = (
+        resp = execute(
             supabase
             .table("event_registrations")
             .select("id", count="exact")
             .eq("user_tg_username", tg_username)
             .eq("status", "registered")
-            .execute()
         )
         return resp.count or 0
     except Exception as e:
         print(f"ERROR getting user registrations count: {e}")
         return 0
 
-def get_user_events_history(username: str) -> list[Dict[str, Any]]:
-    """История мероприятий пользователя (по таблице event_registrations)"""
+def get_user_events_history(username: str, page: int = 0, page_size: int = 10, archived: bool = False) -> tuple[list[Dict[str, Any]], bool]:
+    """Страница истории мероприятий пользователя (по таблице event_registrations,
+    при archived — по архиву давно завершённых, миграция 011).
+    Возвращает (записи, есть ли следующая страница)"""
     if not username:
-        return []
-    tg_username = username if username.startswith("@") else f"@{username}"
+        return [], False
+    tg_username = normalize_username(username)
+    start = max(page, 0) * page_size
     supabase = get_supabase()
     try:
-        resp = (
+        resp = execute(
             supabase
-            .table("event_registrations")
-            .select("status, registration_date, events(*)")
+            .table("event_registrations_archive" if archived else "event_registrations")
+            .select("status, registration_date, events(title, date)")
             .eq("user_tg_username", tg_username)
             .order("registration_date", desc=True)
-            .execute()
+            .range(start, start + page_size)
         )
-        return resp.data or []
+        rows = resp.data or []
+        return rows[:page_size], len(rows) > page_size
     except Exception as e:
         print(f"ERROR get_user_events_history: {e}")
-        return []
+        return [], False
 
 
+def search_users(prefix: Optional[str] = None, exclude: Optional[list[str]] = None, page: int = 0, page_size: int = 10) -> tuple[list[Dict[str, Any]], bool]:
+    """Страница каталога пользователей по алфавиту; prefix — начало ника без учёта регистра.
+    Запрос идёт по индексам миграции 009. Возвращает (пользователи, есть ли следующая страница)"""
+    start = max(page, 0) * page_size
+    supabase = get_supabase()
+    try:
+        query = supabase.table("users").select("tg_username, chat_id, created_at")
+        name = (prefix or "").strip().lstrip("@")
+        if name:
+            # _ и % в нике — обычные символы, а не шаблон
+            escaped = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query = query.ilike("tg_username", f"@{escaped}%")
+        excluded = [tg for tg in (exclude or []) if tg]
+        if excluded:
+            query = query.not_.in_("tg_username", excluded)
+        resp = execute(query.order("tg_username").range(start, start + page_size))
+        rows = resp.data or []
+        return rows[:page_size], len(rows) > page_size
+    except Exception as e:
+        print(f"ERROR search_users: {e}")
+        return [], False
+
+
+@stale_fallback(default=False)
 def is_user_in_event_blacklist(event_id: int, username: str) -> bool:
     """Проверяет, находится ли пользователь в черном списке мероприятия"""
     if not event_id or not username:
         return False
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
-    try:
-        resp = (
-            supabase
-            .table("event_blacklist")
-            .select("id")
-            .eq("event_id", event_id)
-            .eq("user_tg_username", tg_username)
-            .limit(1)
-            .execute()
-        )
-        
-        return bool(resp.data) and len(resp.data) > 0
-    except Exception as e:
-        print(f"ERROR checking blacklist: {e}")
-        return False
+    resp = execute(
+        supabase
+        .table("event_blacklist")
+        .select("id")
+        .eq("event_id", event_id)
+        .eq("user_tg_username", tg_username)
+        .limit(1)
+    )
+    
+    return bool(resp.data) and len(resp.data) > 0
 
 
 def add_user_to_event_blacklist(event_id: int, username: str, added_by: str, reason: str = None) -> bool:
@@ -640,8 +756,8 @@ def add_user_to_event_blacklist(event_id: int, username: str, added_by: str, rea
     if not event_id or not username or not added_by:
         return False
     
-    tg_username = username if username.startswith("@") else f"@{username}"
-    added_by_username = added_by if added_by.startswith("@") else f"@{added_by}"
+    tg_username = normalize_username(username)
+    added_by_username = normalize_username(added_by)
     
     supabase = get_supabase()
     try:
@@ -656,7 +772,7 @@ def add_user_to_event_blacklist(event_id: int, username: str, added_by: str, rea
             pass
         
         # Добавляем в черный список
-        resp = (
+        resp = execute(
             supabase
             .table("event_blacklist")
             .insert({
@@ -665,7 +781,6 @@ def add_user_to_event_blacklist(event_id: int, username: str, added_by: str, rea
                 "added_by_tg_username": added_by_username,
                 "reason": reason
             })
-            .execute()
         )
         
         return bool(resp.data) and len(resp.data) > 0
@@ -679,16 +794,15 @@ def remove_user_from_event_blacklist(event_id: int, username: str) -> bool:
     if not event_id or not username:
         return False
     
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
-        resp = (
+        resp = execute(
             supabase
             .table("event_blacklist")
             .delete()
             .eq("event_id", event_id)
             .eq("user_tg_username", tg_username)
-            .execute()
         )
         
         return bool(resp.data) and len(resp.data) > 0
@@ -704,13 +818,12 @@ def get_event_blacklist(event_id: int) -> list:
     
     supabase = get_supabase()
     try:
-        resp = (
+        resp = execute(
             supabase
             .table("event_blacklist")
             .select("user_tg_username, added_by_tg_username, added_at, reason")
             .eq("event_id", event_id)
             .order("added_at", desc=True)
-            .execute()
         )
         
         blacklist = []
@@ -736,12 +849,11 @@ def get_all_users() -> list[Dict[str, Any]]:
     """Все пользователи бота"""
     supabase = get_supabase()
     try:
-        resp = (
+        resp = execute(
             supabase
             .table("users")
             .select("tg_username, chat_id, created_at")
             .order("created_at", desc=True)
-            .execute()
         )
         return resp.data or []
     except Exception as e:
@@ -750,9 +862,11 @@ def get_all_users() -> list[Dict[str, Any]]:
 
 
 def get_all_admins() -> list[Dict[str, Any]]:
+    if replica.is_ready():
+        return replica.select("admin")
     supabase = get_supabase()
     try:
-        resp = supabase.table("admin").select("tg").execute()
+        resp = execute(supabase.table("admin").select("tg"))
         return resp.data or []
     except Exception as e:
         print(f"ERROR get_all_admins: {e}")
@@ -763,14 +877,14 @@ def add_user_to_global_blacklist(username: str) -> bool:
     """Добаляет пользователя в глобальный ЧС (запрет для всех мероприятий)"""
     if not username:
         return False
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
         # ensure user exists for FK
         ensure_user_exists(tg_username)
-        supabase.table("global_blacklist").insert({
+        replica.apply("global_blacklist", execute(supabase.table("global_blacklist").insert({
             "user_tg_username": tg_username
-        }).execute()
+        })).data)
         return True
     except Exception as e:
         print(f"ERROR add_user_to_global_blacklist: {e}")
@@ -780,10 +894,11 @@ def add_user_to_global_blacklist(username: str) -> bool:
 def remove_user_from_global_blacklist(username: str) -> bool:
     if not username:
         return False
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
-        supabase.table("global_blacklist").delete().eq("user_tg_username", tg_username).execute()
+        execute(supabase.table("global_blacklist").delete().eq("user_tg_username", tg_username))
+        replica.delete("global_blacklist", tg_username)
         return True
     except Exception as e:
         print(f"ERROR remove_user_from_global_blacklist: {e}")
@@ -791,41 +906,91 @@ def remove_user_from_global_blacklist(username: str) -> bool:
 
 
 def get_global_blacklist() -> list[Dict[str, Any]]:
+    if replica.is_ready():
+        return replica.select("global_blacklist", order_by="added_at", desc=True)
     supabase = get_supabase()
     try:
-        resp = supabase.table("global_blacklist").select("user_tg_username, added_at").order("added_at", desc=True).execute()
+        resp = execute(supabase.table("global_blacklist").select("user_tg_username, added_at").order("added_at", desc=True))
         return resp.data or []
     except Exception as e:
         print(f"ERROR get_global_blacklist: {e}")
         return []
 
 
+@stale_fallback(default=False)
+def is_user_globally_blacklisted(username: Optional[str]) -> bool:
+    """Проверяет, находится ли пользователь в глобальном ЧС"""
+    if not username:
+        return False
+    tg_username = normalize_username(username)
+    if replica.is_ready():
+        return bool(replica.select("global_blacklist", {"user_tg_username": tg_username}, limit=1))
+    supabase = get_supabase()
+    resp = execute(
+        supabase
+        .table("global_blacklist")
+        .select("user_tg_username")
+        .eq("user_tg_username", tg_username)
+        .limit(1)
+    )
+    return bool(resp.data)
+
+
+def split_event_list(value: Optional[str]) -> list[str]:
+    """Элементы строки через запятую (ответственные, настолки) без пустых"""
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
 def get_admin_past_events(admin_tg: str) -> list[Dict[str, Any]]:
-    """Возвращает прошедшие мероприятия, где указанный админ фигурирует в поле responsible"""
+    """Возвращает прошедшие мероприятия, где указанный админ числится ответственным.
+    Ищет по индексу таблицы связей event_admins (миграция 008)."""
     if not admin_tg:
         return []
-    tg = admin_tg if admin_tg.startswith("@") else f"@{admin_tg}"
+    tg = normalize_username(admin_tg)
     supabase = get_supabase()
     try:
-        resp = (
+        resp = execute(
             supabase
             .table("events")
-            .select("*")
+            .select("*, event_admins!inner(admin_tg)")
+            .eq("event_admins.admin_tg", tg)
             .eq("is_completed", True)
-            .ilike("responsible", f"%{tg}%")
             .order("date", desc=True)
-            .execute()
         )
-        return resp.data or []
+        events = resp.data or []
+        for event in events:
+            event.pop("event_admins", None)
+        return events
     except Exception as e:
         print(f"ERROR get_admin_past_events: {e}")
         return []
 
 
+@stale_fallback(default=[])
+def get_events_with_game(game_title: str) -> list[Dict[str, Any]]:
+    """Предстоящие мероприятия, в которых есть настолка (по индексу event_games)"""
+    if not game_title:
+        return []
+    resp = execute(
+        get_supabase()
+        .table("events")
+        .select("*, event_games!inner(game_title)")
+        .eq("event_games.game_title", game_title)
+        .eq("is_completed", False)
+        .eq("is_cancelled", False)
+        .order("date")
+    )
+    events = resp.data or []
+    for event in events:
+        event.pop("event_games", None)
+    return events
+
+
 def format_game_text(draft: Dict[str, Any]) -> str:
     return (
         "🎲 Черновик игры:\n"
         f"Название: {draft.get('title') or '(не задано)'}\n"
+        f"Игроки и время: {format_game_params(draft) or '(не заданы)'}\n"
         f"Правила: {draft.get('rules') or '(не заданы)'}"
     )
 
@@ -835,6 +1000,7 @@ def format_game_text_without_photo(draft: Dict[str, Any]) -> str:
         "🎲 Черновик игры:\n"
         f"Название: {draft.get('title') or '(не задано)'}\n"
         f"Картинка: {draft.get('photo') or '(не задано)'}\n"
+        f"Игроки и время: {format_game_params(draft) or '(не заданы)'}\n"
         f"Правила: {draft.get('rules') or '(не заданы)'}"
     )
 
@@ -894,68 +1060,46 @@ def is_future_datetime_str(iso_text: str) -> bool:
         return False
 
 
-def get_events_needing_reminders() -> list[Dict[str, Any]]:
-    """Возвращает мероприятия, для которых пора отправить напоминание за день/час и ещё не отправляли."""
-    supabase = get_supabase()
-    now = datetime.now()
-    results: list[Dict[str, Any]] = []
+def get_events_for_reminders() -> list[Dict[str, Any]]:
+    """Мероприятия, которые ещё не завершены и не отменены — кандидаты на напоминания"""
     try:
-        resp = supabase.table("events").select("*").eq("is_completed", False).eq("is_cancelled", False).execute()
-        events = resp.data or []
-        for e in events:
-            date_text = e.get("date")
-            dt = parse_event_datetime_to_datetime(date_text) if date_text else None
-            if not dt:
-                continue
-            # Сужаем окно отправки, чтобы триггер происходил только один раз в узком интервале
-            diff_seconds = (dt - now).total_seconds()
-            day_target = 24 * 3600
-            hour_target = 3600
-            tolerance = 60  # секунды допуска
-
-            # 1 день до события
-            if (
-                not e.get("reminder_1day_sent")
-                and (day_target - tolerance) <= diff_seconds <= (day_target + tolerance)
-            ):
-                results.append({"event": e, "type": "1day"})
-
-            # 1 час до события
-            if (
-                not e.get("reminder_1hour_sent")
-                and (hour_target - tolerance) <= diff_seconds <= (hour_target + tolerance)
-            ):
-                results.append({"event": e, "type": "1hour"})
+        if replica.is_ready():
+            return replica.select("events", {"is_completed": False, "is_cancelled": False})
+        resp = execute(get_supabase().table("events").select("*").eq("is_completed", False).eq("is_cancelled", False))
+        return resp.data or []
     except Exception as ex:
-        print(f"ERROR get_events_needing_reminders: {ex}")
-    return results
+        print(f"ERROR get_events_for_reminders: {ex}")
+        return []
+
+
+@stale_fallback(default={})
+def get_event_by_id(event_id: int) -> Dict[str, Any]:
+    """Строка мероприятия по id ({} если не найдено)"""
+    if not event_id:
+        return {}
+    if replica.is_ready():
+        found = replica.select("events", {"id": event_id}, limit=1)
+        return found[0] if found else {}
+    resp = execute(get_supabase().table("events").select("*").eq("id", event_id).limit(1))
+    return resp.data[0] if resp.data else {}
 
 
 def mark_event_reminder_sent(event_id: int, reminder_type: str) -> None:
     supabase = get_supabase()
     try:
         if reminder_type == "1day":
-            supabase.table("events").update({"reminder_1day_sent": True}).eq("id", event_id).execute()
+            replica.apply("events", execute(supabase.table("events").update({"reminder_1day_sent": True}).eq("id", event_id)).data)
         elif reminder_type == "1hour":
-            supabase.table("events").update({"reminder_1hour_sent": True}).eq("id", event_id).execute()
+            replica.apply("events", execute(supabase.table("events").update({"reminder_1hour_sent": True}).eq("id", event_id)).data)
     except Exception as ex:
         print(f"ERROR mark_event_reminder_sent: {ex}")
 
 
-def get_board_games() -> list[Dict[str, Any]]:
-    supabase = get_supabase()
-    try:
-        resp = supabase.table("board_games").select("*").order("created_at", desc=True).execute()
-        return resp.data or []
-    except Exception as e:
-        print(f"ERROR get_board_games: {e}")
-        return []
-
-
 def create_board_game(payload: Dict[str, Any]) -> bool:
     supabase = get_supabase()
     try:
-        supabase.table("board_games").insert(payload).execute()
+        replica.apply("board_games", execute(supabase.table("board_games").insert(payload)).data)
+        invalidate_games()
         return True
     except Exception as e:
         print(f"ERROR create_board_game: {e}")
@@ -966,30 +1110,15 @@ def save_event_feedback_rating(username: Optional[str], event_id: int, rating: i
     """Сохраняет/обновляет оценку пользователя для мероприятия (без комментария)"""
     if not username or not event_id or not (1 <= rating <= 10):
         return False
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
-        # Проверяем, есть ли уже отзыв
-        existing = (
-            supabase
-            .table("event_feedback")
-            .select("id")
-            .eq("event_id", event_id)
-            .eq("user_tg_username", tg_username)
-            .limit(1)
-            .execute()
-        )
-        if existing.data and len(existing.data) > 0:
-            feedback_id = existing.data[0]["id"]
-            supabase.table("event_feedback").update({
-                "rating": rating
-            }).eq("id", feedback_id).execute()
-        else:
-            supabase.table("event_feedback").insert({
-                "event_id": event_id,
-                "user_tg_username": tg_username,
-                "rating": rating
-            }).execute()
+        # Один upsert по (event_id, user_tg_username): комментарий, если он был, не затрагивается
+        execute(supabase.table("event_feedback").upsert({
+            "event_id": event_id,
+            "user_tg_username": tg_username,
+            "rating": rating
+        }, on_conflict="event_id,user_tg_username"))
         return True
     except Exception as e:
         print(f"ERROR saving feedback rating: {e}")
@@ -1000,30 +1129,56 @@ def save_event_feedback_comment(username: Optional[str], event_id: int, comment:
     """Сохраняет/обновляет комментарий пользователя для мероприятия"""
     if not username or not event_id:
         return False
-    tg_username = username if username.startswith("@") else f"@{username}"
+    tg_username = normalize_username(username)
     supabase = get_supabase()
     try:
-        existing = (
-            supabase
-            .table("event_feedback")
-            .select("id")
-            .eq("event_id", event_id)
-            .eq("user_tg_username", tg_username)
-            .limit(1)
-            .execute()
-        )
-        if existing.data and len(existing.data) > 0:
-            feedback_id = existing.data[0]["id"]
-            supabase.table("event_feedback").update({
-                "comment": comment
-            }).eq("id", feedback_id).execute()
-        else:
-            supabase.table("event_feedback").insert({
-                "event_id": event_id,
-                "user_tg_username": tg_username,
-                "comment": comment
-            }).execute()
+        execute(supabase.table("event_feedback").upsert({
+            "event_id": event_id,
+            "user_tg_username": tg_username,
+            "comment": comment
+        }, on_conflict="event_id,user_tg_username"))
         return True
     except Exception as e:
         print(f"ERROR saving feedback comment: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+@stale_fallback(default={})
+def get_event_feedback_stats(event_id: int) -> Dict[str, Any]:
+    """Сводка отзывов по мероприятию из event_feedback_stats (ведётся триггером, миграция 004)"""
+    if not event_id:
+        return {}
+    resp = execute(
+        get_supabase()
+        .table("event_feedback_stats")
+        .select("*")
+        .eq("event_id", event_id)
+        .limit(1)
+    )
+    return resp.data[0] if resp.data else {}
+
+
+def format_feedback_stats(title: str, stats: Dict[str, Any]) -> str:
+    count = stats.get("ratings_count") or 0
+    comments = stats.get("latest_comments") or []
+    text = f"📈 Отзывы: {title}\n\n"
+    if not count and not comments:
+        return text + "Отзывов пока нет"
+    lines = []
+    if count:
+        average = (stats.get("ratings_sum") or 0) / count
+        lines.append(f"⭐ Средняя оценка: {average:.1f}/10 (оценок: {count})\n")
+        histogram = stats.get("histogram") or [0] * 10
+        top = max(histogram) or 1
+        for rating in range(10, 0, -1):
+            votes = histogram[rating - 1]
+            lines.append(f"{rating:>2} | {'█' * round(votes * 10 / top)} {votes}")
+    if comments:
+        lines.append("\n💬 Последние комментарии:")
+        for item in comments:
+            rating = f" ({item['rating']}/10)" if item.get("rating") else ""
+            comment = item.get("comment") or ""
+            if len(comment) > 100:
+                comment = comment[:100] + "…"
+            lines.append(f"{item.get('user') or '?'}{rating}: {comment}")
+    return text + "\n".join(lines)
\ No newline at end of file
@@ -0,0 +1,26 @@
+-- Колонка updated_at для инкрементальной синхронизации локальной реплики (app/replica.py).
+-- Реплика забирает строки с updated_at >= сохранённого водяного знака.
+
+create or replace function set_updated_at() returns trigger
+language plpgsql as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+alter table events add column if not exists updated_at timestamptz not null default now();
+alter table event_registrations add column if not exists updated_at timestamptz not null default now();
+
+drop trigger if exists events_set_updated_at on events;
+create trigger events_set_updated_at
+    before update on events
+    for each row execute function set_updated_at();
+
+drop trigger if exists event_registrations_set_updated_at on event_registrations;
+create trigger event_registrations_set_updated_at
+    before update on event_registrations
+    for each row execute function set_updated_at();
+
+create index if not exists events_updated_at_idx on events (updated_at);
+create index if not exists event_registrations_updated_at_idx on event_registrations (updated_at);
@@ -0,0 +1,38 @@
+-- Лента изменений для app/changefeed.py: каждая запись в кэшируемые таблицы
+-- публикуется в канал table_changes, и все экземпляры бота сбрасывают свои кэши.
+-- Payload NOTIFY ограничен 8000 байт: если строка не помещается, row = null,
+-- и подписчики перечитывают таблицу сами.
+
+create or replace function notify_table_change() returns trigger
+language plpgsql as $$
+declare
+    changed record;
+    payload text;
+begin
+    if tg_op = 'DELETE' then
+        changed := old;
+    else
+        changed := new;
+    end if;
+    payload := json_build_object('table', tg_table_name, 'op', tg_op, 'row', row_to_json(changed))::text;
+    if octet_length(payload) > 7900 then
+        payload := json_build_object('table', tg_table_name, 'op', tg_op, 'row', null)::text;
+    end if;
+    perform pg_notify('table_changes', payload);
+    return null;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['events', 'event_registrations', 'admin', 'global_blacklist', 'event_blacklist', 'board_games'] loop
+        execute format('drop trigger if exists %I on %I', t || '_notify_change', t);
+        execute format(
+            'create trigger %I after insert or update or delete on %I for each row execute function notify_table_change()',
+            t || '_notify_change', t
+        );
+    end loop;
+end;
+$$;
@@ -0,0 +1,29 @@
+-- Общее окно дедупликации нажатий (app/dedupe.py, CALLBACK_DEDUPE_SHARED=1).
+-- Ключ: "user_id:message_id:callback_data". claim_callback занимает ключ, если его нет
+-- или он занят дольше окна; остальные экземпляры получают false и отбрасывают нажатие.
+
+create table if not exists callback_dedupe (
+    key text primary key,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists callback_dedupe_created_at_idx on callback_dedupe (created_at);
+
+-- Занимает ключ на ttl_seconds одним оператором: вставка или перезапись устаревшей строки.
+-- Окно отсчитывается от прошлого нажатия, а не от границы интервала времени
+create or replace function claim_callback(claim_key text, ttl_seconds double precision) returns boolean
+language sql as $$
+    with claimed as (
+        insert into callback_dedupe (key, created_at) values (claim_key, now())
+        on conflict (key) do update set created_at = excluded.created_at
+        where callback_dedupe.created_at < now() - make_interval(secs => ttl_seconds)
+        returning 1
+    )
+    select exists (select 1 from claimed);
+$$;
+
+-- Старые ключи больше не нужны; чистит app/dedupe.py: purge_loop
+create or replace function purge_callback_dedupe() returns void
+language sql as $$
+    delete from callback_dedupe where created_at < now() - interval '1 hour';
+$$;
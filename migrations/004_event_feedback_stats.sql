@@ -0,0 +1,119 @@
+-- Сводка отзывов по мероприятию (app/utils.py: get_event_feedback_stats).
+-- Триггер на event_feedback поддерживает её инкрементально: число и сумма оценок,
+-- гистограмма 1..10 и последние 5 комментариев. Экран «Статистика» читает одну строку
+-- вместо того, чтобы сканировать event_feedback.
+
+-- Отзыв пишется upsert'ом по (event_id, user_tg_username): оставляем самый свежий из дублей
+delete from event_feedback f
+using event_feedback newer
+where newer.event_id = f.event_id
+  and newer.user_tg_username = f.user_tg_username
+  and newer.id > f.id;
+
+create unique index if not exists event_feedback_event_user_key
+    on event_feedback (event_id, user_tg_username);
+
+create table if not exists event_feedback_stats (
+    event_id bigint primary key references events (id) on delete cascade,
+    ratings_count integer not null default 0,
+    ratings_sum integer not null default 0,
+    histogram integer[] not null default array_fill(0, array[10]),
+    latest_comments jsonb not null default '[]'::jsonb,
+    updated_at timestamptz not null default now()
+);
+
+create or replace function event_feedback_stats_apply() returns trigger
+language plpgsql as $$
+declare
+    author text;
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.rating is not null then
+        update event_feedback_stats
+        set ratings_count = ratings_count - 1,
+            ratings_sum = ratings_sum - old.rating,
+            histogram[old.rating] = histogram[old.rating] - 1,
+            updated_at = now()
+        where event_id = old.event_id;
+    end if;
+
+    if tg_op in ('INSERT', 'UPDATE') then
+        insert into event_feedback_stats (event_id) values (new.event_id)
+        on conflict (event_id) do nothing;
+        if new.rating is not null then
+            update event_feedback_stats
+            set ratings_count = ratings_count + 1,
+                ratings_sum = ratings_sum + new.rating,
+                histogram[new.rating] = histogram[new.rating] + 1,
+                updated_at = now()
+            where event_id = new.event_id;
+        end if;
+    end if;
+
+    -- Последние комментарии: по одному на пользователя, свежие первыми
+    if tg_op = 'DELETE' then
+        author := old.user_tg_username;
+        update event_feedback_stats
+        set latest_comments = coalesce((
+                select jsonb_agg(c.value order by c.ord)
+                from jsonb_array_elements(latest_comments) with ordinality as c(value, ord)
+                where c.value ->> 'user' is distinct from author
+            ), '[]'::jsonb),
+            updated_at = now()
+        where event_id = old.event_id;
+    elsif coalesce(new.comment, '') <> ''
+          and (tg_op = 'INSERT' or new.comment is distinct from old.comment or new.rating is distinct from old.rating) then
+        author := new.user_tg_username;
+        update event_feedback_stats
+        set latest_comments = jsonb_build_array(
+                jsonb_build_object('user', author, 'rating', new.rating, 'comment', new.comment)
+            ) || coalesce((
+                select jsonb_agg(c.value order by c.ord)
+                from (
+                    select value, ord
+                    from jsonb_array_elements(latest_comments) with ordinality as e(value, ord)
+                    where value ->> 'user' is distinct from author
+                    order by ord
+                    limit 4
+                ) c
+            ), '[]'::jsonb),
+            updated_at = now()
+        where event_id = new.event_id;
+    end if;
+    return null;
+end;
+$$;
+
+-- Заполняем сводку по уже накопленным отзывам
+truncate event_feedback_stats;
+
+insert into event_feedback_stats (event_id, ratings_count, ratings_sum, histogram)
+select
+    event_id,
+    count(rating),
+    coalesce(sum(rating), 0),
+    array[
+        count(*) filter (where rating = 1), count(*) filter (where rating = 2),
+        count(*) filter (where rating = 3), count(*) filter (where rating = 4),
+        count(*) filter (where rating = 5), count(*) filter (where rating = 6),
+        count(*) filter (where rating = 7), count(*) filter (where rating = 8),
+        count(*) filter (where rating = 9), count(*) filter (where rating = 10)
+    ]::integer[]
+from event_feedback
+group by event_id;
+
+update event_feedback_stats s
+set latest_comments = coalesce((
+    select jsonb_agg(jsonb_build_object('user', f.user_tg_username, 'rating', f.rating, 'comment', f.comment) order by f.id desc)
+    from (
+        select id, user_tg_username, rating, comment
+        from event_feedback
+        where event_id = s.event_id and coalesce(comment, '') <> ''
+        order by id desc
+        limit 5
+    ) f
+), '[]'::jsonb);
+
+drop trigger if exists event_feedback_stats_apply on event_feedback;
+create trigger event_feedback_stats_apply
+    after insert or update or delete on event_feedback
+    for each row execute function event_feedback_stats_apply();
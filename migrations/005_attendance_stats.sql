@@ -0,0 +1,183 @@
+-- Сводные таблицы посещаемости для app/analytics.py. Триггеры обновляют их по каждому
+-- изменению статуса регистрации и мероприятия, поэтому экраны аналитики читают готовые
+-- строки, а не сканируют всю историю event_registrations.
+--   user_attendance_stats — по пользователю: записи, отмены, очередь и переходы из неё, посещения;
+--   event_fill_stats      — по мероприятию: заполненность и момент, когда места закончились;
+--   admin_event_stats     — по ответственному: сколько мероприятий проведено/завершено/отменено.
+
+alter table event_registrations add column if not exists promoted_from_waitlist boolean not null default false;
+
+create table if not exists user_attendance_stats (
+    user_tg_username text primary key,
+    registrations integer not null default 0,
+    cancellations integer not null default 0,
+    waitlist_joins integer not null default 0,
+    waitlist_promotions integer not null default 0,
+    attended integer not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists user_attendance_stats_attended_idx on user_attendance_stats (attended desc);
+
+create table if not exists event_fill_stats (
+    event_id bigint primary key references events (id) on delete cascade,
+    capacity integer,
+    registered integer not null default 0,
+    peak_registered integer not null default 0,
+    first_registration_at timestamptz,
+    filled_at timestamptz,
+    updated_at timestamptz not null default now()
+);
+
+create table if not exists admin_event_stats (
+    admin_tg text primary key,
+    events_total integer not null default 0,
+    events_completed integer not null default 0,
+    events_cancelled integer not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+create or replace function registration_stats_apply() returns trigger
+language plpgsql as $$
+declare
+    old_status text;
+    new_status text;
+    old_promoted boolean := false;
+    new_promoted boolean := false;
+    target_user text;
+    target_event bigint;
+    delta integer;
+    cap integer;
+begin
+    if tg_op <> 'INSERT' then
+        old_status := old.status;
+        old_promoted := coalesce(old.promoted_from_waitlist, false);
+        target_user := old.user_tg_username;
+        target_event := old.event_id;
+    end if;
+    if tg_op <> 'DELETE' then
+        new_status := new.status;
+        new_promoted := coalesce(new.promoted_from_waitlist, false);
+        target_user := new.user_tg_username;
+        target_event := new.event_id;
+    end if;
+    if old_status is not distinct from new_status then
+        return null;
+    end if;
+
+    -- На INSERT old_status = NULL: флаги переходов сравниваются через is not distinct from,
+    -- иначе NULL попадёт в NOT NULL счётчики. Переход из очереди — по флагу promoted_from_waitlist.
+    if new_status is not null then
+        insert into user_attendance_stats (user_tg_username) values (target_user)
+        on conflict (user_tg_username) do nothing;
+        update user_attendance_stats
+        set registrations = registrations + (new_status is not distinct from 'registered')::int,
+            waitlist_promotions = waitlist_promotions + (new_promoted and not old_promoted)::int,
+            waitlist_joins = waitlist_joins + (new_status is not distinct from 'waitlist')::int,
+            cancellations = cancellations + (new_status is not distinct from 'cancelled' and old_status is not distinct from 'registered')::int,
+            updated_at = now()
+        where user_tg_username = target_user;
+    end if;
+
+    delta := (new_status is not distinct from 'registered')::int - (old_status is not distinct from 'registered')::int;
+    if delta <> 0 then
+        select quantity into cap from events where id = target_event;
+        insert into event_fill_stats (event_id, capacity) values (target_event, cap)
+        on conflict (event_id) do nothing;
+        update event_fill_stats
+        set registered = registered + delta,
+            peak_registered = greatest(peak_registered, registered + delta),
+            capacity = cap,
+            first_registration_at = coalesce(first_registration_at, now()),
+            filled_at = case
+                when filled_at is null and cap > 0 and registered + delta >= cap then now()
+                else filled_at
+            end,
+            updated_at = now()
+        where event_id = target_event;
+    end if;
+    return null;
+end;
+$$;
+
+-- Ответственные хранятся строкой "@a, @b"
+create or replace function event_responsibles(responsible text) returns setof text
+language sql immutable as $$
+    select distinct trim(r) from regexp_split_to_table(coalesce(responsible, ''), ',') as r where trim(r) <> ''
+$$;
+
+create or replace function event_stats_apply() returns trigger
+language plpgsql as $$
+begin
+    if tg_op <> 'INSERT' then
+        update admin_event_stats
+        set events_total = events_total - 1,
+            events_completed = events_completed - coalesce(old.is_completed, false)::int,
+            events_cancelled = events_cancelled - coalesce(old.is_cancelled, false)::int,
+            updated_at = now()
+        where admin_tg in (select event_responsibles(old.responsible));
+    end if;
+    if tg_op <> 'DELETE' then
+        insert into admin_event_stats (admin_tg, events_total, events_completed, events_cancelled)
+        select r, 1, coalesce(new.is_completed, false)::int, coalesce(new.is_cancelled, false)::int
+        from event_responsibles(new.responsible) as r
+        on conflict (admin_tg) do update
+        set events_total = admin_event_stats.events_total + 1,
+            events_completed = admin_event_stats.events_completed + excluded.events_completed,
+            events_cancelled = admin_event_stats.events_cancelled + excluded.events_cancelled,
+            updated_at = now();
+
+        update event_fill_stats set capacity = new.quantity, updated_at = now()
+        where event_id = new.id and capacity is distinct from new.quantity;
+
+        -- Посещение засчитывается всем, кто был записан на момент завершения
+        if coalesce(new.is_completed, false) is distinct from (tg_op = 'UPDATE' and coalesce(old.is_completed, false)) then
+            insert into user_attendance_stats (user_tg_username, attended)
+            select user_tg_username, case when new.is_completed then 1 else -1 end
+            from event_registrations
+            where event_id = new.id and status = 'registered'
+            on conflict (user_tg_username) do update
+            set attended = user_attendance_stats.attended + excluded.attended,
+                updated_at = now();
+        end if;
+    end if;
+    return null;
+end;
+$$;
+
+-- Начальное заполнение по текущему состоянию: отмены и переходы из очереди
+-- до этой миграции не сохранялись, их счётчики начинаются с текущих статусов
+truncate user_attendance_stats, event_fill_stats, admin_event_stats;
+
+insert into user_attendance_stats (user_tg_username, registrations, cancellations, waitlist_joins, waitlist_promotions, attended)
+select
+    r.user_tg_username,
+    count(*) filter (where r.status = 'registered'),
+    count(*) filter (where r.status = 'cancelled'),
+    count(*) filter (where r.status = 'waitlist' or r.promoted_from_waitlist),
+    count(*) filter (where r.promoted_from_waitlist),
+    count(*) filter (where r.status = 'registered' and e.is_completed)
+from event_registrations r
+join events e on e.id = r.event_id
+group by r.user_tg_username;
+
+insert into event_fill_stats (event_id, capacity, registered, peak_registered, first_registration_at)
+select e.id, e.quantity, count(r.id), count(r.id), min(r.registration_date::timestamptz)
+from events e
+join event_registrations r on r.event_id = e.id and r.status = 'registered'
+group by e.id, e.quantity;
+
+insert into admin_event_stats (admin_tg, events_total, events_completed, events_cancelled)
+select r, count(*), count(*) filter (where e.is_completed), count(*) filter (where e.is_cancelled)
+from events e, event_responsibles(e.responsible) as r
+group by r;
+
+drop trigger if exists event_registrations_stats_apply on event_registrations;
+create trigger event_registrations_stats_apply
+    after insert or update of status or delete on event_registrations
+    for each row execute function registration_stats_apply();
+
+drop trigger if exists events_stats_apply on events;
+create trigger events_stats_apply
+    after insert or update of is_completed, is_cancelled, responsible, quantity or delete on events
+    for each row execute function event_stats_apply();
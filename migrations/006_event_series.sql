@@ -0,0 +1,23 @@
+-- Повторяющиеся мероприятия (app/series.py). Серия хранит шаблон и правило повтора;
+-- вхождения создаются в events скользящим окном одной пачкой и ссылаются на серию.
+-- Уникальность (series_id, date) делает повторную материализацию безопасной.
+
+create table if not exists event_series (
+    id bigint generated by default as identity primary key,
+    title text not null,
+    description text,
+    photo text,
+    board_games text,
+    responsible text,
+    quantity integer,
+    start_date text not null,
+    rule text not null check (rule in ('daily', 'weekly', 'biweekly')),
+    occurrences integer not null check (occurrences > 0),
+    materialized_count integer not null default 0,
+    is_cancelled boolean not null default false,
+    created_at timestamptz not null default now()
+);
+
+alter table events add column if not exists series_id bigint references event_series (id) on delete set null;
+
+create unique index if not exists events_series_date_key on events (series_id, date);
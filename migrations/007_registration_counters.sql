@@ -0,0 +1,46 @@
+-- Счётчики записей прямо в строке мероприятия (app/utils.py: _fetch_event_slots).
+-- Триггер на event_registrations держит их точными при любой смене статуса, поэтому
+-- проверка свободных мест читает одну строку events вместо count(*) по регистрациям.
+
+alter table events add column if not exists registered_count integer not null default 0;
+alter table events add column if not exists waitlist_count integer not null default 0;
+
+create or replace function event_registration_counts_apply() returns trigger
+language plpgsql as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.status in ('registered', 'waitlist') then
+        update events
+        set registered_count = registered_count - (old.status = 'registered')::int,
+            waitlist_count = waitlist_count - (old.status = 'waitlist')::int
+        where id = old.event_id;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.status in ('registered', 'waitlist') then
+        update events
+        set registered_count = registered_count + (new.status = 'registered')::int,
+            waitlist_count = waitlist_count + (new.status = 'waitlist')::int
+        where id = new.event_id;
+    end if;
+    return null;
+end;
+$$;
+
+-- Начальное заполнение по текущим регистрациям
+update events e
+set registered_count = coalesce(c.registered, 0),
+    waitlist_count = coalesce(c.waitlist, 0)
+from (
+    select
+        ev.id,
+        count(r.id) filter (where r.status = 'registered') as registered,
+        count(r.id) filter (where r.status = 'waitlist') as waitlist
+    from events ev
+    left join event_registrations r on r.event_id = ev.id
+    group by ev.id
+) c
+where c.id = e.id
+  and (e.registered_count, e.waitlist_count) is distinct from (coalesce(c.registered, 0), coalesce(c.waitlist, 0));
+
+drop trigger if exists event_registrations_counts_apply on event_registrations;
+create trigger event_registrations_counts_apply
+    after insert or update of status, event_id or delete on event_registrations
+    for each row execute function event_registration_counts_apply();
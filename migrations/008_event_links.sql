@@ -0,0 +1,59 @@
+-- Связи мероприятий с ответственными админами и настолками (app/utils.py: get_admin_past_events,
+-- get_events_with_game). Строки events.responsible / events.board_games остаются для показа,
+-- а триггер раскладывает их в индексированные таблицы при каждой записи в events —
+-- поиск «мероприятия админа» и «мероприятия с игрой» идёт по индексу, а не по ilike '%...%'.
+
+create table if not exists event_admins (
+    event_id bigint not null references events (id) on delete cascade,
+    admin_tg text not null,
+    primary key (event_id, admin_tg)
+);
+
+create index if not exists event_admins_admin_tg_idx on event_admins (admin_tg);
+
+create table if not exists event_games (
+    event_id bigint not null references events (id) on delete cascade,
+    game_title text not null,
+    primary key (event_id, game_title)
+);
+
+create index if not exists event_games_game_title_idx on event_games (game_title);
+
+-- Элементы строки через запятую без пустых и повторов; ники приводятся к виду "@username"
+create or replace function split_event_list(value text, usernames boolean default false) returns setof text
+language sql immutable as $$
+    select distinct case when usernames and left(trim(v), 1) <> '@' then '@' || trim(v) else trim(v) end
+    from regexp_split_to_table(coalesce(value, ''), ',') as v
+    where trim(v) <> ''
+$$;
+
+create or replace function event_links_apply() returns trigger
+language plpgsql as $$
+begin
+    if tg_op = 'INSERT' or new.responsible is distinct from old.responsible then
+        delete from event_admins where event_id = new.id;
+        insert into event_admins (event_id, admin_tg)
+        select new.id, a from split_event_list(new.responsible, true) as a;
+    end if;
+    if tg_op = 'INSERT' or new.board_games is distinct from old.board_games then
+        delete from event_games where event_id = new.id;
+        insert into event_games (event_id, game_title)
+        select new.id, g from split_event_list(new.board_games) as g;
+    end if;
+    return null;
+end;
+$$;
+
+-- Начальное заполнение по текущим строкам
+insert into event_admins (event_id, admin_tg)
+select e.id, a from events e, split_event_list(e.responsible, true) as a
+on conflict do nothing;
+
+insert into event_games (event_id, game_title)
+select e.id, g from events e, split_event_list(e.board_games) as g
+on conflict do nothing;
+
+drop trigger if exists events_links_apply on events;
+create trigger events_links_apply
+    after insert or update of responsible, board_games on events
+    for each row execute function event_links_apply();
@@ -0,0 +1,8 @@
+-- Поиск пользователей по началу ника для админов (app/utils.py: search_users).
+-- Триграммный индекс обслуживает ilike '@prefix%' без учёта регистра, btree — сортировку
+-- каталога по нику, так что страница каталога читается по индексу, а не выгрузкой всех users.
+
+create extension if not exists pg_trgm;
+
+create index if not exists users_tg_username_trgm_idx on users using gin (tg_username gin_trgm_ops);
+create index if not exists users_tg_username_idx on users (tg_username);
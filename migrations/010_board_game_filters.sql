@@ -0,0 +1,6 @@
+-- Параметры настолок для фильтров каталога (app/games.py): число игроков и длительность партии.
+-- Пустые значения означают «не указано» — такие игры не попадают под соответствующий фильтр.
+
+alter table board_games add column if not exists min_players integer check (min_players > 0);
+alter table board_games add column if not exists max_players integer check (max_players >= min_players);
+alter table board_games add column if not exists duration_minutes integer check (duration_minutes > 0);
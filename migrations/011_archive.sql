@@ -0,0 +1,105 @@
+-- Архив регистраций, отзывов и ЧС мероприятий, завершённых давно (app/archive.py).
+-- archive_old_event_data переносит строки пачками по мероприятиям: delete ... returning
+-- и insert в архив в одной транзакции. Горячие таблицы и их индексы остаются маленькими,
+-- а история читает архив только по запросу.
+--
+-- Перенос — не отмена: сводные счётчики (миграции 004, 005, 007) и лента изменений (002)
+-- на время переноса отключаются через транзакционную настройку nastoy.archiving.
+
+alter table events add column if not exists archived boolean not null default false;
+
+create index if not exists events_archive_candidates_idx on events (date) where is_completed and not archived;
+
+create table if not exists event_registrations_archive (like event_registrations including defaults);
+alter table event_registrations_archive add column if not exists archived_at timestamptz not null default now();
+create index if not exists event_registrations_archive_user_idx on event_registrations_archive (user_tg_username, registration_date desc);
+create index if not exists event_registrations_archive_event_idx on event_registrations_archive (event_id);
+-- Внешний ключ нужен, чтобы история из архива подтягивала events(title, date) тем же запросом
+do $$
+begin
+    if not exists (select 1 from pg_constraint where conname = 'event_registrations_archive_event_id_fkey') then
+        alter table event_registrations_archive
+            add constraint event_registrations_archive_event_id_fkey foreign key (event_id) references events (id) on delete cascade;
+    end if;
+end;
+$$;
+
+create table if not exists event_feedback_archive (like event_feedback including defaults);
+alter table event_feedback_archive add column if not exists archived_at timestamptz not null default now();
+create index if not exists event_feedback_archive_event_idx on event_feedback_archive (event_id);
+
+create table if not exists event_blacklist_archive (like event_blacklist including defaults);
+alter table event_blacklist_archive add column if not exists archived_at timestamptz not null default now();
+create index if not exists event_blacklist_archive_event_idx on event_blacklist_archive (event_id);
+
+create or replace function archiving_in_progress() returns boolean
+language sql stable as $$
+    select coalesce(current_setting('nastoy.archiving', true), '') = 'on'
+$$;
+
+-- Триггеры, которые не должны срабатывать на перенос в архив
+drop trigger if exists event_feedback_stats_apply on event_feedback;
+create trigger event_feedback_stats_apply
+    after insert or update or delete on event_feedback
+    for each row when (not archiving_in_progress()) execute function event_feedback_stats_apply();
+
+drop trigger if exists event_registrations_stats_apply on event_registrations;
+create trigger event_registrations_stats_apply
+    after insert or update of status or delete on event_registrations
+    for each row when (not archiving_in_progress()) execute function registration_stats_apply();
+
+drop trigger if exists event_registrations_counts_apply on event_registrations;
+create trigger event_registrations_counts_apply
+    after insert or update of status, event_id or delete on event_registrations
+    for each row when (not archiving_in_progress()) execute function event_registration_counts_apply();
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['event_registrations', 'event_blacklist'] loop
+        execute format('drop trigger if exists %I on %I', t || '_notify_change', t);
+        execute format(
+            'create trigger %I after insert or update or delete on %I for each row when (not archiving_in_progress()) execute function notify_table_change()',
+            t || '_notify_change', t
+        );
+    end loop;
+end;
+$$;
+
+-- Переносит данные не более batch_size мероприятий, начавшихся раньше cutoff ('YYYY-MM-DD HH:MM').
+-- Возвращает число обработанных мероприятий; 0 — переносить больше нечего.
+create or replace function archive_old_event_data(cutoff text, batch_size integer default 50) returns integer
+language plpgsql as $$
+declare
+    batch bigint[];
+begin
+    select array_agg(id) into batch
+    from (
+        select id from events
+        where is_completed and not archived and date < cutoff
+        order by date
+        limit batch_size
+        for update skip locked
+    ) candidates;
+    if batch is null then
+        return 0;
+    end if;
+
+    perform set_config('nastoy.archiving', 'on', true);
+
+    with moved as (delete from event_registrations where event_id = any(batch) returning *)
+    insert into event_registrations_archive select moved.*, now() from moved;
+
+    with moved as (delete from event_feedback where event_id = any(batch) returning *)
+    insert into event_feedback_archive select moved.*, now() from moved;
+
+    with moved as (delete from event_blacklist where event_id = any(batch) returning *)
+    insert into event_blacklist_archive select moved.*, now() from moved;
+
+    update events set archived = true where id = any(batch);
+
+    perform set_config('nastoy.archiving', 'off', true);
+    return array_length(batch, 1);
+end;
+$$;